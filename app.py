@@ -17,23 +17,37 @@ from flask import (
     url_for,
     flash,
     abort,
+    send_file,
+    g,
 )
 from flask_socketio import SocketIO, emit, join_room
 from flask_mail import Mail, Message
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_talisman import Talisman
+from markupsafe import escape
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 from werkzeug.security import generate_password_hash
-from werkzeug.exceptions import RequestEntityTooLarge, BadRequest
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+from werkzeug.exceptions import (
+    RequestEntityTooLarge,
+    BadRequest,
+    RequestedRangeNotSatisfiable,
+)
+from werkzeug.datastructures import MultiDict
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from dotenv import load_dotenv
 import os
 import secrets
 import json
-from datetime import datetime, timedelta
-from PIL import Image
+import base64
+import hashlib
+import hmac
+import shutil
+import mimetypes
+from contextlib import contextmanager
+from urllib.parse import quote
+from datetime import datetime, timedelta, timezone
 import paypalrestsdk
 import threading
 import time
@@ -41,7 +55,43 @@ import logging
 from logging.handlers import RotatingFileHandler
 import traceback
 
-from database import db, User, Map, Comment, Purchase, ChatMessage, PasswordResetToken
+try:
+    import fcntl
+except ImportError:  # Windows: sin cerrojo entre procesos
+    fcntl = None
+
+from catalog_cache import VersionedCache
+from blob_store import BlobStore, blob_sha256, ingest_task
+from image_worker import ImagePoolFull, ImageWorkerPool
+from password_hasher import PasswordHasher, PasswordHasherBusy
+from google_certs import GOOGLE_CERTS_URL, GoogleTokenVerifier
+import ratelimit_storage  # noqa: F401  (registra el esquema sqlite:// en limits)
+from ip_reputation import IPReputationTracker
+from archive_manifest import archive_manifest_task
+from response_compression import compress_response
+import migrations
+import click
+from database import (
+    db,
+    User,
+    Map,
+    Comment,
+    Purchase,
+    ChatMessage,
+    PasswordResetToken,
+    Notification,
+    BackgroundJob,
+    ChunkedUpload,
+    search_maps,
+    normalize_database_uri,
+    masked_database_uri,
+    database_engine_options,
+    sqlite_pragmas,
+    configure_sqlite_engine,
+    get_for_update,
+    SEARCH_MARK_OPEN,
+    SEARCH_MARK_CLOSE,
+)
 
 # Cargar variables de entorno
 load_dotenv()
@@ -94,14 +144,63 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 # Asegurar que la carpeta 'instance' exista (evita errores de SQLite en despliegues)
 os.makedirs(os.path.join(basedir, "instance"), exist_ok=True)
 db_path = os.path.join(basedir, "instance", "hbuilds.db")
-app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+# DATABASE_URI (o DATABASE_URL de Render) permite usar PostgreSQL; si no, SQLite local
+database_uri = os.getenv("DATABASE_URI") or os.getenv("DATABASE_URL")
+app.config["SQLALCHEMY_DATABASE_URI"] = (
+    normalize_database_uri(database_uri) if database_uri else f"sqlite:///{db_path}"
+)
 
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# SQLite compartido por varios workers: WAL y espera al cerrojo en vez de errores
+app.config["SQLITE_JOURNAL_MODE"] = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+app.config["SQLITE_SYNCHRONOUS"] = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+app.config["SQLITE_MMAP_SIZE"] = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+# Negativo = KiB por conexión (SQLite); -16000 son unos 16 MB
+app.config["SQLITE_CACHE_SIZE"] = int(os.getenv("SQLITE_CACHE_SIZE", -16000))
+# Conexiones por worker: hilos de gunicorn + hilos de fondo (limpieza, pool, Socket.IO)
+app.config["DB_POOL_SIZE"] = int(os.getenv("DB_POOL_SIZE", 8))
+app.config["DB_MAX_OVERFLOW"] = int(os.getenv("DB_MAX_OVERFLOW", 4))
+app.config["DB_POOL_TIMEOUT"] = int(os.getenv("DB_POOL_TIMEOUT", 30))
+# Comprobar la conexión antes de usarla (útil con PostgreSQL remoto) y reciclarla
+app.config["DB_POOL_PRE_PING"] = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+app.config["DB_POOL_RECYCLE"] = int(os.getenv("DB_POOL_RECYCLE", 1800))
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = database_engine_options(app.config)
+# Crear el esquema y los datos de ejemplo al arrancar cada worker (bajo un cerrojo)
+app.config["DB_INIT_ON_STARTUP"] = (
+    os.getenv("DB_INIT_ON_STARTUP", "true").lower() == "true"
+)
+app.config["DB_INIT_LOCK_FILE"] = os.getenv(
+    "DB_INIT_LOCK_FILE", os.path.join(basedir, "instance", "db_init.lock")
+)
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=7)
 app.config["UPLOAD_FOLDER"] = os.getenv("UPLOAD_FOLDER", "static/uploads")
 app.config["MAX_CONTENT_LENGTH"] = int(
     os.getenv("MAX_CONTENT_LENGTH", 16 * 1024 * 1024)
 )
+# Archivos de mapas fuera de /static: solo se descargan tras verificar la compra
+app.config["MAP_FILES_FOLDER"] = os.getenv(
+    "MAP_FILES_FOLDER", os.path.join(basedir, "instance", "map_files")
+)
+# Entrega delegada al proxy: location interna de nginx o X-Sendfile (Apache/lighttpd)
+app.config["DOWNLOAD_ACCEL_PREFIX"] = os.getenv("DOWNLOAD_ACCEL_PREFIX", "")
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE", "false").lower() == "true"
+# Subidas por partes de archivos de mapas (fragmentos < MAX_CONTENT_LENGTH)
+app.config["CHUNKED_UPLOAD_FOLDER"] = os.getenv(
+    "CHUNKED_UPLOAD_FOLDER", os.path.join(basedir, "instance", "chunked_uploads")
+)
+app.config["UPLOAD_CHUNK_SIZE"] = int(os.getenv("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+app.config["MAX_MAP_FILE_SIZE"] = int(
+    os.getenv("MAX_MAP_FILE_SIZE", 4 * 1024 * 1024 * 1024)
+)
+app.config["CHUNKED_UPLOAD_TTL_HOURS"] = int(os.getenv("CHUNKED_UPLOAD_TTL_HOURS", 24))
+# Vigencia en segundos de los enlaces de descarga firmados
+app.config["DOWNLOAD_URL_TTL"] = int(os.getenv("DOWNLOAD_URL_TTL", 900))
+# Compresión de HTML/JSON: tamaño mínimo en bytes y niveles (gzip 1-9, brotli 0-11)
+app.config["COMPRESS_ENABLED"] = os.getenv("COMPRESS_ENABLED", "true").lower() == "true"
+app.config["COMPRESS_MIN_SIZE"] = int(os.getenv("COMPRESS_MIN_SIZE", 500))
+app.config["COMPRESS_GZIP_LEVEL"] = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+app.config["COMPRESS_BROTLI_QUALITY"] = int(os.getenv("COMPRESS_BROTLI_QUALITY", 4))
 
 # Configuración de seguridad de sesiones
 app.config["SESSION_COOKIE_SECURE"] = True  # Solo HTTPS en producción
@@ -142,13 +241,48 @@ app.config["MAIL_DEFAULT_SENDER"] = os.getenv(
 
 # Inicializar extensiones
 db.init_app(app)
+with app.app_context():
+    if db.engine.dialect.name == "sqlite":
+        configure_sqlite_engine(db.engine, sqlite_pragmas(app.config))
 socketio = SocketIO(
     app, cors_allowed_origins="*", async_mode="threading", manage_session=False
 )
 mail = Mail(app)
 
+# Caché del catálogo: la versión se comparte entre workers con un archivo
+catalog_cache = VersionedCache(
+    os.getenv(
+        "CATALOG_VERSION_FILE", os.path.join(basedir, "instance", "catalog.version")
+    ),
+    max_entries=int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", 512)),
+)
+
+# Caché de usuarios (copias inmutables) con la misma invalidación por versión
+user_cache = VersionedCache(
+    os.getenv("USER_VERSION_FILE", os.path.join(basedir, "instance", "user.version")),
+    max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", 1024)),
+    ttl=int(os.getenv("USER_CACHE_TTL", 60)),
+)
+
+# Pool de procesos para optimizar imágenes fuera de los hilos de peticiones
+image_pool = ImageWorkerPool(
+    max_workers=int(os.getenv("IMAGE_WORKERS", 2)),
+    max_pending=int(os.getenv("IMAGE_QUEUE_LIMIT", 32)),
+)
+
+# Pool de hilos para los hashes de contraseñas (por worker de gunicorn). El
+# límite de hashes en curso va por debajo de los 4 hilos del Procfile: el
+# siguiente login recibe un 503 en lugar de ocupar el último hilo libre
+password_hasher = PasswordHasher(
+    method=os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1"),
+    max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", 2)),
+    max_pending=int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 2)),
+)
+
 logger.info("[OK] Flask app inicializada correctamente")
-logger.info(f"[DB] Base de datos: {db_path}")
+logger.info(
+    f"[DB] Base de datos: {masked_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])}"
+)
 logger.info(f"[ENV] Entorno: {os.getenv('FLASK_ENV', 'development')}")
 logger.info(f"[MAIL] Email configurado: {app.config['MAIL_USERNAME']}")
 logger.info(
@@ -156,12 +290,17 @@ logger.info(
 )
 
 # Configurar rate limiting anti-DDoS
+# Contadores compartidos por todos los workers en un SQLite local (WAL);
+# RATELIMIT_STORAGE_URI admite también memory:// o redis://
 limiter = Limiter(
     get_remote_address,
     app=app,
     default_limits=["500 per day", "100 per hour", "20 per minute"],
-    storage_uri="memory://",
-    strategy="fixed-window",
+    storage_uri=os.getenv(
+        "RATELIMIT_STORAGE_URI",
+        "sqlite:///" + os.path.join(basedir, "instance", "ratelimit.db"),
+    ),
+    strategy=os.getenv("RATELIMIT_STRATEGY", "sliding-window-counter"),
     # Configuración anti-DDoS
     swallow_errors=True,  # No romper la app si el limiter falla
     headers_enabled=True,  # Enviar headers X-RateLimit-*
@@ -216,10 +355,16 @@ def from_json(value):
 
 # Google OAuth configuración
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
+# Certificados de Google en caché según su Cache-Control (uno por worker)
+google_verifier = GoogleTokenVerifier(
+    certs_url=os.getenv("GOOGLE_CERTS_URL", GOOGLE_CERTS_URL)
+)
 
 # Extensiones permitidas para archivos
 ALLOWED_IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp", "bmp", "svg"}
 ALLOWED_MAP_EXTENSIONS = {"zip", "mcworld", "rar"}
+# Formatos ZIP de los que se puede leer el manifiesto (rar no)
+ARCHIVE_MANIFEST_EXTENSIONS = {"zip", "mcworld"}
 
 
 def allowed_file(filename, allowed_extensions):
@@ -241,14 +386,276 @@ def sanitize_filename(filename):
     return f"{name}{ext}"
 
 
-def optimize_image(image_path, max_size=(800, 800)):
-    """Optimiza y redimensiona una imagen"""
+MAP_IMAGE_SIZE = (1200, 800)
+PROFILE_IMAGE_SIZE = (400, 400)
+# Anchos de las variantes responsive de portadas y galerías (además del original)
+IMAGE_VARIANT_WIDTHS = tuple(
+    int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,960").split(",")
+)
+
+
+# Imágenes públicas direccionadas por contenido: URLs inmutables
+IMAGE_BLOB_URL = "/static/uploads/blobs"
+image_blobs = BlobStore(os.path.abspath(os.path.join(app.config["UPLOAD_FOLDER"], "blobs")))
+
+
+def stage_image(file_storage):
+    """Guarda una imagen recién subida en staging; devuelve (ruta, url).
+
+    La URL de staging sirve mientras el pool la optimiza; al terminar, el
+    trabajo la mueve al almacén de blobs y reemplaza la URL en la base de datos.
+    """
+    ext = file_storage.filename.rsplit(".", 1)[1].lower()
+    filename = f"{secrets.token_hex(16)}.{ext}"
+    folder = os.path.join(app.config["UPLOAD_FOLDER"], "staging")
+    os.makedirs(folder, exist_ok=True)
+    filepath = os.path.abspath(os.path.join(folder, filename))
+    file_storage.save(filepath)
+    return filepath, f"/static/uploads/staging/{filename}"
+
+
+@app.after_request
+def cache_immutable_blobs(response):
+    """Las URLs del almacén de blobs nunca cambian de contenido: caché de un año"""
+    if request.path.startswith(f"{IMAGE_BLOB_URL}/") and response.status_code in (
+        200,
+        206,
+        304,
+    ):
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+def map_image_task(filepath, url):
+    """Tarea del pool para una imagen de mapa: optimizar, guardar y generar variantes"""
+    return {
+        "path": filepath,
+        "url": url,
+        "max_size": MAP_IMAGE_SIZE,
+        "widths": IMAGE_VARIANT_WIDTHS,
+        "store": image_blobs.root,
+    }
+
+
+def request_has_images(*fields):
+    """True si la petición trae alguna imagen válida en los campos dados"""
+    return any(
+        f and f.filename and allowed_file(f.filename, ALLOWED_IMAGE_EXTENSIONS)
+        for field in fields
+        for f in request.files.getlist(field)
+    )
+
+
+def image_pool_busy_response():
+    """Respuesta 503 cuando la cola de imágenes de este worker está llena"""
+    response = jsonify(
+        {
+            "success": False,
+            "message": "Hay demasiadas imágenes en proceso, intenta de nuevo en unos segundos",
+        }
+    )
+    response.headers["Retry-After"] = "10"
+    return response, 503
+
+
+def password_hasher_busy_response():
+    """Respuesta 503 cuando la cola de hashes de contraseñas está llena"""
+    response = jsonify(
+        {
+            "success": False,
+            "message": "Hay demasiadas contraseñas procesándose, intenta de nuevo en unos segundos",
+        }
+    )
+    response.headers["Retry-After"] = "5"
+    return response, 503
+
+
+def variant_urls(url, formats):
+    """Convierte los nombres de archivo de las variantes en URLs junto al original"""
+    base = url.rsplit("/", 1)[0]
+    return {
+        fmt: [[width, f"{base}/{name}"] for width, name in entries]
+        for fmt, entries in formats.items()
+    }
+
+
+def replace_map_image_urls(map_obj, blob_urls):
+    """Cambia las URLs de staging de portada y galería por las de los blobs"""
+    if map_obj.image in blob_urls:
+        map_obj.image = blob_urls[map_obj.image]
+    if map_obj.gallery_images:
+        gallery = json.loads(map_obj.gallery_images)
+        map_obj.gallery_images = json.dumps([blob_urls.get(url, url) for url in gallery])
+
+
+def finish_image_job(job_id, user_id, result, error):
+    """Callback del pool: guarda el resultado del trabajo y avisa al usuario"""
+    try:
+        with app.app_context():
+            job = db.session.get(BackgroundJob, job_id)
+            if not job:
+                return
+            if error:
+                job.status = "failed"
+                job.error = str(error)
+            else:
+                job.processed = result["processed"]
+                job.status = "failed" if result["errors"] else "done"
+                job.error = "; ".join(result["errors"]) or None
+                blob_urls = {
+                    item["url"]: f"{IMAGE_BLOB_URL}/{item['key']}"
+                    for item in result["stored"]
+                }
+                # Bloqueado hasta el commit: otro trabajo del mismo mapa puede
+                # estar fusionando sus variantes a la vez
+                map_obj = get_for_update(Map, job.map_id) if job.map_id else None
+                if map_obj:
+                    replace_map_image_urls(map_obj, blob_urls)
+                    for item in result["variants"]:
+                        url = blob_urls.get(item["url"], item["url"])
+                        map_obj.set_image_variants(
+                            url, variant_urls(url, item["formats"])
+                        )
+                if job.kind == "profile":
+                    user = db.session.get(User, job.user_id)
+                    if user and user.profile_picture in blob_urls:
+                        user.profile_picture = blob_urls[user.profile_picture]
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            payload = job.to_dict()
+            db.session.remove()
+
+        if payload["kind"] == "profile" and result and result["stored"]:
+            user_cache.bump()
+
+        if result and (result["stored"] or result["variants"]):
+            # Las tarjetas en caché aún apuntan a staging y no tienen srcset
+            catalog_cache.bump()
+
+        if payload["status"] == "failed":
+            logger.error(f"Trabajo de imágenes {job_id} falló: {payload['error']}")
+        socketio.emit("job_done", payload, to=f"user_{user_id}")
+    except Exception as e:
+        logger.error(f"Error finalizando trabajo de imágenes {job_id}: {e}")
+
+
+def start_image_job(kind, tasks, user_id, map_id=None):
+    """Registra un BackgroundJob y envía sus imágenes al pool.
+
+    tasks es una lista de dicts para image_worker.process_images. Llamar
+    después del commit de la ruta; devuelve el dict del trabajo o None si no había imágenes.
+    Si el pool está lleno o no arranca, el trabajo queda fallido y se lanza
+    ImagePoolFull (503): Pillow nunca se ejecuta en el hilo de la petición.
+    """
+    if not tasks:
+        return None
+
+    job = BackgroundJob(
+        id=secrets.token_hex(12),
+        user_id=user_id,
+        map_id=map_id,
+        kind=kind,
+        total=len(tasks),
+    )
+    db.session.add(job)
+    db.session.commit()
+    job_id = job.id
+
     try:
-        img = Image.open(image_path)
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-        img.save(image_path, optimize=True, quality=85)
+        image_pool.submit(
+            tasks,
+            lambda result, error: finish_image_job(job_id, user_id, result, error),
+        )
     except Exception as e:
-        logger.error(f"Error optimizando imagen: {e}")
+        # Las imágenes quedan en staging sin optimizar; el trabajo consta como fallido
+        logger.error(f"Pool de imágenes no disponible: {e}")
+        finish_image_job(job_id, user_id, None, e)
+        raise ImagePoolFull(str(e)) from e
+
+    return job.to_dict()
+
+
+# ==================== ASSETS ESTÁTICOS ====================
+
+# build_assets.py compila static/css y static/js a static/dist con un hash en el nombre
+ASSET_DIST_DIR = "dist"
+ASSET_MANIFEST_PATH = os.path.join(app.static_folder, ASSET_DIST_DIR, "manifest.json")
+# Versiones precomprimidas por orden de preferencia
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def load_asset_manifest():
+    """Manifiesto {"css/home.css": "dist/css/home.<hash>.css"} o {} si no se compiló"""
+    try:
+        with open(ASSET_MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+asset_manifest = load_asset_manifest()
+if asset_manifest:
+    logger.info(f"[ASSETS] {len(asset_manifest)} assets compilados")
+
+
+@app.url_defaults
+def hashed_static_url(endpoint, values):
+    """url_for('static', filename='css/home.css') apunta a la versión compilada.
+
+    En modo debug se sirven los originales para ver los cambios sin recompilar.
+    """
+    if endpoint == "static" and not app.debug:
+        filename = values.get("filename")
+        if filename in asset_manifest:
+            values["filename"] = asset_manifest[filename]
+
+
+def send_static_asset(filename):
+    """Vista de /static: los assets compilados van precomprimidos y con caché inmutable"""
+    if not filename.startswith(f"{ASSET_DIST_DIR}/"):
+        return app.send_static_file(filename)
+
+    path = safe_join(app.static_folder, filename)
+    if not path or not os.path.isfile(path):
+        abort(404)
+
+    for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+            response = send_file(
+                path + suffix,
+                mimetype=mimetypes.guess_type(filename)[0],
+                conditional=True,
+            )
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = app.send_static_file(filename)
+
+    response.vary.add("Accept-Encoding")
+    # El nombre cambia con el contenido: se puede cachear para siempre
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+app.view_functions["static"] = send_static_asset
+
+
+# ==================== COMPRESIÓN DE RESPUESTAS ====================
+
+
+@app.after_request
+def compress_dynamic_response(response):
+    """gzip/brotli para HTML y JSON; Socket.IO no pasa por aquí"""
+    if not app.config["COMPRESS_ENABLED"]:
+        return response
+    return compress_response(
+        response,
+        request.accept_encodings,
+        request.method,
+        min_size=app.config["COMPRESS_MIN_SIZE"],
+        gzip_level=app.config["COMPRESS_GZIP_LEVEL"],
+        brotli_quality=app.config["COMPRESS_BROTLI_QUALITY"],
+    )
 
 
 # ==================== MANEJADORES DE ERRORES ====================
@@ -291,6 +698,12 @@ def request_entity_too_large(error):
     return redirect(request.referrer or url_for("index"))
 
 
+@app.errorhandler(ImagePoolFull)
+def image_pool_full(error):
+    """La cola de imágenes se llenó entre la comprobación y el envío"""
+    return image_pool_busy_response()
+
+
 @app.errorhandler(429)
 def ratelimit_handler(error):
     """Maneja errores 429 - Demasiadas solicitudes"""
@@ -368,15 +781,36 @@ def health_check():
 
 # ==================== INICIALIZACIÓN DE LA BASE DE DATOS ====================
 
-# Lista de IPs bloqueadas (en producción, usar Redis o base de datos)
-blocked_ips = set()
-suspicious_ips = {}  # {ip: {'count': X, 'first_seen': timestamp}}
-
 # Configuración anti-DDoS
 SUSPICIOUS_THRESHOLD = 100  # requests en SUSPICIOUS_WINDOW
 SUSPICIOUS_WINDOW = 60  # segundos
 BLOCK_DURATION = 3600  # 1 hora de bloqueo
 
+# Endpoints que no cuentan para el umbral: una página carga decenas de assets,
+# una descarga grande reanuda con varios Range y una subida por partes envía
+# cientos de PUT. Ya tienen su propio límite (o son estáticos y baratos); las
+# IPs bloqueadas siguen recibiendo 403 también en ellos.
+IP_REPUTATION_EXEMPT_ENDPOINTS = frozenset(
+    {
+        "static",
+        "download_signed_file",
+        "init_chunked_upload",
+        "get_chunked_upload_status",
+        "upload_chunk",
+        "finalize_chunked_upload",
+        "abort_chunked_upload",
+    }
+)
+
+# IPs sospechosas y bloqueadas de este worker, con memoria acotada
+ip_tracker = IPReputationTracker(
+    threshold=SUSPICIOUS_THRESHOLD,
+    window=SUSPICIOUS_WINDOW,
+    block_duration=BLOCK_DURATION,
+    max_tracked=int(os.getenv("IP_TRACKER_MAX_ENTRIES", 100_000)),
+    max_blocked=int(os.getenv("IP_BLOCKLIST_MAX_ENTRIES", 50_000)),
+)
+
 
 @app.before_request
 def check_ip_reputation():
@@ -384,171 +818,242 @@ def check_ip_reputation():
     ip = get_remote_address()
 
     # Verificar si la IP está bloqueada
-    if ip in blocked_ips:
+    if ip_tracker.is_blocked(ip):
         logger.warning(f"IP bloqueada intentó acceder: {ip}")
         abort(403)
 
-    # Rastrear IPs sospechosas
-    now = time.time()
+    if request.endpoint in IP_REPUTATION_EXEMPT_ENDPOINTS:
+        return
+
+    # Rastrear IPs sospechosas; si excede el threshold, bloquear
+    if ip_tracker.hit(ip):
+        logger.critical(
+            f"IP BLOQUEADA por actividad sospechosa: {ip} (más de {SUSPICIOUS_THRESHOLD} requests en {SUSPICIOUS_WINDOW}s)"
+        )
+        abort(429)  # Too Many Requests
 
-    if ip in suspicious_ips:
-        data = suspicious_ips[ip]
 
-        # Si ha pasado la ventana de tiempo, resetear
-        if now - data["first_seen"] > SUSPICIOUS_WINDOW:
-            suspicious_ips[ip] = {"count": 1, "first_seen": now}
-        else:
-            data["count"] += 1
+def seed_sample_data():
+    """Crea el administrador y los mapas de ejemplo si la base de datos está vacía.
 
-            # Si excede el threshold, bloquear
-            if data["count"] > SUSPICIOUS_THRESHOLD:
-                blocked_ips.add(ip)
-                logger.critical(
-                    f"IP BLOQUEADA por actividad sospechosa: {ip} ({data['count']} requests en {SUSPICIOUS_WINDOW}s)"
-                )
-                # Limpiar de suspicious
-                del suspicious_ips[ip]
-                abort(429)  # Too Many Requests
+    Devuelve True si se sembraron datos.
+    """
+    if Map.query.count() > 0:
+        return False
+    logger.info("[INIT] Base de datos vacía, inicializando datos de ejemplo...")
+
+    # Crear usuario administrador
+    admin_email = os.getenv("ADMIN_EMAIL", "admin@hbuilds.com")
+    admin_password = os.getenv("ADMIN_PASSWORD", "admin123")
+    admin_name = os.getenv("ADMIN_NAME", "Administrator")
+
+    admin = User.query.filter_by(email=admin_email).first()
+    if not admin:
+        admin = User(
+            name=admin_name,
+            email=admin_email,
+            is_admin=True,
+            auth_provider="local",
+        )
+        admin.set_password(admin_password)
+        db.session.add(admin)
+        logger.info(f"[INIT] ✅ Usuario administrador creado: {admin_email}")
+
+    # Crear mapas de ejemplo
+    mapas_ejemplo = [
+        {
+            "title": "Reino Místico",
+            "description": "Un mundo de fantasía épica con castillos majestuosos, dungeons peligrosos y secretos por descubrir.",
+            "price": 15.99,
+            "image": "reino_mistico.jpg",
+            "features": json.dumps([
+                "🏰 5+ Castillos únicos completamente amueblados",
+                "⚔️ 10 Dungeons con jefes personalizados",
+                "🎨 Texturas customizadas incluidas",
+            ]),
+            "is_featured": True,
+            "is_premium": True,
+        },
+        {
+            "title": "Ciudad Cyberpunk 2077",
+            "description": "Una metrópolis futurista llena de neón, rascacielos imponentes y tecnología avanzada.",
+            "price": 18.99,
+            "image": "cyberpunk.jpg",
+            "features": json.dumps([
+                "🌃 Ciudad completa con +50 edificios",
+                "🚗 Sistema de transporte urbano",
+                "💡 Iluminación neón realista",
+            ]),
+            "is_featured": True,
+            "is_premium": True,
+        },
+        {
+            "title": "Isla Tropical Survival",
+            "description": "Sobrevive en una isla paradisíaca con recursos limitados y peligros ocultos.",
+            "price": 12.99,
+            "image": "tropical.jpg",
+            "features": json.dumps([
+                "🏝️ Isla completa con biomas variados",
+                "🔥 Sistema de supervivencia integrado",
+                "🐚 Fauna y flora realista",
+            ]),
+            "is_featured": True,
+            "is_premium": True,
+        },
+        {
+            "title": "Mapa de Práctica GRATIS",
+            "description": "Mapa básico gratuito para practicar construcción y explorar mecánicas del juego.",
+            "price": 0.00,
+            "image": "practice.jpg",
+            "features": json.dumps([
+                "🎁 Completamente GRATIS",
+                "📚 Tutorial incluido",
+                "🔧 Herramientas básicas",
+            ]),
+            "is_featured": False,
+            "is_premium": False,
+        },
+        {
+            "title": "PvP Arena Medieval",
+            "description": "Arena de combate medieval perfecta para batallas PvP épicas con tus amigos.",
+            "price": 9.99,
+            "image": "pvp_arena.jpg",
+            "features": json.dumps([
+                "⚔️ 3 Arenas de combate diferentes",
+                "🏆 Sistema de espectadores",
+                "🛡️ Salas de equipamiento",
+            ]),
+            "is_featured": False,
+            "is_premium": True,
+        },
+        {
+            "title": "Base Espacial Luna-7",
+            "description": "Estación espacial futurista con tecnología avanzada y vistas al espacio.",
+            "price": 14.99,
+            "image": "space_station.jpg",
+            "features": json.dumps([
+                "🚀 Estación completa con múltiples módulos",
+                "🌌 Vistas al espacio exterior",
+                "🤖 Sistema de defensa automatizado",
+            ]),
+            "is_featured": False,
+            "is_premium": True,
+        },
+    ]
+
+    for mapa_data in mapas_ejemplo:
+        db.session.add(Map(**mapa_data))
+
+    db.session.commit()
+    catalog_cache.bump()
+    logger.info(f"[INIT] ✅ {len(mapas_ejemplo)} mapas de ejemplo creados")
+    return True
+
+
+@contextmanager
+def database_init_lock():
+    """Cerrojo de archivo para que un solo proceso inicialice la base de datos.
+
+    Los workers de gunicorn arrancan a la vez; el resto espera y, al entrar,
+    ve que ya no queda nada por hacer. Sin fcntl (Windows) no se bloquea.
+    """
+    lock_path = app.config["DB_INIT_LOCK_FILE"]
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def initialize_database(target=None):
+    """Aplica las migraciones pendientes y siembra los datos de ejemplo.
+
+    Una base vacía se crea desde los modelos. Se ejecuta desde `flask db
+    upgrade` y los scripts de inicialización, nunca dentro de una petición.
+    Devuelve las migraciones aplicadas.
+    """
+    with database_init_lock(), app.app_context():
+        applied = migrations.upgrade(target)
+        if applied:
+            logger.info(f"[INIT] Migraciones aplicadas: {applied}")
+
+        if seed_sample_data():
+            logger.info("[INIT] 🎉 Base de datos inicializada correctamente")
+        db.session.remove()
+    return applied
+
+
+def check_database_schema():
+    """Al arrancar: crea una base vacía; si ya existe, solo comprueba su versión.
+
+    No aplica migraciones pendientes, así un `flask db downgrade` se respeta
+    hasta el siguiente `flask db upgrade`.
+    """
+    with app.app_context():
+        exists = migrations.schema_exists()
+    if not exists:
+        initialize_database()
+        return
+
+    with app.app_context():
+        version = migrations.current_version()
+        pending = migrations.pending_versions()
+        db.session.remove()
+    if pending:
+        logger.warning(
+            f"[DB] Esquema en la versión {version}, migraciones pendientes "
+            f"{pending}: ejecutar `flask --app app db upgrade`"
+        )
+    elif version > migrations.LATEST_VERSION:
+        logger.warning(
+            f"[DB] Esquema en la versión {version}, más nueva que este código "
+            f"({migrations.LATEST_VERSION})"
+        )
     else:
-        suspicious_ips[ip] = {"count": 1, "first_seen": now}
+        logger.info(f"[DB] Esquema en la versión {version}")
 
-    # Limpieza periódica de IPs antiguas
-    if len(suspicious_ips) % 1000 == 0:  # Cada 1000 requests
-        old_ips = [
-            ip
-            for ip, data in suspicious_ips.items()
-            if now - data["first_seen"] > SUSPICIOUS_WINDOW * 2
-        ]
-        for ip in old_ips:
-            del suspicious_ips[ip]
 
+if app.config["DB_INIT_ON_STARTUP"]:
+    try:
+        check_database_schema()
+    except Exception as e:
+        # Arrancar igualmente para poder ver los logs; `flask db upgrade` reintenta
+        logger.error(f"Error comprobando o inicializando la base de datos: {e}")
+        traceback.print_exc()
+
+
+# ==================== USUARIO ACTUAL ====================
+
+
+def load_user_snapshot(user_id):
+    """UserSnapshot de `user_id` (o None) desde la caché de usuarios.
+
+    Las rutas que modifican o borran un usuario deben llamar a
+    user_cache.bump() después del commit. Crear uno no hace falta: los None
+    no se guardan en la caché.
+    """
+
+    def load():
+        user = db.session.get(User, user_id)
+        return user.snapshot() if user else None
+
+    return user_cache.get_or_set(("user", user_id), load)
 
-@app.before_request
-def create_tables():
-    """Crear tablas en la primera petición si no existen e inicializar datos"""
-    if not hasattr(app, "tables_created"):
-        with app.app_context():
-            try:
-                db.create_all()
-                app.tables_created = True
-                logger.info("Tablas de base de datos creadas/verificadas")
-                
-                # Inicializar datos de ejemplo si la DB está vacía
-                if Map.query.count() == 0:
-                    logger.info("[INIT] Base de datos vacía, inicializando datos de ejemplo...")
-                    
-                    # Crear usuario administrador
-                    admin_email = os.getenv("ADMIN_EMAIL", "admin@hbuilds.com")
-                    admin_password = os.getenv("ADMIN_PASSWORD", "admin123")
-                    admin_name = os.getenv("ADMIN_NAME", "Administrator")
-                    
-                    admin = User.query.filter_by(email=admin_email).first()
-                    if not admin:
-                        admin = User(
-                            name=admin_name,
-                            email=admin_email,
-                            is_admin=True,
-                            auth_provider="local",
-                        )
-                        admin.set_password(admin_password)
-                        db.session.add(admin)
-                        logger.info(f"[INIT] ✅ Usuario administrador creado: {admin_email}")
-                    
-                    # Crear mapas de ejemplo
-                    mapas_ejemplo = [
-                        {
-                            "title": "Reino Místico",
-                            "description": "Un mundo de fantasía épica con castillos majestuosos, dungeons peligrosos y secretos por descubrir.",
-                            "price": 15.99,
-                            "image": "reino_mistico.jpg",
-                            "features": json.dumps([
-                                "🏰 5+ Castillos únicos completamente amueblados",
-                                "⚔️ 10 Dungeons con jefes personalizados",
-                                "🎨 Texturas customizadas incluidas",
-                            ]),
-                            "is_featured": True,
-                            "is_premium": True,
-                        },
-                        {
-                            "title": "Ciudad Cyberpunk 2077",
-                            "description": "Una metrópolis futurista llena de neón, rascacielos imponentes y tecnología avanzada.",
-                            "price": 18.99,
-                            "image": "cyberpunk.jpg",
-                            "features": json.dumps([
-                                "🌃 Ciudad completa con +50 edificios",
-                                "🚗 Sistema de transporte urbano",
-                                "💡 Iluminación neón realista",
-                            ]),
-                            "is_featured": True,
-                            "is_premium": True,
-                        },
-                        {
-                            "title": "Isla Tropical Survival",
-                            "description": "Sobrevive en una isla paradisíaca con recursos limitados y peligros ocultos.",
-                            "price": 12.99,
-                            "image": "tropical.jpg",
-                            "features": json.dumps([
-                                "🏝️ Isla completa con biomas variados",
-                                "🔥 Sistema de supervivencia integrado",
-                                "🐚 Fauna y flora realista",
-                            ]),
-                            "is_featured": True,
-                            "is_premium": True,
-                        },
-                        {
-                            "title": "Mapa de Práctica GRATIS",
-                            "description": "Mapa básico gratuito para practicar construcción y explorar mecánicas del juego.",
-                            "price": 0.00,
-                            "image": "practice.jpg",
-                            "features": json.dumps([
-                                "🎁 Completamente GRATIS",
-                                "📚 Tutorial incluido",
-                                "🔧 Herramientas básicas",
-                            ]),
-                            "is_featured": False,
-                            "is_premium": False,
-                        },
-                        {
-                            "title": "PvP Arena Medieval",
-                            "description": "Arena de combate medieval perfecta para batallas PvP épicas con tus amigos.",
-                            "price": 9.99,
-                            "image": "pvp_arena.jpg",
-                            "features": json.dumps([
-                                "⚔️ 3 Arenas de combate diferentes",
-                                "🏆 Sistema de espectadores",
-                                "🛡️ Salas de equipamiento",
-                            ]),
-                            "is_featured": False,
-                            "is_premium": True,
-                        },
-                        {
-                            "title": "Base Espacial Luna-7",
-                            "description": "Estación espacial futurista con tecnología avanzada y vistas al espacio.",
-                            "price": 14.99,
-                            "image": "space_station.jpg",
-                            "features": json.dumps([
-                                "🚀 Estación completa con múltiples módulos",
-                                "🌌 Vistas al espacio exterior",
-                                "🤖 Sistema de defensa automatizado",
-                            ]),
-                            "is_featured": False,
-                            "is_premium": True,
-                        },
-                    ]
-                    
-                    for mapa_data in mapas_ejemplo:
-                        mapa = Map(**mapa_data)
-                        db.session.add(mapa)
-                    
-                    db.session.commit()
-                    logger.info(f"[INIT] ✅ {len(mapas_ejemplo)} mapas de ejemplo creados")
-                    logger.info("[INIT] 🎉 Base de datos inicializada correctamente")
-                    
-            except Exception as e:
-                logger.error(f"Error creando tablas o inicializando datos: {e}")
-                import traceback
-                traceback.print_exc()
 
+def current_user():
+    """Usuario de la sesión, memorizado en `g` durante la petición.
+
+    Devuelve un UserSnapshot de solo lectura o None. Para modificar el
+    usuario hay que cargarlo con db.session.get(User, ...).
+    """
+    if "current_user" not in g:
+        user_id = session.get("user_id")
+        g.current_user = load_user_snapshot(user_id) if user_id else None
+    return g.current_user
 
 
 # ==================== RUTAS PRINCIPALES ====================
@@ -558,12 +1063,14 @@ def create_tables():
 def index():
     """Página de inicio - Landing page pública"""
     try:
-        # Obtener todos los mapas para mostrar en el carrusel
-        maps = Map.query.order_by(Map.created_at.desc()).all()
-        return render_template("inicio.html", maps=maps)
+        # Solo la primera página del catálogo; el resto se carga bajo demanda
+        cards_html, next_cursor = render_catalog_cards("inicio", {})
+        return render_template(
+            "inicio.html", cards_html=cards_html, next_cursor=next_cursor
+        )
     except Exception as e:
         logger.error(f"Error en index: {e}")
-        return render_template("inicio.html", maps=[])
+        return render_template("inicio.html", cards_html="", next_cursor=None)
 
 
 @app.route("/credits")
@@ -596,13 +1103,14 @@ def home():
     if "user_id" not in session:
         return redirect(url_for("login_page"))
 
-    user = User.query.get(session["user_id"])
+    user = current_user()
     if not user:
         session.clear()
         return redirect(url_for("login_page"))
 
-    # Obtener todos los mapas
-    maps = Map.query.order_by(Map.created_at.desc()).all()
+    # Primera página del catálogo (el resto se carga con "Cargar más")
+    cards_html, next_cursor = render_catalog_cards("home", {})
+    total_maps = catalog_cache.get_or_set("total_maps", lambda: Map.query.count())
 
     # Obtener estadísticas del usuario
     user_purchases = Purchase.query.filter_by(
@@ -616,7 +1124,9 @@ def home():
     return render_template(
         "user/home.html",
         user=user,
-        maps=maps,
+        cards_html=cards_html,
+        next_cursor=next_cursor,
+        total_maps=total_maps,
         user_purchases=user_purchases,
         user_comments=user_comments,
         notifications_count=notifications_count,
@@ -636,7 +1146,7 @@ def chat():
     if "user_id" not in session:
         return redirect(url_for("login_page"))
 
-    user = User.query.get(session["user_id"])
+    user = current_user()
     if not user:
         session.clear()
         return redirect(url_for("login_page"))
@@ -650,7 +1160,7 @@ def purchases():
     if "user_id" not in session:
         return redirect(url_for("login_page"))
 
-    user = db.session.get(User, session["user_id"])
+    user = current_user()
     if not user:
         session.clear()
         return redirect(url_for("login_page"))
@@ -688,7 +1198,7 @@ def notifications():
     if "user_id" not in session:
         return redirect(url_for("login_page"))
 
-    user = User.query.get(session["user_id"])
+    user = current_user()
     if not user:
         session.clear()
         return redirect(url_for("login_page"))
@@ -810,7 +1320,17 @@ def login():
 
         user = User.query.filter_by(email=email).first()
 
-        if user and user.check_password(password):
+        if user and user.check_password(password, password_hasher):
+            # Regenerar hashes antiguos con el método y coste actuales; con el
+            # pool lleno se deja para el siguiente login
+            if password_hasher.needs_rehash(user.password):
+                try:
+                    user.set_password(password, password_hasher)
+                    db.session.commit()
+                    logger.info(f"Hash de contraseña actualizado: {email}")
+                except PasswordHasherBusy:
+                    pass
+
             session["user_id"] = user.id
             session["user_email"] = user.email
             session["user_name"] = user.name
@@ -836,6 +1356,8 @@ def login():
                 jsonify({"success": False, "message": "Credenciales incorrectas"}),
                 401,
             )
+    except PasswordHasherBusy:
+        return password_hasher_busy_response()
     except Exception as e:
         logger.error(f"Error en login: {e}")
         return jsonify({"success": False, "message": "Error en el servidor"}), 500
@@ -885,7 +1407,7 @@ def register():
             )
 
         user = User(email=email, name=name, auth_provider="local")
-        user.set_password(password)
+        user.set_password(password, password_hasher)
 
         db.session.add(user)
         db.session.commit()
@@ -895,6 +1417,9 @@ def register():
             jsonify({"success": True, "message": "Usuario registrado exitosamente"}),
             201,
         )
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return password_hasher_busy_response()
     except Exception as e:
         logger.error(f"Error en registro: {e}")
         db.session.rollback()
@@ -909,10 +1434,8 @@ def google_auth():
     token = data.get("token")
 
     try:
-        # Verificar el token de Google
-        idinfo = id_token.verify_oauth2_token(
-            token, google_requests.Request(), GOOGLE_CLIENT_ID
-        )
+        # Verificar el token de Google (en local salvo que caduquen los certificados)
+        idinfo = google_verifier.verify(token, GOOGLE_CLIENT_ID)
 
         # Verificar que idinfo es un diccionario
         if not isinstance(idinfo, dict):
@@ -934,6 +1457,7 @@ def google_auth():
         if not user:
             user = User.query.filter_by(email=email).first()
 
+        profile_changed = False
         if not user:
             user = User(
                 email=email,
@@ -945,11 +1469,16 @@ def google_auth():
             db.session.add(user)
         else:
             # Actualizar información si ya existe
+            profile_changed = (
+                user.profile_picture != picture or user.auth_provider != "google"
+            )
             user.google_id = google_id
             user.profile_picture = picture
             user.auth_provider = "google"
 
         db.session.commit()
+        if profile_changed:
+            user_cache.bump()
 
         # Establecer sesión
         session["user_id"] = user.id
@@ -1154,7 +1683,7 @@ def reset_password():
 
         user = User.query.filter_by(email=reset_token.email).first()
         if user:
-            user.set_password(new_password)
+            user.set_password(new_password, password_hasher)
             reset_token.used = True
             db.session.commit()
             logger.info(f"Contraseña restablecida para: {reset_token.email}")
@@ -1166,6 +1695,9 @@ def reset_password():
             )
 
         return jsonify({"success": False, "message": "Usuario no encontrado"}), 404
+    except PasswordHasherBusy:
+        db.session.rollback()
+        return password_hasher_busy_response()
     except Exception as e:
         logger.error(f"Error en reset_password: {e}")
         db.session.rollback()
@@ -1181,15 +1713,21 @@ def profile():
     if "user_id" not in session:
         return redirect(url_for("login_page"))
 
-    user = User.query.get(session["user_id"])
+    user = current_user()
     if not user:
         session.clear()
         return redirect(url_for("login_page"))
 
     # Obtener compras del usuario
     purchases = Purchase.query.filter_by(user_id=user.id, status="completed").all()
+    comment_count = Comment.query.filter_by(user_id=user.id).count()
 
-    return render_template("user/profile.html", user=user, purchases=purchases)
+    return render_template(
+        "user/profile.html",
+        user=user,
+        purchases=purchases,
+        comment_count=comment_count,
+    )
 
 
 @app.route("/profile/update", methods=["POST"])
@@ -1209,6 +1747,7 @@ def update_profile():
         user.name = name
         session["user_name"] = name
         db.session.commit()
+        user_cache.bump()
 
         return (
             jsonify({"success": True, "message": "Perfil actualizado exitosamente"}),
@@ -1260,23 +1799,31 @@ def upload_profile_picture():
         if not user:
             return jsonify({"success": False, "message": "Usuario no encontrado"}), 404
 
-        # Generar nombre único y sanitizado
-        ext = file.filename.rsplit(".", 1)[1].lower()
-        filename = f"user_{user.id}_{secrets.token_hex(8)}.{ext}"
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], "profiles", filename)
-
-        # Guardar archivo
-        file.save(filepath)
+        if image_pool.saturated():
+            return image_pool_busy_response()
 
-        # Optimizar imagen
-        optimize_image(filepath, max_size=(400, 400))
+        # Guardar archivo; se optimiza y se mueve al almacén en segundo plano
+        filepath, picture_url = stage_image(file)
 
         # Actualizar en base de datos
         old_picture = user.profile_picture
-        user.profile_picture = f"/static/uploads/profiles/{filename}"
+        user.profile_picture = picture_url
         db.session.commit()
+        user_cache.bump()
+        image_job = start_image_job(
+            "profile",
+            [
+                {
+                    "path": filepath,
+                    "url": picture_url,
+                    "max_size": PROFILE_IMAGE_SIZE,
+                    "store": image_blobs.root,
+                }
+            ],
+            user.id,
+        )
 
-        # Eliminar imagen anterior si existe
+        # Eliminar imagen anterior si existe (los blobs pueden estar compartidos)
         if old_picture and old_picture.startswith("/static/uploads/profiles/"):
             try:
                 old_path = old_picture.replace("/static/", "static/")
@@ -1292,6 +1839,7 @@ def upload_profile_picture():
                     "success": True,
                     "message": "Foto de perfil actualizada",
                     "profile_picture": user.profile_picture,
+                    "image_job": image_job,
                 }
             ),
             200,
@@ -1330,8 +1878,18 @@ def delete_account():
                 403,
             )
 
+        # Los comentarios se borran en cascada: descontarlos de los agregados
+        for comment in user.comments:
+            if comment.map:
+                comment.map.apply_rating(comment.rating, -1)
+        BackgroundJob.query.filter_by(user_id=user.id).delete()
+        ChunkedUpload.query.filter_by(user_id=user.id).delete()
+        Notification.query.filter_by(user_id=user.id).delete()
+
         db.session.delete(user)
         db.session.commit()
+        catalog_cache.bump()
+        user_cache.bump()
         session.clear()
 
         logger.info(f"Cuenta eliminada: {user.email}")
@@ -1348,27 +1906,284 @@ def delete_account():
 # ==================== MAPAS ====================
 
 
+# Paginación por cursor (keyset) del catálogo: columna de orden + id como desempate
+CATALOG_PAGE_SIZE = 12
+CATALOG_MAX_PAGE_SIZE = 50
+CATALOG_SORTS = {
+    "newest": (Map.created_at, "desc"),
+    "price_asc": (Map.price, "asc"),
+    "price_desc": (Map.price, "desc"),
+    "rating": (Map.rating_avg, "desc"),
+}
+CATALOG_SORT_ALIASES = {"price": "price_asc"}
+
+
+def encode_cursor(value, map_id):
+    """Codifica la posición (valor de orden, id) del último mapa de la página"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, map_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort):
+    """Decodifica un cursor de encode_cursor; lanza BadRequest si es inválido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, map_id = json.loads(raw)
+        if sort == "newest":
+            value = datetime.fromisoformat(value)
+        else:
+            value = float(value)
+        return value, int(map_id)
+    except (ValueError, TypeError):
+        raise BadRequest("Cursor inválido")
+
+
+def parse_bool_arg(value):
+    """Convierte 'true'/'false' (y variantes) de la query string a bool"""
+    value = value.lower()
+    if value in ("true", "1", "yes"):
+        return True
+    if value in ("false", "0", "no"):
+        return False
+    raise BadRequest(f"Valor booleano inválido: {value}")
+
+
+def query_catalog_page(args, limit=CATALOG_PAGE_SIZE):
+    """Devuelve (mapas, next_cursor) de una página del catálogo.
+
+    `args` acepta los parámetros de /api/maps: sort, cursor, is_premium,
+    is_featured, min_price y max_price. Cada página es una sola consulta que
+    recorre el índice compuesto correspondiente, sin OFFSET.
+    """
+    sort = args.get("sort", "newest")
+    sort = CATALOG_SORT_ALIASES.get(sort, sort)
+    if sort not in CATALOG_SORTS:
+        raise BadRequest(f"Orden inválido: {sort}")
+    column, direction = CATALOG_SORTS[sort]
+
+    query = Map.query
+    try:
+        if args.get("is_premium"):
+            query = query.filter(Map.is_premium == parse_bool_arg(args["is_premium"]))
+        if args.get("is_featured"):
+            query = query.filter(Map.is_featured == parse_bool_arg(args["is_featured"]))
+        if args.get("min_price"):
+            query = query.filter(Map.price >= float(args["min_price"]))
+        if args.get("max_price"):
+            query = query.filter(Map.price <= float(args["max_price"]))
+    except ValueError:
+        raise BadRequest("Rango de precio inválido")
+
+    if args.get("cursor"):
+        value, last_id = decode_cursor(args["cursor"], sort)
+        position = db.tuple_(column, Map.id)
+        if direction == "desc":
+            query = query.filter(position < db.tuple_(value, last_id))
+        else:
+            query = query.filter(position > db.tuple_(value, last_id))
+
+    if direction == "desc":
+        query = query.order_by(column.desc(), Map.id.desc())
+    else:
+        query = query.order_by(column.asc(), Map.id.asc())
+
+    # Pedir un elemento extra para saber si hay página siguiente
+    maps = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(maps) > limit:
+        maps = maps[:limit]
+        last = maps[-1]
+        next_cursor = encode_cursor(getattr(last, column.key), last.id)
+
+    return maps, next_cursor
+
+
+def catalog_page_limit():
+    """Tamaño de página pedido con ?limit=, acotado a CATALOG_MAX_PAGE_SIZE"""
+    limit = request.args.get("limit", CATALOG_PAGE_SIZE, type=int)
+    return max(1, min(limit, CATALOG_MAX_PAGE_SIZE))
+
+
+def catalog_cache_key(*parts, args=None):
+    """Clave de caché a partir de un prefijo y los parámetros de la query string"""
+    if args is not None:
+        parts += (tuple(sorted(args.items(multi=True))),)
+    return parts
+
+
+def render_catalog_cards(view, args, limit=CATALOG_PAGE_SIZE):
+    """HTML de las tarjetas de una página del catálogo y su next_cursor (cacheado)"""
+    template = (
+        "partials/map_card_home.html" if view == "home" else "partials/map_card.html"
+    )
+
+    def build():
+        maps, next_cursor = query_catalog_page(args, limit)
+        html = "".join(render_template(template, map=m) for m in maps)
+        return html, next_cursor
+
+    return catalog_cache.get_or_set(
+        catalog_cache_key("cards", view, limit, args=MultiDict(args)), build
+    )
+
+
+def json_body_response(body, status=200):
+    """Respuesta JSON a partir de un cuerpo ya serializado (p. ej. desde la caché)"""
+    return app.response_class(body, status=status, mimetype="application/json")
+
+
+# Subir al cambiar la forma de to_dict()/las respuestas de la API de mapas:
+# las ETags de un despliegue anterior dejan de coincidir
+API_SCHEMA_VERSION = 1
+
+
+def map_version_tag(map_obj):
+    """Parte de la ETag de un mapa: cambia con updated_at y con sus reseñas"""
+    updated_at = map_obj.updated_at or map_obj.created_at
+    return (
+        f"{map_obj.id}:{updated_at.isoformat() if updated_at else ''}:"
+        f"{map_obj.review_count}:{map_obj.rating_sum}"
+    )
+
+
+def make_etag(*parts):
+    """ETag fuerte a partir de las partes de versión de uno o varios mapas"""
+    parts = (API_SCHEMA_VERSION, *parts)
+    return hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def maps_last_modified(maps):
+    """Fecha de la última modificación entre los mapas dados (UTC, sin microsegundos)"""
+    dates = [m.updated_at or m.created_at for m in maps if m.updated_at or m.created_at]
+    if not dates:
+        return None
+    return max(dates).replace(microsecond=0, tzinfo=timezone.utc)
+
+
+def is_not_modified(etag, last_modified=None):
+    """True si la petición condicional ya tiene esta versión (If-None-Match manda).
+
+    Comparación débil: las respuestas comprimidas devuelven la ETag como W/"...".
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional_json_response(body, etag, last_modified=None):
+    """Respuesta JSON con ETag/Last-Modified, o 304 si el cliente ya la tiene.
+
+    `body` puede ser el JSON serializado o una función que lo genere, para no
+    serializar nada cuando la respuesta va a ser 304.
+    """
+    if is_not_modified(etag, last_modified):
+        response = app.response_class(status=304)
+    else:
+        response = json_body_response(body() if callable(body) else body)
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # El navegador puede guardar la respuesta pero debe revalidarla siempre
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+
 @app.route("/api/maps")
 def get_maps():
-    """Obtener lista de mapas"""
-    maps = Map.query.all()
-    return jsonify([m.to_dict() for m in maps]), 200
+    """Obtener una página del catálogo de mapas (paginación por cursor)"""
+    limit = catalog_page_limit()
+
+    def build():
+        maps, next_cursor = query_catalog_page(request.args, limit)
+        body = app.json.dumps(
+            {"maps": [m.to_dict() for m in maps], "next_cursor": next_cursor}
+        )
+        etag = make_etag(next_cursor, *(map_version_tag(m) for m in maps))
+        return body, etag, maps_last_modified(maps)
+
+    try:
+        body, etag, last_modified = catalog_cache.get_or_set(
+            catalog_cache_key("api_maps", limit, args=request.args), build
+        )
+    except BadRequest as e:
+        return jsonify({"error": e.description}), 400
+
+    return conditional_json_response(body, etag, last_modified)
+
+
+SEARCH_MAX_QUERY_LENGTH = 200
+
+
+def render_search_marks(text):
+    """Escapa el fragmento de búsqueda y convierte los delimitadores en <mark>"""
+    return (
+        str(escape(text or ""))
+        .replace(SEARCH_MARK_OPEN, "<mark>")
+        .replace(SEARCH_MARK_CLOSE, "</mark>")
+    )
+
+
+@app.route("/api/maps/search")
+def search_maps_api():
+    """Buscar mapas por texto (FTS5, ordenado por relevancia BM25)"""
+    query_text = request.args.get("q", "").strip()
+    if not query_text:
+        return jsonify({"error": "Parámetro 'q' requerido"}), 400
+    if len(query_text) > SEARCH_MAX_QUERY_LENGTH:
+        return jsonify({"error": "Búsqueda demasiado larga"}), 400
+
+    results = search_maps(query_text, catalog_page_limit())
+    for result in results:
+        for key in ("title_highlight", "description_snippet", "features_snippet"):
+            result[key] = render_search_marks(result[key])
+
+    return jsonify({"query": query_text, "results": results}), 200
+
+
+@app.route("/maps/cards")
+def get_map_cards():
+    """Tarjetas HTML de la siguiente página del catálogo ("Cargar más")"""
+    view = request.args.get("view", "inicio")
+    if view == "home" and "user_id" not in session:
+        return jsonify({"error": "Debes iniciar sesión"}), 401
+
+    try:
+        html, next_cursor = render_catalog_cards(
+            view, request.args, catalog_page_limit()
+        )
+    except BadRequest as e:
+        return jsonify({"error": e.description}), 400
+
+    return jsonify({"html": html, "next_cursor": next_cursor}), 200
 
 
 @app.route("/api/maps/<int:map_id>")
 def get_map(map_id):
     """Obtener detalles de un mapa"""
     map_obj = Map.query.get_or_404(map_id)
-    comments = (
-        Comment.query.filter_by(map_id=map_id).order_by(Comment.created_at.desc()).all()
-    )
 
-    return (
-        jsonify(
-            {"map": map_obj.to_dict(), "comments": [c.to_dict() for c in comments]}
-        ),
-        200,
-    )
+    def build():
+        # Primera página de comentarios con sus autores en la misma consulta
+        comments, next_cursor = query_comments_page(map_id, {})
+        return app.json.dumps(
+            {
+                "map": map_obj.to_dict(),
+                "comments": [c.to_dict() for c in comments],
+                "next_cursor": next_cursor,
+            }
+        )
+
+    # Los comentarios llevan nombre y foto de su autor: la versión de la caché
+    # de usuarios (cambia con cada edición de perfil) entra en la ETag. Sin
+    # Last-Modified, porque la fecha del mapa no refleja esos cambios.
+    etag = make_etag("map", map_version_tag(map_obj), user_cache.current_version())
+    # Los comentarios solo se cargan si el cliente no tiene ya esta versión
+    return conditional_json_response(build, etag)
 
 
 @app.route("/api/maps/<int:map_id>/comment", methods=["POST"])
@@ -1408,6 +2223,8 @@ def add_comment(map_id):
     if existing_comment:
         return jsonify({"success": False, "message": "Ya has comentado este mapa"}), 400
 
+    map_obj = Map.query.get_or_404(map_id)
+
     comment = Comment(
         user_id=session["user_id"],
         map_id=map_id,
@@ -1415,8 +2232,11 @@ def add_comment(map_id):
         comment=comment_text,
     )
 
+    # El comentario y los agregados del mapa se guardan en la misma transacción
     db.session.add(comment)
+    map_obj.apply_rating(comment.rating, 1)
     db.session.commit()
+    catalog_cache.bump()
 
     return (
         jsonify(
@@ -1437,30 +2257,132 @@ def add_comment(map_id):
 def check_session():
     """Verificar si el usuario está logueado"""
     if "user_id" in session:
-        user = User.query.get(session["user_id"])
+        user = current_user()
         if user:
             return jsonify({"logged_in": True, "user": user.to_dict()}), 200
 
     return jsonify({"logged_in": False}), 200
 
 
-@app.route("/api/map/<int:map_id>")
-def get_map_details(map_id):
-    """Obtener detalles de un mapa"""
-    map_obj = Map.query.get_or_404(map_id)
-    return jsonify(
-        {
-            "id": map_obj.id,
-            "title": map_obj.title,
-            "description": map_obj.description,
-            "price": map_obj.price,
-            "image": map_obj.image,
-            "gallery_images": map_obj.gallery_images,
-            "is_premium": map_obj.is_premium,
-            "is_featured": map_obj.is_featured,
-            "features": map_obj.features,
+# Campos de /api/map/<id>; /api/maps/batch permite elegir un subconjunto
+MAP_DETAIL_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "price",
+    "image",
+    "gallery_images",
+    "is_premium",
+    "is_featured",
+    "features",
+)
+MAP_BATCH_EXTRA_FIELDS = ("average_rating", "total_reviews")
+MAP_BATCH_MAX_IDS = 100
+
+# Columnas que siempre hacen falta para calcular la ETag de un mapa
+MAP_VERSION_COLUMNS = ("id", "created_at", "updated_at", "review_count", "rating_sum")
+
+
+def map_details_dict(map_obj, fields=MAP_DETAIL_FIELDS):
+    """Serializa los campos pedidos de un mapa (los métodos se evalúan)"""
+    data = {}
+    for field in fields:
+        value = getattr(map_obj, field)
+        data[field] = value() if callable(value) else value
+    return data
+
+
+def map_details_etag(map_obj):
+    """ETag de /api/map/<id>; /api/maps/batch la repite por mapa"""
+    return make_etag("details", map_version_tag(map_obj))
+
+
+@app.route("/api/map/<int:map_id>")
+def get_map_details(map_id):
+    """Obtener detalles de un mapa"""
+
+    def build():
+        map_obj = Map.query.get_or_404(map_id)
+        body = app.json.dumps(map_details_dict(map_obj))
+        return body, map_details_etag(map_obj), maps_last_modified([map_obj])
+
+    body, etag, last_modified = catalog_cache.get_or_set(("map_details", map_id), build)
+    return conditional_json_response(body, etag, last_modified)
+
+
+def parse_batch_ids(values):
+    """Lee ids de '?ids=1,2,3' (o ids repetidos) sin duplicados y en orden"""
+    ids = []
+    for value in values:
+        for part in value.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if not part.isdigit():
+                raise BadRequest(f"Id inválido: {part}")
+            map_id = int(part)
+            if map_id not in ids:
+                ids.append(map_id)
+    if not ids:
+        raise BadRequest("Parámetro 'ids' requerido")
+    if len(ids) > MAP_BATCH_MAX_IDS:
+        raise BadRequest(f"Máximo {MAP_BATCH_MAX_IDS} mapas por petición")
+    return ids
+
+
+def parse_batch_fields(value):
+    """Lee '?fields=title,price' validando contra los campos permitidos"""
+    if not value:
+        return MAP_DETAIL_FIELDS
+    allowed = MAP_DETAIL_FIELDS + MAP_BATCH_EXTRA_FIELDS
+    fields = ["id"]
+    for field in value.split(","):
+        field = field.strip()
+        if field not in allowed:
+            raise BadRequest(f"Campo inválido: {field}")
+        if field not in fields:
+            fields.append(field)
+    return tuple(fields)
+
+
+@app.route("/api/maps/batch")
+def get_maps_batch():
+    """Detalles de varios mapas en una sola consulta (?ids=1,2,3&fields=...)"""
+    try:
+        ids = parse_batch_ids(request.args.getlist("ids"))
+        fields = parse_batch_fields(request.args.get("fields"))
+    except BadRequest as e:
+        return jsonify({"error": e.description}), 400
+
+    def build():
+        # Solo se leen las columnas pedidas: sin 'description' no se carga el texto
+        columns = set(MAP_VERSION_COLUMNS) | {
+            f for f in fields if f in MAP_DETAIL_FIELDS
         }
+        maps = (
+            Map.query.options(db.load_only(*(getattr(Map, c) for c in columns)))
+            .filter(Map.id.in_(ids))
+            .all()
+        )
+        by_id = {m.id: m for m in maps}
+        found = [by_id[map_id] for map_id in ids if map_id in by_id]
+
+        items = []
+        for map_obj in found:
+            item = map_details_dict(map_obj, fields)
+            item["etag"] = f'"{map_details_etag(map_obj)}"'
+            items.append(item)
+
+        body = app.json.dumps(
+            {"maps": items, "missing": [i for i in ids if i not in by_id]}
+        )
+        etag = make_etag("batch", fields, *(map_version_tag(m) for m in found))
+        return body, etag, maps_last_modified(found)
+
+    body, etag, last_modified = catalog_cache.get_or_set(
+        ("map_batch", tuple(ids), fields), build
     )
+    return conditional_json_response(body, etag, last_modified)
 
 
 @app.route("/checkout/<int:map_id>")
@@ -1469,7 +2391,7 @@ def checkout_page(map_id):
     if "user_id" not in session:
         return redirect("/login-page")
 
-    user = User.query.get(session["user_id"])
+    user = current_user()
     map_obj = Map.query.get_or_404(map_id)
 
     # Verificar si ya compró el mapa
@@ -1654,7 +2576,7 @@ def payment_success(map_id=None, purchase_id=None):
         "user/payment_confirmation.html",
         purchase=purchase,
         map=map_obj,
-        user=User.query.get(session["user_id"]),
+        user=current_user(),
     )
 
 
@@ -1711,7 +2633,215 @@ def payment_cancel(map_id):
     return redirect(url_for("home"))
 
 
-# ==================== API DE DESCARGAS ====================
+# ==================== DESCARGAS DE MAPAS ====================
+
+
+# Archivos de mapas direccionados por contenido dentro del almacenamiento privado
+map_file_blobs = BlobStore(os.path.join(app.config["MAP_FILES_FOLDER"], "blobs"))
+
+
+def save_map_file(map_file):
+    """Guarda el archivo del mapa en el almacén privado, hasheándolo al escribir.
+
+    Un archivo idéntico a otro ya subido no se guarda dos veces. Devuelve el
+    download_link: la ruta relativa a MAP_FILES_FOLDER.
+    """
+    ext = os.path.splitext(secure_filename(map_file.filename))[1]
+    key = map_file_blobs.save_stream(map_file.stream, ext)[0]
+    return f"blobs/{key}"
+
+
+def finish_archive_job(job_id, map_id, link, result, error):
+    """Callback del pool: guarda el manifiesto del archivo en el mapa"""
+    try:
+        with app.app_context():
+            job = db.session.get(BackgroundJob, job_id)
+            map_obj = db.session.get(Map, map_id)
+            if error or result["error"]:
+                error = str(error or result["error"])
+                manifest = {"error": error}
+            else:
+                manifest = result["manifest"]
+            # Si el archivo cambió mientras se analizaba, el manifiesto ya no vale
+            if map_obj and map_obj.download_link == link:
+                map_obj.archive_manifest = json.dumps(manifest)
+            if job:
+                job.processed = 0 if error else 1
+                job.status = "failed" if error else "done"
+                job.error = error
+                job.finished_at = datetime.utcnow()
+            db.session.commit()
+            payload = job.to_dict() if job else None
+            user_id = job.user_id if job else None
+            db.session.remove()
+
+        catalog_cache.bump()
+        if error:
+            logger.error(f"No se pudo leer el archivo del mapa {map_id}: {error}")
+        if payload:
+            socketio.emit("job_done", payload, to=f"user_{user_id}")
+    except Exception as e:
+        logger.error(f"Error guardando el manifiesto del mapa {map_id}: {e}")
+
+
+def start_archive_job(map_obj, user_id):
+    """Lee en el pool el directorio central del archivo del mapa.
+
+    Solo se analizan .zip/.mcworld; nada se extrae a disco. Llamar después
+    del commit de la ruta; devuelve el dict del trabajo o None.
+    """
+    map_obj.archive_manifest = None
+    path = map_file_path(map_obj)
+    ext = os.path.splitext(path or "")[1].lower().lstrip(".")
+    if not path or ext not in ARCHIVE_MANIFEST_EXTENSIONS:
+        db.session.commit()
+        return None
+
+    job = BackgroundJob(
+        id=secrets.token_hex(12),
+        user_id=user_id,
+        map_id=map_obj.id,
+        kind="archive",
+        total=1,
+    )
+    db.session.add(job)
+    db.session.commit()
+    job_id, map_id, link = job.id, map_obj.id, map_obj.download_link
+
+    try:
+        image_pool.submit(
+            path,
+            lambda result, error: finish_archive_job(
+                job_id, map_id, link, result, error
+            ),
+            fn=archive_manifest_task,
+        )
+    except Exception as e:
+        logger.error(f"Pool no disponible, leyendo el archivo en línea: {e}")
+        finish_archive_job(job_id, map_id, link, archive_manifest_task(path), None)
+        db.session.refresh(job)
+
+    return job.to_dict()
+
+
+def map_file_integrity(link):
+    """(sha256 hex, valor de integridad "sha256-<base64>") de un archivo en el almacén"""
+    digest = blob_sha256(link)
+    if not digest:
+        return None, None
+    return digest, "sha256-" + base64.b64encode(bytes.fromhex(digest)).decode()
+
+
+def resolve_download_link(link):
+    """Ruta en disco de un download_link o None si no existe.
+
+    Solo se sirven rutas relativas al almacenamiento privado; los enlaces
+    antiguos /static/uploads/... se migran antes con migrate_legacy_map_file.
+    """
+    if not link or link.startswith("/static/"):
+        return None
+    path = safe_join(app.config["MAP_FILES_FOLDER"], link)
+    return path if path and os.path.isfile(path) else None
+
+
+def migrate_legacy_map_file(map_obj):
+    """Mueve al almacén de blobs el archivo de un mapa con enlace /static/...
+
+    Los mapas subidos antes de las descargas protegidas guardaban el archivo
+    en static/uploads/maps/<título>/. Devuelve True si se migró.
+    """
+    link = map_obj.download_link
+    if not link or not link.startswith("/static/"):
+        return False
+    source = safe_join(app.static_folder, link[len("/static/") :])
+    if not source or not os.path.isfile(source):
+        return False
+    try:
+        key = map_file_blobs.ingest(source)[0]
+    except FileNotFoundError:
+        # Otro hilo lo migró a la vez: leer el enlace que guardó
+        db.session.refresh(map_obj)
+        return False
+    map_obj.download_link = f"blobs/{key}"
+    db.session.commit()
+    logger.info(f"Archivo del mapa {map_obj.id} migrado a {map_obj.download_link}")
+    return True
+
+
+def map_file_path(map_obj):
+    """Ruta en disco del archivo del mapa o None si no existe"""
+    migrate_legacy_map_file(map_obj)
+    return resolve_download_link(map_obj.download_link)
+
+
+def map_download_name(map_obj, path):
+    """Nombre de archivo que verá el usuario: título del mapa + extensión real"""
+    return f"{map_obj.title}{os.path.splitext(path)[1] or '.zip'}"
+
+
+# Firma HMAC de los enlaces de descarga; la clave se deriva de SECRET_KEY
+download_signer = URLSafeTimedSerializer(app.config["SECRET_KEY"], salt="map-download")
+
+
+def make_download_url(user_id, map_obj, path):
+    """Enlace firmado y con caducidad que liga usuario, mapa y archivo.
+
+    El token lleva todo lo necesario para servir el archivo, así cada
+    petición (p. ej. los rangos paralelos de un gestor de descargas) se
+    verifica sin sesión ni base de datos.
+    """
+    token = download_signer.dumps(
+        [user_id, map_obj.id, map_obj.download_link, map_download_name(map_obj, path)]
+    )
+    return url_for("download_signed_file", token=token)
+
+
+def send_map_file(link, path, download_name, immutable=False):
+    """Envía el archivo del mapa con soporte de Range/If-Range.
+
+    Con DOWNLOAD_ACCEL_PREFIX, nginx sirve el archivo desde una location
+    interna (X-Accel-Redirect); con USE_X_SENDFILE lo hace el servidor web.
+    En ambos casos el hilo de Python queda libre de inmediato. Los archivos
+    del almacén usan su SHA-256 como ETag fuerte y envían Repr-Digest.
+    """
+    accel_prefix = app.config["DOWNLOAD_ACCEL_PREFIX"]
+    digest, _ = map_file_integrity(link)
+
+    if accel_prefix and not link.startswith("/static/"):
+        response = app.response_class(mimetype="application/octet-stream")
+        response.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{quote(link)}"
+        response.headers["Content-Disposition"] = (
+            f"attachment; filename*=UTF-8''{quote(download_name)}"
+        )
+    else:
+        # conditional=True: Werkzeug responde 206 a Range e If-Range
+        try:
+            response = send_file(
+                path,
+                mimetype="application/octet-stream",
+                as_attachment=True,
+                download_name=download_name,
+                conditional=True,
+                etag=digest or True,
+                max_age=0,
+            )
+        except RequestedRangeNotSatisfiable:
+            response = jsonify({"error": "Rango no válido"})
+            response.status_code = 416
+            response.headers["Content-Range"] = f"bytes */{os.path.getsize(path)}"
+            return response
+        response.headers["Accept-Ranges"] = "bytes"
+
+    if digest:
+        response.set_etag(digest)
+        response.headers["Repr-Digest"] = (
+            f"sha-256=:{base64.b64encode(bytes.fromhex(digest)).decode()}:"
+        )
+    if digest and immutable:
+        response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 
 @app.route("/api/download/<int:map_id>")
@@ -1730,23 +2860,73 @@ def download_map(map_id):
 
     map_obj = Map.query.get_or_404(map_id)
 
-    if not map_obj.download_link:
+    path = map_file_path(map_obj)
+    if not path:
         return jsonify({"error": "Archivo de descarga no disponible"}), 404
 
-    # En producción, aquí enviarías el archivo real
-    # Por ahora enviamos el enlace de descarga
+    sha256, integrity = map_file_integrity(map_obj.download_link)
     return (
         jsonify(
             {
                 "success": True,
-                "download_url": map_obj.download_link,
-                "filename": f"{map_obj.title}.zip",
+                "download_url": make_download_url(session["user_id"], map_obj, path),
+                "expires_in": app.config["DOWNLOAD_URL_TTL"],
+                "filename": map_download_name(map_obj, path),
+                "size": os.path.getsize(path),
+                "sha256": sha256,
+                "integrity": integrity,
             }
         ),
         200,
     )
 
 
+@app.route("/api/download/<int:map_id>/file")
+@limiter.limit("60 per minute")
+def download_map_file(map_id):
+    """Descargar el archivo de un mapa comprado (reanudable con Range)"""
+    if "user_id" not in session:
+        return jsonify({"error": "Debes iniciar sesión"}), 401
+
+    purchase = Purchase.query.filter_by(
+        user_id=session["user_id"], map_id=map_id, status="completed"
+    ).first()
+
+    if not purchase:
+        return jsonify({"error": "No has comprado este mapa"}), 403
+
+    map_obj = Map.query.get_or_404(map_id)
+
+    path = map_file_path(map_obj)
+    if not path:
+        return jsonify({"error": "Archivo de descarga no disponible"}), 404
+
+    return send_map_file(
+        map_obj.download_link, path, map_download_name(map_obj, path)
+    )
+
+
+@app.route("/download/<token>")
+@limiter.limit("300 per minute")
+def download_signed_file(token):
+    """Descargar con un enlace firmado: sin sesión ni consultas a la base de datos"""
+    try:
+        _user_id, _map_id, link, download_name = download_signer.loads(
+            token, max_age=app.config["DOWNLOAD_URL_TTL"]
+        )
+    except SignatureExpired:
+        return jsonify({"error": "El enlace de descarga expiró"}), 410
+    except (BadSignature, ValueError):
+        return jsonify({"error": "Enlace de descarga no válido"}), 403
+
+    path = resolve_download_link(link)
+    if not path:
+        return jsonify({"error": "Archivo de descarga no disponible"}), 404
+
+    # El token fija el archivo: si es un blob, su contenido no cambia nunca
+    return send_map_file(link, path, download_name, immutable=True)
+
+
 @app.route("/api/purchase/details/<int:purchase_id>")
 def purchase_details(purchase_id):
     """Obtener detalles de una compra"""
@@ -1844,7 +3024,7 @@ def checkout():
         return redirect(url_for("index"))
 
     map_obj = Map.query.get_or_404(map_id)
-    user = User.query.get(session["user_id"])
+    user = current_user()
 
     return render_template("user/checkout.html", map=map_obj, user=user)
 
@@ -1883,9 +3063,44 @@ def admin_dashboard():
         recent_purchases=recent_purchases,
         recent_comments=recent_comments,
         maps=maps,
+        cache_stats=catalog_cache.stats(),
     )
 
 
+@app.route("/api/jobs/<job_id>")
+@app.route("/api/image-jobs/<job_id>")
+def get_background_job(job_id):
+    """Consultar el estado de un trabajo en segundo plano (dueño o admin)"""
+    if "user_id" not in session:
+        return jsonify({"success": False, "error": "No autenticado"}), 401
+
+    job = db.session.get(BackgroundJob, job_id)
+    if not job or (
+        job.user_id != session["user_id"] and not session.get("is_admin")
+    ):
+        return jsonify({"success": False, "error": "Trabajo no encontrado"}), 404
+
+    return jsonify({"success": True, "job": job.to_dict()}), 200
+
+
+@app.route("/admin/cache-stats")
+def get_cache_stats():
+    """Ver contadores de la caché del catálogo de este worker (solo admin)"""
+    if "user_id" not in session or not session.get("is_admin"):
+        return jsonify({"success": False, "error": "No autorizado"}), 403
+
+    return jsonify(catalog_cache.stats()), 200
+
+
+@app.route("/admin/password-hasher-stats")
+def get_password_hasher_stats():
+    """Ver la cola y los tiempos del pool de hashes de este worker (solo admin)"""
+    if "user_id" not in session or not session.get("is_admin"):
+        return jsonify({"success": False, "error": "No autorizado"}), 403
+
+    return jsonify(password_hasher.stats()), 200
+
+
 @app.route("/admin/upload-map", methods=["POST"])
 def upload_map():
     """Subir nuevo mapa (solo admin)"""
@@ -1905,10 +3120,12 @@ def upload_map():
     if not is_premium:
         price = "0"
 
-    # Crear carpeta específica para este mapa
-    map_folder_name = secure_filename(title.lower().replace(" ", "_"))
-    map_folder_path = os.path.join(app.config["UPLOAD_FOLDER"], "maps", map_folder_name)
-    os.makedirs(map_folder_path, exist_ok=True)
+    # Sin imágenes no hace falta el pool: el mapa se puede crear igualmente
+    if request_has_images("image", "gallery_images") and image_pool.saturated():
+        return image_pool_busy_response()
+
+    # Las imágenes se guardan en staging y se optimizan en segundo plano
+    image_tasks = []
 
     # Procesar imagen principal
     image_url = None
@@ -1919,13 +3136,8 @@ def upload_map():
             and image_file.filename
             and allowed_file(image_file.filename, ALLOWED_IMAGE_EXTENSIONS)
         ):
-            filename = secure_filename(
-                f"main.{image_file.filename.rsplit('.', 1)[1].lower()}"
-            )
-            filepath = os.path.join(map_folder_path, filename)
-            image_file.save(filepath)
-            optimize_image(filepath, max_size=(1200, 800))
-            image_url = f"/static/uploads/maps/{map_folder_name}/{filename}"
+            filepath, image_url = stage_image(image_file)
+            image_tasks.append(map_image_task(filepath, image_url))
 
     # Procesar archivo del mapa
     download_link = None
@@ -1936,30 +3148,21 @@ def upload_map():
             and map_file.filename
             and allowed_file(map_file.filename, ALLOWED_MAP_EXTENSIONS)
         ):
-            filename = secure_filename(map_file.filename)
-            filepath = os.path.join(map_folder_path, filename)
-            map_file.save(filepath)
-            download_link = f"/static/uploads/maps/{map_folder_name}/{filename}"
+            download_link = save_map_file(map_file)
 
     # Procesar galería de imágenes (múltiples archivos)
     gallery_urls = []
     if "gallery_images" in request.files:
         gallery_files = request.files.getlist("gallery_images")
-        for idx, gallery_file in enumerate(gallery_files):
+        for gallery_file in gallery_files:
             if (
                 gallery_file
                 and gallery_file.filename
                 and allowed_file(gallery_file.filename, ALLOWED_IMAGE_EXTENSIONS)
             ):
-                filename = secure_filename(
-                    f"gallery_{idx+1}.{gallery_file.filename.rsplit('.', 1)[1].lower()}"
-                )
-                filepath = os.path.join(map_folder_path, filename)
-                gallery_file.save(filepath)
-                optimize_image(filepath, max_size=(1200, 800))
-                gallery_urls.append(
-                    f"/static/uploads/maps/{map_folder_name}/{filename}"
-                )
+                filepath, gallery_url = stage_image(gallery_file)
+                image_tasks.append(map_image_task(filepath, gallery_url))
+                gallery_urls.append(gallery_url)
 
     # Si no hay imagen principal, usar la primera de la galería
     if not image_url and gallery_urls:
@@ -1980,6 +3183,13 @@ def upload_map():
 
     db.session.add(new_map)
     db.session.commit()
+    catalog_cache.bump()
+    image_job = start_image_job(
+        "map", image_tasks, session["user_id"], map_id=new_map.id
+    )
+    archive_job = (
+        start_archive_job(new_map, session["user_id"]) if download_link else None
+    )
 
     return (
         jsonify(
@@ -1987,6 +3197,8 @@ def upload_map():
                 "success": True,
                 "message": "Mapa subido exitosamente",
                 "map": new_map.to_dict(),
+                "image_job": image_job,
+                "archive_job": archive_job,
             }
         ),
         201,
@@ -2000,8 +3212,11 @@ def delete_map(map_id):
         return jsonify({"success": False, "message": "No autorizado"}), 403
 
     map_obj = Map.query.get_or_404(map_id)
+    BackgroundJob.query.filter_by(map_id=map_id).update({"map_id": None})
+    ChunkedUpload.query.filter_by(map_id=map_id).update({"map_id": None})
     db.session.delete(map_obj)
     db.session.commit()
+    catalog_cache.bump()
 
     return jsonify({"success": True, "message": "Mapa eliminado exitosamente"}), 200
 
@@ -2014,26 +3229,13 @@ def edit_map(map_id):
 
     map_obj = Map.query.get_or_404(map_id)
 
-    # Crear carpeta específica para este mapa si no existe
-    map_folder_name = secure_filename(map_obj.title.lower().replace(" ", "_"))
-    map_folder_path = os.path.join(app.config["UPLOAD_FOLDER"], "maps", map_folder_name)
-    os.makedirs(map_folder_path, exist_ok=True)
+    if request_has_images("image") and image_pool.saturated():
+        return image_pool_busy_response()
 
-    # Actualizar campos básicos
+    # Actualizar campos básicos (los archivos viven en el almacén de blobs,
+    # así que cambiar el título no mueve nada en disco)
     if "title" in request.form:
-        # Si cambia el título, crear nueva carpeta
-        new_title = request.form["title"]
-        if new_title != map_obj.title:
-            new_folder_name = secure_filename(new_title.lower().replace(" ", "_"))
-            new_folder_path = os.path.join(
-                app.config["UPLOAD_FOLDER"], "maps", new_folder_name
-            )
-            # Renombrar carpeta si existe
-            if os.path.exists(map_folder_path) and not os.path.exists(new_folder_path):
-                os.rename(map_folder_path, new_folder_path)
-                map_folder_path = new_folder_path
-                map_folder_name = new_folder_name
-        map_obj.title = new_title
+        map_obj.title = request.form["title"]
 
     if "description" in request.form:
         map_obj.description = request.form["description"]
@@ -2046,28 +3248,36 @@ def edit_map(map_id):
     if "is_featured" in request.form:
         map_obj.is_featured = request.form["is_featured"].lower() == "true"
 
-    # Actualizar imagen principal
+    # Actualizar imagen principal (se optimiza en segundo plano)
+    image_tasks = []
     if "image" in request.files:
         image_file = request.files["image"]
         if image_file and allowed_file(image_file.filename, ALLOWED_IMAGE_EXTENSIONS):
-            filename = secure_filename(
-                f"main.{image_file.filename.rsplit('.', 1)[1].lower()}"
-            )
-            filepath = os.path.join(map_folder_path, filename)
-            image_file.save(filepath)
-            optimize_image(filepath, max_size=(1200, 800))
-            map_obj.image = f"/static/uploads/maps/{map_folder_name}/{filename}"
+            filepath, image_url = stage_image(image_file)
+            old_image = map_obj.image
+            map_obj.image = image_url
+            if old_image != map_obj.image and old_image not in json.loads(
+                map_obj.gallery_images or "[]"
+            ):
+                map_obj.set_image_variants(old_image, None)
+            image_tasks.append(map_image_task(filepath, map_obj.image))
 
     # Actualizar archivo del mapa
+    map_file_changed = False
     if "map_file" in request.files:
         map_file = request.files["map_file"]
         if map_file and allowed_file(map_file.filename, ALLOWED_MAP_EXTENSIONS):
-            filename = secure_filename(map_file.filename)
-            filepath = os.path.join(map_folder_path, filename)
-            map_file.save(filepath)
-            map_obj.download_link = f"/static/uploads/maps/{map_folder_name}/{filename}"
+            map_obj.download_link = save_map_file(map_file)
+            map_file_changed = True
 
     db.session.commit()
+    catalog_cache.bump()
+    image_job = start_image_job(
+        "map", image_tasks, session["user_id"], map_id=map_obj.id
+    )
+    archive_job = (
+        start_archive_job(map_obj, session["user_id"]) if map_file_changed else None
+    )
 
     return (
         jsonify(
@@ -2083,12 +3293,369 @@ def edit_map(map_id):
                     "is_premium": map_obj.is_premium,
                     "is_featured": map_obj.is_featured,
                 },
+                "image_job": image_job,
+                "archive_job": archive_job,
             }
         ),
         200,
     )
 
 
+# ==================== SUBIDAS POR PARTES (REANUDABLES) ====================
+
+
+def chunked_upload_paths(upload_id):
+    """(archivo de datos, carpeta de marcadores) de una subida por partes"""
+    folder = app.config["CHUNKED_UPLOAD_FOLDER"]
+    return (
+        os.path.join(folder, f"{upload_id}.part"),
+        os.path.join(folder, f"{upload_id}.chunks"),
+    )
+
+
+def received_chunks(upload_id):
+    """Índices de los fragmentos ya recibidos y verificados"""
+    _, parts_dir = chunked_upload_paths(upload_id)
+    try:
+        return {int(name) for name in os.listdir(parts_dir) if name.isdigit()}
+    except FileNotFoundError:
+        return set()
+
+
+def discard_chunked_upload(upload):
+    """Borra los archivos temporales y el registro de una subida"""
+    data_path, parts_dir = chunked_upload_paths(upload.id)
+    if os.path.exists(data_path):
+        os.remove(data_path)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    db.session.delete(upload)
+
+
+def cleanup_stale_uploads():
+    """Elimina las subidas sin terminar más antiguas que CHUNKED_UPLOAD_TTL_HOURS"""
+    limit = datetime.utcnow() - timedelta(hours=app.config["CHUNKED_UPLOAD_TTL_HOURS"])
+    # Una subida "finalizing" tan antigua es de un worker que murió a mitad
+    stale = ChunkedUpload.query.filter(
+        ChunkedUpload.status.in_(("uploading", "finalizing")),
+        ChunkedUpload.created_at < limit,
+    ).all()
+    for upload in stale:
+        discard_chunked_upload(upload)
+    if stale:
+        db.session.commit()
+    return len(stale)
+
+
+def get_chunked_upload(upload_id):
+    """Subida en curso del admin actual o None"""
+    upload = db.session.get(ChunkedUpload, upload_id)
+    if not upload or upload.user_id != session["user_id"]:
+        return None
+    return upload
+
+
+@app.route("/admin/uploads", methods=["POST"])
+def init_chunked_upload():
+    """Iniciar una subida por partes de un archivo de mapa (solo admin)"""
+    if "user_id" not in session or not session.get("is_admin"):
+        return jsonify({"success": False, "message": "No autorizado"}), 403
+
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get("filename") or "")
+    try:
+        total_size = int(data.get("size"))
+    except (TypeError, ValueError):
+        total_size = -1
+
+    if not allowed_file(filename, ALLOWED_MAP_EXTENSIONS):
+        return jsonify({"success": False, "message": "Formato de archivo no válido"}), 400
+    if not 0 <= total_size <= app.config["MAX_MAP_FILE_SIZE"]:
+        return jsonify({"success": False, "message": "Tamaño de archivo no válido"}), 400
+
+    map_id = data.get("map_id")
+    if map_id is not None and not db.session.get(Map, map_id):
+        return jsonify({"success": False, "message": "Mapa no encontrado"}), 404
+
+    folder = app.config["CHUNKED_UPLOAD_FOLDER"]
+    os.makedirs(folder, exist_ok=True)
+    if shutil.disk_usage(folder).free < total_size:
+        return jsonify({"success": False, "message": "Espacio en disco insuficiente"}), 507
+
+    upload = ChunkedUpload(
+        id=secrets.token_hex(16),
+        user_id=session["user_id"],
+        map_id=map_id,
+        filename=filename,
+        total_size=total_size,
+        chunk_size=app.config["UPLOAD_CHUNK_SIZE"],
+    )
+
+    # Archivo preasignado: cada fragmento se escribe en su posición
+    data_path, parts_dir = chunked_upload_paths(upload.id)
+    with open(data_path, "wb") as f:
+        f.truncate(total_size)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    db.session.add(upload)
+    db.session.commit()
+
+    return jsonify({"success": True, "upload": upload.to_dict()}), 201
+
+
+@app.route("/admin/uploads/<upload_id>", methods=["GET"])
+def get_chunked_upload_status(upload_id):
+    """Estado de una subida por partes: fragmentos recibidos para reanudar"""
+    if "user_id" not in session or not session.get("is_admin"):
+        return jsonify({"success": False, "message": "No autorizado"}), 403
+
+    upload = get_chunked_upload(upload_id)
+    if not upload:
+        return jsonify({"success": False, "message": "Subida no encontrada"}), 404
+
+    return (
+        jsonify({"success": True, "upload": upload.to_dict(received_chunks(upload.id))}),
+        200,
+    )
+
+
+@app.route("/admin/uploads/<upload_id>/chunks", methods=["PUT"])
+@limiter.limit("600 per minute")
+def upload_chunk(upload_id):
+    """Recibir un fragmento (?offset=N) y escribirlo en disco sin cargarlo entero.
+
+    Si llega la cabecera X-Chunk-SHA256, el fragmento solo se marca como
+    recibido cuando el hash coincide; si no, el cliente debe reenviarlo.
+    """
+    if "user_id" not in session or not session.get("is_admin"):
+        return jsonify({"success": False, "message": "No autorizado"}), 403
+
+    upload = get_chunked_upload(upload_id)
+    if not upload or upload.status != "uploading":
+        return jsonify({"success": False, "message": "Subida no encontrada"}), 404
+
+    offset = request.args.get("offset", type=int)
+    if offset is None or offset < 0 or offset % upload.chunk_size:
+        return jsonify({"success": False, "message": "Offset no válido"}), 400
+    index = offset // upload.chunk_size
+    if index >= upload.total_chunks():
+        return jsonify({"success": False, "message": "Offset fuera del archivo"}), 400
+
+    expected = upload.chunk_length(index)
+    if request.content_length is not None and request.content_length != expected:
+        return (
+            jsonify(
+                {"success": False, "message": f"El fragmento debe medir {expected} bytes"}
+            ),
+            400,
+        )
+
+    data_path, parts_dir = chunked_upload_paths(upload.id)
+    hasher = hashlib.sha256()
+    written = 0
+    with open(data_path, "r+b") as f:
+        f.seek(offset)
+        while True:
+            block = request.stream.read(64 * 1024)
+            if not block:
+                break
+            written += len(block)
+            if written > expected:
+                break
+            hasher.update(block)
+            f.write(block)
+
+    if written != expected:
+        return (
+            jsonify(
+                {"success": False, "message": f"El fragmento debe medir {expected} bytes"}
+            ),
+            400,
+        )
+
+    digest = hasher.hexdigest()
+    checksum = request.headers.get("X-Chunk-SHA256", "").strip().lower()
+    if checksum and not hmac.compare_digest(checksum, digest):
+        return (
+            jsonify({"success": False, "message": "El checksum del fragmento no coincide"}),
+            422,
+        )
+
+    marker_path = os.path.join(parts_dir, str(index))
+    with open(f"{marker_path}.tmp", "w", encoding="utf-8") as f:
+        f.write(digest)
+    os.replace(f"{marker_path}.tmp", marker_path)
+
+    return jsonify({"success": True, "index": index, "sha256": digest}), 200
+
+
+def finish_upload_job(job_id, upload_id, expected_sha256, result, error):
+    """Callback del pool: asocia al mapa el archivo ya movido al almacén"""
+    try:
+        with app.app_context():
+            job = db.session.get(BackgroundJob, job_id)
+            upload = db.session.get(ChunkedUpload, upload_id)
+            map_obj = db.session.get(Map, job.map_id) if job and job.map_id else None
+            _, parts_dir = chunked_upload_paths(upload_id)
+            shutil.rmtree(parts_dir, ignore_errors=True)
+
+            if not error and expected_sha256:
+                if not hmac.compare_digest(expected_sha256, result["sha256"]):
+                    error = "El checksum del archivo no coincide"
+                    if result["created"]:
+                        os.remove(map_file_blobs.path(result["key"]))
+            if not error and not map_obj:
+                error = "Mapa no encontrado"
+
+            if error:
+                error = str(error)
+                if upload:
+                    discard_chunked_upload(upload)
+            else:
+                map_obj.download_link = f"blobs/{result['key']}"
+                if upload:
+                    upload.map_id = map_obj.id
+                    upload.status = "complete"
+                    upload.completed_at = datetime.utcnow()
+            if job:
+                job.processed = 0 if error else 1
+                job.status = "failed" if error else "done"
+                job.error = error
+                job.finished_at = datetime.utcnow()
+            db.session.commit()
+            payload = job.to_dict() if job else None
+            user_id = job.user_id if job else None
+
+            archive_job = None
+            if not error:
+                catalog_cache.bump()
+                logger.info(
+                    f"Archivo de mapa subido por partes: {map_obj.download_link}"
+                )
+                archive_job = start_archive_job(map_obj, user_id)
+            db.session.remove()
+
+        if error:
+            logger.error(f"No se pudo finalizar la subida {upload_id}: {error}")
+        if payload:
+            payload["archive_job"] = archive_job
+            socketio.emit("job_done", payload, to=f"user_{user_id}")
+    except Exception as e:
+        logger.error(f"Error finalizando la subida {upload_id}: {e}")
+
+
+@app.route("/admin/uploads/<upload_id>/finalize", methods=["POST"])
+def finalize_chunked_upload(upload_id):
+    """Ensamblar la subida y asociar el archivo al mapa (solo admin).
+
+    El archivo ya está completo en disco; el SHA-256 (clave del blob, ETag e
+    integridad de las descargas) se calcula en el pool de procesos, porque los
+    fragmentos llegan en paralelo a distintos workers y leer varios GB aquí
+    superaría el timeout de gunicorn. Responde 202 con el trabajo; el
+    resultado llega con el evento job_done o en /api/jobs/<id>.
+    """
+    if "user_id" not in session or not session.get("is_admin"):
+        return jsonify({"success": False, "message": "No autorizado"}), 403
+
+    upload = get_chunked_upload(upload_id)
+    if not upload:
+        return jsonify({"success": False, "message": "Subida no encontrada"}), 404
+    if upload.status != "uploading":
+        return (
+            jsonify({"success": False, "message": "La subida ya se está finalizando"}),
+            409,
+        )
+
+    missing = set(range(upload.total_chunks())) - received_chunks(upload.id)
+    if missing:
+        return (
+            jsonify(
+                {
+                    "success": False,
+                    "message": "Faltan fragmentos",
+                    "missing": sorted(missing),
+                }
+            ),
+            409,
+        )
+
+    data = request.get_json(silent=True) or {}
+    map_obj = db.session.get(Map, data.get("map_id") or upload.map_id or 0)
+    if not map_obj:
+        return jsonify({"success": False, "message": "Mapa no encontrado"}), 404
+
+    # UPDATE condicional: de dos finalizaciones simultáneas solo una toca el archivo
+    claimed = ChunkedUpload.query.filter_by(id=upload.id, status="uploading").update(
+        {"status": "finalizing"}
+    )
+    if not claimed:
+        db.session.rollback()
+        return (
+            jsonify({"success": False, "message": "La subida ya se está finalizando"}),
+            409,
+        )
+
+    job = BackgroundJob(
+        id=secrets.token_hex(12),
+        user_id=session["user_id"],
+        map_id=map_obj.id,
+        kind="upload",
+        total=1,
+    )
+    db.session.add(job)
+    db.session.commit()
+    job_id, upload_id = job.id, upload.id
+    expected_sha256 = (data.get("sha256") or "").strip().lower()
+
+    data_path, _ = chunked_upload_paths(upload_id)
+    task = {
+        "store": map_file_blobs.root,
+        "path": data_path,
+        "ext": os.path.splitext(upload.filename)[1],
+    }
+    try:
+        image_pool.submit(
+            task,
+            lambda result, error: finish_upload_job(
+                job_id, upload_id, expected_sha256, result, error
+            ),
+            fn=ingest_task,
+        )
+    except ImagePoolFull:
+        # Cola llena: la subida vuelve a poder finalizarse más tarde
+        upload.status = "uploading"
+        db.session.delete(job)
+        db.session.commit()
+        return image_pool_busy_response()
+
+    return (
+        jsonify(
+            {
+                "success": True,
+                "message": "Archivo recibido, verificando",
+                "map_id": map_obj.id,
+                "size": upload.total_size,
+                "job": job.to_dict(),
+            }
+        ),
+        202,
+    )
+
+
+@app.route("/admin/uploads/<upload_id>", methods=["DELETE"])
+def abort_chunked_upload(upload_id):
+    """Cancelar una subida por partes y borrar sus fragmentos (solo admin)"""
+    if "user_id" not in session or not session.get("is_admin"):
+        return jsonify({"success": False, "message": "No autorizado"}), 403
+
+    upload = get_chunked_upload(upload_id)
+    if not upload:
+        return jsonify({"success": False, "message": "Subida no encontrada"}), 404
+
+    discard_chunked_upload(upload)
+    db.session.commit()
+    return jsonify({"success": True, "message": "Subida cancelada"}), 200
+
+
 @app.route("/admin/map/<int:map_id>/gallery", methods=["POST"])
 def upload_map_gallery(map_id):
     """Subir imágenes adicionales para la galería del mapa (solo admin)"""
@@ -2097,10 +3664,8 @@ def upload_map_gallery(map_id):
 
     map_obj = Map.query.get_or_404(map_id)
 
-    # Crear/obtener carpeta específica del mapa
-    map_folder_name = secure_filename(map_obj.title.lower().replace(" ", "_"))
-    map_folder_path = os.path.join(app.config["UPLOAD_FOLDER"], "maps", map_folder_name)
-    os.makedirs(map_folder_path, exist_ok=True)
+    if image_pool.saturated():
+        return image_pool_busy_response()
 
     # Procesar imágenes múltiples
     gallery_urls = []
@@ -2110,26 +3675,23 @@ def upload_map_gallery(map_id):
         except:
             gallery_urls = []
 
+    image_tasks = []
     if "images" in request.files:
         images = request.files.getlist("images")
-        # Determinar índice inicial para nuevas imágenes
-        start_idx = len(gallery_urls) + 1
-        for idx, image_file in enumerate(images, start=start_idx):
+        for image_file in images:
             if image_file and allowed_file(
                 image_file.filename, ALLOWED_IMAGE_EXTENSIONS
             ):
-                filename = secure_filename(
-                    f"gallery_{idx}.{image_file.filename.rsplit('.', 1)[1].lower()}"
-                )
-                filepath = os.path.join(map_folder_path, filename)
-                image_file.save(filepath)
-                optimize_image(filepath, max_size=(1200, 800))
-                gallery_urls.append(
-                    f"/static/uploads/maps/{map_folder_name}/{filename}"
-                )
+                filepath, gallery_url = stage_image(image_file)
+                image_tasks.append(map_image_task(filepath, gallery_url))
+                gallery_urls.append(gallery_url)
 
     map_obj.gallery_images = json.dumps(gallery_urls)
     db.session.commit()
+    catalog_cache.bump()
+    image_job = start_image_job(
+        "gallery", image_tasks, session["user_id"], map_id=map_obj.id
+    )
 
     return (
         jsonify(
@@ -2137,6 +3699,7 @@ def upload_map_gallery(map_id):
                 "success": True,
                 "message": f"{len(images)} imágenes agregadas a la galería",
                 "gallery": gallery_urls,
+                "image_job": image_job,
             }
         ),
         200,
@@ -2158,7 +3721,10 @@ def delete_gallery_image(map_id, image_index):
         if 0 <= image_index < len(gallery_urls):
             deleted_url = gallery_urls.pop(image_index)
             map_obj.gallery_images = json.dumps(gallery_urls)
+            if deleted_url != map_obj.image:
+                map_obj.set_image_variants(deleted_url, None)
             db.session.commit()
+            catalog_cache.bump()
             return (
                 jsonify(
                     {
@@ -2182,8 +3748,11 @@ def delete_comment(comment_id):
         return jsonify({"success": False, "message": "No autorizado"}), 403
 
     comment = Comment.query.get_or_404(comment_id)
+    if comment.map:
+        comment.map.apply_rating(comment.rating, -1)
     db.session.delete(comment)
     db.session.commit()
+    catalog_cache.bump()
 
     return (
         jsonify({"success": True, "message": "Comentario eliminado exitosamente"}),
@@ -2225,7 +3794,10 @@ def admin_change_password(user_id):
             400,
         )
 
-    user.set_password(new_password)
+    try:
+        user.set_password(new_password, password_hasher)
+    except PasswordHasherBusy:
+        return password_hasher_busy_response()
     db.session.commit()
 
     return (
@@ -2258,6 +3830,7 @@ def toggle_admin(user_id):
 
     user.is_admin = not user.is_admin
     db.session.commit()
+    user_cache.bump()
 
     status = "administrador" if user.is_admin else "usuario normal"
     return jsonify({"success": True, "message": f"{user.name} ahora es {status}"}), 200
@@ -2352,20 +3925,21 @@ def get_blocked_ips():
     if "user_id" not in session or not session.get("is_admin"):
         return jsonify({"success": False, "error": "No autorizado"}), 403
 
+    blocked_ips = ip_tracker.blocked_ips()
+    suspicious_ips = ip_tracker.suspicious_ips()
     return (
         jsonify(
             {
-                "blocked_ips": list(blocked_ips),
+                "blocked_ips": blocked_ips,
                 "count": len(blocked_ips),
                 "suspicious_ips": {
                     ip: {
-                        "requests": data["count"],
-                        "first_seen": datetime.fromtimestamp(
-                            data["first_seen"]
-                        ).isoformat(),
+                        "requests": count,
+                        "first_seen": datetime.fromtimestamp(first_seen).isoformat(),
                     }
-                    for ip, data in suspicious_ips.items()
+                    for ip, (count, first_seen) in suspicious_ips.items()
                 },
+                "tracker": ip_tracker.stats(),
             }
         ),
         200,
@@ -2385,8 +3959,7 @@ def unblock_ip():
         if not ip:
             return jsonify({"success": False, "error": "IP no especificada"}), 400
 
-        if ip in blocked_ips:
-            blocked_ips.remove(ip)
+        if ip_tracker.unblock(ip):
             logger.info(f"Admin desbloqueó IP: {ip}")
             return jsonify({"success": True, "message": f"IP {ip} desbloqueada"}), 200
         else:
@@ -2409,10 +3982,8 @@ def block_ip():
         if not ip:
             return jsonify({"success": False, "error": "IP no especificada"}), 400
 
-        blocked_ips.add(ip)
-        # Eliminar de suspicious si existe
-        if ip in suspicious_ips:
-            del suspicious_ips[ip]
+        # También deja de contarla como sospechosa
+        ip_tracker.block(ip)
 
         logger.warning(f"Admin bloqueó IP manualmente: {ip}")
         return jsonify({"success": True, "message": f"IP {ip} bloqueada"}), 200
@@ -2428,9 +3999,7 @@ def clear_all_blocks():
         return jsonify({"success": False, "error": "No autorizado"}), 403
 
     try:
-        count = len(blocked_ips)
-        blocked_ips.clear()
-        suspicious_ips.clear()
+        count = ip_tracker.clear()
         logger.info(f"Admin limpió {count} IPs bloqueadas")
         return (
             jsonify({"success": True, "message": f"Se desbloquearon {count} IPs"}),
@@ -2449,9 +4018,11 @@ def handle_connect():
     """Manejar conexión al chat"""
     try:
         if "user_id" in session:
-            user = User.query.get(session["user_id"])
+            user = current_user()
             if user:
                 logger.info(f"Usuario conectado al chat: {user.name}")
+                # Sala privada para avisos (p. ej. job_done)
+                join_room(f"user_{user.id}")
                 emit(
                     "user_connected",
                     {"user_name": user.name, "message": f"{user.name} se ha conectado"},
@@ -2466,7 +4037,7 @@ def handle_disconnect():
     """Manejar desconexión del chat"""
     try:
         if "user_id" in session:
-            user = User.query.get(session["user_id"])
+            user = current_user()
             if user:
                 logger.info(f"Usuario desconectado del chat: {user.name}")
                 emit(
@@ -2513,7 +4084,7 @@ def handle_message(data):
         else:
             message_rate_limit[user_id] = (1, now)
 
-        user = User.query.get(user_id)
+        user = load_user_snapshot(user_id)
         if not user:
             emit("error", {"message": "Usuario no encontrado"})
             return
@@ -2593,12 +4164,6 @@ def view_map_details(map_id):
     if not map_item:
         return jsonify({"success": False, "message": "Mapa no encontrado"}), 404
 
-    # Calcular rating promedio
-    comments = Comment.query.filter_by(map_id=map_id).all()
-    average_rating = 0
-    if comments:
-        average_rating = sum(c.rating for c in comments) / len(comments)
-
     return (
         jsonify(
             {
@@ -2610,8 +4175,8 @@ def view_map_details(map_id):
                     "price": float(map_item.price),
                     "image_url": map_item.image_url,
                     "features": map_item.features,
-                    "average_rating": round(average_rating, 1),
-                    "comment_count": len(comments),
+                    "average_rating": map_item.average_rating(),
+                    "comment_count": map_item.total_reviews(),
                 },
             }
         ),
@@ -2619,28 +4184,82 @@ def view_map_details(map_id):
     )
 
 
-@app.route("/map/<int:map_id>/comments")
-def get_map_comments(map_id):
-    """Obtener comentarios de un mapa"""
+COMMENTS_PAGE_SIZE = 20
+COMMENTS_MAX_PAGE_SIZE = 100
+COMMENT_SORTS = {
+    "newest": Comment.created_at,
+    "rating": Comment.rating,
+}
+
+
+def query_comments_page(map_id, args, limit=COMMENTS_PAGE_SIZE):
+    """Devuelve (comentarios, next_cursor) de una página de comentarios del mapa.
+
+    Orden descendente por fecha (sort=newest) o por calificación (sort=rating),
+    con el id como desempate. Los autores se cargan con un JOIN en la misma
+    consulta, así que serializar la página no dispara consultas por comentario.
+    """
+    sort = args.get("sort", "newest")
+    if sort not in COMMENT_SORTS:
+        raise BadRequest(f"Orden inválido: {sort}")
+    column = COMMENT_SORTS[sort]
+
+    query = Comment.query.options(db.joinedload(Comment.user)).filter(
+        Comment.map_id == map_id
+    )
+    if args.get("cursor"):
+        value, last_id = decode_cursor(args["cursor"], sort)
+        query = query.filter(
+            db.tuple_(column, Comment.id) < db.tuple_(value, last_id)
+        )
+
     comments = (
-        Comment.query.filter_by(map_id=map_id).order_by(Comment.created_at.desc()).all()
+        query.order_by(column.desc(), Comment.id.desc()).limit(limit + 1).all()
     )
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        last = comments[-1]
+        next_cursor = encode_cursor(getattr(last, column.key), last.id)
+
+    return comments, next_cursor
+
 
-    comments_data = []
-    for comment in comments:
-        user = User.query.get(comment.user_id)
-        comments_data.append(
+@app.route("/map/<int:map_id>/comments")
+def get_map_comments(map_id):
+    """Obtener comentarios de un mapa (paginados por cursor, ?sort=newest|rating)"""
+    map_item = Map.query.get_or_404(map_id)
+
+    limit = request.args.get("limit", COMMENTS_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, COMMENTS_MAX_PAGE_SIZE))
+    try:
+        comments, next_cursor = query_comments_page(map_id, request.args, limit)
+    except BadRequest as e:
+        return jsonify({"success": False, "message": e.description}), 400
+
+    comments_data = [
+        {
+            "id": comment.id,
+            "text": comment.comment,
+            "rating": comment.rating,
+            "username": comment.user.name if comment.user else "Usuario",
+            "user_photo": comment.user.profile_picture if comment.user else None,
+            "created_at": comment.created_at.isoformat(),
+        }
+        for comment in comments
+    ]
+
+    return (
+        jsonify(
             {
-                "id": comment.id,
-                "text": comment.text,
-                "rating": comment.rating,
-                "username": user.name if user else "Usuario",
-                "user_photo": user.profile_picture if user else None,
-                "created_at": comment.created_at.isoformat(),
+                "success": True,
+                "summary": map_item.rating_summary(),
+                "comments": comments_data,
+                "next_cursor": next_cursor,
             }
-        )
-
-    return jsonify({"success": True, "comments": comments_data}), 200
+        ),
+        200,
+    )
 
 
 # ==================== FUNCIÓN DE LIMPIEZA AUTOMÁTICA ====================
@@ -2663,6 +4282,11 @@ def cleanup_old_messages():
                         f"[CLEANUP] Se eliminaron {deleted_count} mensajes antiguos del chat"
                     )
 
+                # Subidas por partes abandonadas
+                discarded = cleanup_stale_uploads()
+                if discarded > 0:
+                    print(f"[CLEANUP] Se eliminaron {discarded} subidas incompletas")
+
         except Exception as e:
             print(f"[ERROR] Error en limpieza de mensajes: {e}")
 
@@ -2685,7 +4309,7 @@ def test_email_config():
     if "user_id" not in session:
         return jsonify({"error": "No autenticado"}), 401
 
-    user = User.query.get(session["user_id"])
+    user = current_user()
     if not user or not user.is_admin:
         return jsonify({"error": "Acceso denegado - Solo administradores"}), 403
 
@@ -2746,6 +4370,38 @@ def test_email_config():
     return jsonify(diagnostico), 200 if diagnostico["test_result"] == "SUCCESS" else 500
 
 
+# ==================== MIGRACIONES (CLI) ====================
+
+
+@app.cli.group("db")
+def db_cli():
+    """Migraciones del esquema de la base de datos"""
+
+
+@db_cli.command("upgrade")
+@click.option("--to", "target", type=int, default=None, help="Versión destino")
+def db_upgrade(target):
+    """Aplicar las migraciones pendientes y sembrar datos de ejemplo"""
+    applied = initialize_database(target)
+    click.echo(f"✅ Migraciones aplicadas: {applied or 'ninguna pendiente'}")
+
+
+@db_cli.command("downgrade")
+@click.option("--to", "target", type=int, required=True, help="Versión destino")
+def db_downgrade(target):
+    """Revertir las migraciones posteriores a --to (0 las revierte todas)"""
+    reverted = migrations.downgrade(target)
+    click.echo(f"↩️  Migraciones revertidas: {reverted or 'ninguna'}")
+
+
+@db_cli.command("status")
+def db_status():
+    """Listar las migraciones y si están aplicadas"""
+    for migration, applied in migrations.migration_status():
+        mark = "✅" if applied else "⏳"
+        click.echo(f"{mark} {migration.version:03d} {migration.description}")
+
+
 # ==================== EJECUTAR APLICACIÓN ====================
 
 if __name__ == "__main__":
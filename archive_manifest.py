@@ -0,0 +1,192 @@
+"""
+Manifiesto de archivos .zip/.mcworld sin descomprimirlos
+
+Lee el directorio central del ZIP en una sola pasada secuencial y solo
+acumula contadores, así la memoria no depende del tamaño del archivo. No se
+extrae nada a disco: lo único que se descomprime es levelname.txt (mundos de
+Bedrock) y con un límite de bytes. Los límites de entradas, tamaño total y
+tasa de compresión detectan zip bombs antes de que nadie las descomprima.
+
+Solo usa la librería estándar: se ejecuta en el pool de procesos.
+"""
+
+import os
+import struct
+import zlib
+
+MAX_ENTRIES = 200_000
+MAX_UNCOMPRESSED_SIZE = 20 * 1024 * 1024 * 1024
+MAX_COMPRESSION_RATIO = 200
+MAX_WORLD_NAME_BYTES = 256
+
+_EOCD = b"PK\x05\x06"
+_EOCD64_LOCATOR = b"PK\x06\x07"
+_EOCD64 = b"PK\x06\x06"
+_CENTRAL_HEADER = b"PK\x01\x02"
+_LOCAL_HEADER = b"PK\x03\x04"
+_CENTRAL_HEADER_STRUCT = struct.Struct("<4sHHHHHHIIIHHHHHII")
+
+
+class ArchiveError(Exception):
+    """El archivo no es un ZIP válido o supera los límites de seguridad"""
+
+
+def _find_central_directory(f, file_size):
+    """Devuelve (entradas, tamaño, offset) del directorio central (ZIP y ZIP64)"""
+    tail_size = min(file_size, 22 + 65535)
+    f.seek(file_size - tail_size)
+    tail = f.read(tail_size)
+    pos = tail.rfind(_EOCD)
+    if pos < 0 or len(tail) - pos < 22:
+        raise ArchiveError("No es un archivo ZIP válido")
+
+    count, cd_size, cd_offset = struct.unpack("<HII", tail[pos + 10 : pos + 20])
+    if count == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+        locator = tail[pos - 20 : pos]
+        if pos < 20 or locator[:4] != _EOCD64_LOCATOR:
+            raise ArchiveError("ZIP64 sin localizador del directorio central")
+        (eocd64_offset,) = struct.unpack("<Q", locator[8:16])
+        f.seek(eocd64_offset)
+        record = f.read(56)
+        if record[:4] != _EOCD64:
+            raise ArchiveError("ZIP64 con directorio central dañado")
+        count, cd_size, cd_offset = struct.unpack("<QQQ", record[32:56])
+
+    if cd_offset + cd_size > file_size:
+        raise ArchiveError("El directorio central está fuera del archivo")
+    return count, cd_size, cd_offset
+
+
+def _zip64_sizes(extra, usize, csize, offset):
+    """Aplica el campo extra ZIP64 (0x0001) a los valores que lo requieren"""
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, length = struct.unpack("<HH", extra[pos : pos + 4])
+        data = extra[pos + 4 : pos + 4 + length]
+        if header_id == 0x0001:
+            values = [
+                struct.unpack("<Q", data[i : i + 8])[0] for i in range(0, len(data) - 7, 8)
+            ]
+            if usize == 0xFFFFFFFF and values:
+                usize = values.pop(0)
+            if csize == 0xFFFFFFFF and values:
+                csize = values.pop(0)
+            if offset == 0xFFFFFFFF and values:
+                offset = values.pop(0)
+            break
+        pos += 4 + length
+    return usize, csize, offset
+
+
+def _read_world_name(f, offset, csize, method):
+    """Lee levelname.txt desde su cabecera local, descomprimiendo como mucho 256 bytes"""
+    f.seek(offset)
+    header = f.read(30)
+    if header[:4] != _LOCAL_HEADER:
+        return None
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    f.seek(name_len + extra_len, os.SEEK_CUR)
+    data = f.read(min(csize, 4 * MAX_WORLD_NAME_BYTES))
+    if method == 0:
+        raw = data[:MAX_WORLD_NAME_BYTES]
+    elif method == 8:
+        raw = zlib.decompressobj(-15).decompress(data, MAX_WORLD_NAME_BYTES)
+    else:
+        return None
+    return raw.decode("utf-8", errors="replace").strip()[:100] or None
+
+
+def read_archive_manifest(path):
+    """Resume un .zip/.mcworld leyendo solo su directorio central.
+
+    Devuelve un dict con files, uncompressed_size, compressed_size,
+    world_name, has_level_dat y warnings (vacía si no hay nada sospechoso).
+    Lanza ArchiveError si no es un ZIP o tiene más de MAX_ENTRIES entradas.
+    """
+    file_size = os.path.getsize(path)
+    warnings = []
+    files = 0
+    uncompressed = 0
+    compressed = 0
+    level_dat_folder = None
+    levelname_entry = None
+
+    with open(path, "rb") as f:
+        count, _, cd_offset = _find_central_directory(f, file_size)
+        if count > MAX_ENTRIES:
+            raise ArchiveError(f"Demasiadas entradas ({count}, máximo {MAX_ENTRIES})")
+
+        f.seek(cd_offset)
+        for _ in range(count):
+            header = f.read(_CENTRAL_HEADER_STRUCT.size)
+            if len(header) < _CENTRAL_HEADER_STRUCT.size or header[:4] != _CENTRAL_HEADER:
+                raise ArchiveError("Directorio central dañado")
+            (
+                _,
+                _,
+                _,
+                flags,
+                method,
+                _,
+                _,
+                _,
+                csize,
+                usize,
+                name_len,
+                extra_len,
+                comment_len,
+                _,
+                _,
+                _,
+                offset,
+            ) = _CENTRAL_HEADER_STRUCT.unpack(header)
+            raw_name = f.read(name_len)
+            extra = f.read(extra_len)
+            f.seek(comment_len, os.SEEK_CUR)
+
+            name = raw_name.decode("utf-8" if flags & 0x800 else "cp437", errors="replace")
+            if name.endswith("/"):
+                continue
+            usize, csize, offset = _zip64_sizes(extra, usize, csize, offset)
+
+            files += 1
+            uncompressed += usize
+            compressed += csize
+
+            # Mundos: level.dat en la raíz o dentro de una sola carpeta
+            parts = name.split("/")
+            if len(parts) <= 2 and parts[-1] == "level.dat":
+                level_dat_folder = parts[0] if len(parts) == 2 else ""
+            if len(parts) <= 2 and parts[-1] == "levelname.txt" and not flags & 0x1:
+                levelname_entry = (offset, csize, method)
+
+            if usize > 10 * 1024 * 1024 and usize > csize * MAX_COMPRESSION_RATIO:
+                warnings.append(f"Compresión anómala en {name[:80]}")
+
+        world_name = None
+        if levelname_entry:
+            world_name = _read_world_name(f, *levelname_entry)
+        if not world_name and level_dat_folder:
+            world_name = level_dat_folder
+
+    if uncompressed > MAX_UNCOMPRESSED_SIZE:
+        warnings.append("El tamaño descomprimido supera el límite")
+    if compressed and uncompressed > compressed * MAX_COMPRESSION_RATIO:
+        warnings.append("Tasa de compresión sospechosa (posible zip bomb)")
+
+    return {
+        "files": files,
+        "uncompressed_size": uncompressed,
+        "compressed_size": compressed,
+        "world_name": world_name,
+        "has_level_dat": level_dat_folder is not None,
+        "warnings": warnings[:10],
+    }
+
+
+def archive_manifest_task(path):
+    """Entrada del pool de procesos: nunca lanza, devuelve el error en el dict"""
+    try:
+        return {"manifest": read_archive_manifest(path), "error": None}
+    except (ArchiveError, OSError, struct.error, zlib.error) as e:
+        return {"manifest": None, "error": str(e)}
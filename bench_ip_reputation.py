@@ -0,0 +1,139 @@
+"""
+Benchmark del seguimiento de IPs: dict sin límite vs. IPReputationTracker
+
+Simula una avalancha de 1M de IPs distintas en 60 segundos de tiempo
+simulado (más unas pocas IPs que repiten y deben bloquearse) y mide el
+coste por petición, la peor latencia y cuánta memoria queda ocupada. La
+versión "dict" reproduce el check_ip_reputation anterior: diccionario sin
+límite y limpieza con recorrido completo cuando len % 1000 == 0. Después
+repite la prueba con el tracker desde 4 hilos para comprobar los bloqueos.
+
+Uso: python bench_ip_reputation.py [IPs distintas]
+"""
+
+import sys
+import threading
+import time
+import tracemalloc
+
+from ip_reputation import IPReputationTracker
+
+DISTINCT_IPS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+THREADS = 4
+THRESHOLD = 100
+WINDOW = 60
+HOT_IPS = 10  # IPs que superan el umbral y deben acabar bloqueadas
+
+
+def requests_stream():
+    """(ip, instante) de la avalancha; las IPs calientes se repiten a menudo"""
+    step = WINDOW / DISTINCT_IPS
+    for i in range(DISTINCT_IPS):
+        now = 1_000_000 + i * step
+        yield f"{i >> 24 & 255}.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", now
+        if i % 5000 == 0:
+            for hot in range(HOT_IPS):
+                yield f"203.0.113.{hot}", now
+
+
+class LegacyTracker:
+    """El algoritmo anterior, para comparar"""
+
+    def __init__(self):
+        self.blocked_ips = set()
+        self.suspicious_ips = {}
+
+    def hit(self, ip, now):
+        if ip in self.blocked_ips:
+            return False
+        suspicious_ips = self.suspicious_ips
+        if ip in suspicious_ips:
+            data = suspicious_ips[ip]
+            if now - data["first_seen"] > WINDOW:
+                suspicious_ips[ip] = {"count": 1, "first_seen": now}
+            else:
+                data["count"] += 1
+                if data["count"] > THRESHOLD:
+                    self.blocked_ips.add(ip)
+                    del suspicious_ips[ip]
+                    return True
+        else:
+            suspicious_ips[ip] = {"count": 1, "first_seen": now}
+        if len(suspicious_ips) % 1000 == 0:
+            old_ips = [
+                ip
+                for ip, data in suspicious_ips.items()
+                if now - data["first_seen"] > WINDOW * 2
+            ]
+            for ip in old_ips:
+                del suspicious_ips[ip]
+        return False
+
+
+def run(label, hit, entries):
+    tracemalloc.start()
+    worst = 0.0
+    blocked = 0
+    total = 0
+    start = time.perf_counter()
+    for ip, now in requests_stream():
+        t = time.perf_counter()
+        blocked += bool(hit(ip, now))
+        worst = max(worst, time.perf_counter() - t)
+        total += 1
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"\n📊 {label}")
+    print(f"   Peticiones:       {total:10d}")
+    print(f"   Coste medio:      {elapsed / total * 1e6:10.2f} µs")
+    print(f"   Peor petición:    {worst * 1000:10.2f} ms")
+    print(f"   IPs en memoria:   {entries():10d}")
+    print(f"   Memoria máxima:   {peak / 1024 / 1024:10.1f} MB")
+    print(f"   IPs bloqueadas:   {blocked:10d}")
+
+
+def run_threads(tracker):
+    """Las mismas peticiones repartidas entre THREADS hilos"""
+    stream = list(requests_stream())
+    blocked = [0] * THREADS
+
+    def worker(index):
+        for ip, now in stream[index::THREADS]:
+            if tracker.hit(ip, now):
+                blocked[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n📊 IPReputationTracker con {THREADS} hilos")
+    print(f"   Peticiones/s:     {len(stream) / elapsed:10.0f}")
+    print(f"   IPs bloqueadas:   {sum(blocked):10d} (esperadas {HOT_IPS})")
+    print(f"   Estado:           {tracker.stats()}")
+
+
+if __name__ == "__main__":
+    print("🔄 Benchmark de reputación de IPs")
+    print(f"   {DISTINCT_IPS} IPs distintas en {WINDOW}s simulados, umbral {THRESHOLD}")
+
+    legacy = LegacyTracker()
+    run("dict sin límite (anterior)", legacy.hit, lambda: len(legacy.suspicious_ips))
+
+    tracker = IPReputationTracker(threshold=THRESHOLD, window=WINDOW)
+    run(
+        f"IPReputationTracker (máx. {tracker.max_tracked} IPs)",
+        tracker.hit,
+        lambda: tracker.stats()["tracked"],
+    )
+
+    run_threads(IPReputationTracker(threshold=THRESHOLD, window=WINDOW))
+
+    print("\n" + "=" * 60)
+    print("🎉 BENCHMARK COMPLETADO")
+    print("=" * 60 + "\n")
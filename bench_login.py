@@ -0,0 +1,182 @@
+"""
+Benchmark de logins: hash sin límite vs. pool acotado de PasswordHasher
+
+Simula un worker de gunicorn con 4 hilos (--threads 4 del Procfile): las
+peticiones llegan a un ritmo fijo, esperan en cola a que quede un hilo libre
+y se atienden con el cliente de pruebas de Flask. Durante una ráfaga de
+POST /auth/login llega también una petición a /health cada 50 ms, como si
+fuera una página normal; su latencia incluye la espera por un hilo.
+
+Se ejecuta dos veces sobre una base de datos SQLite temporal con usuarios
+cuyo hash es antiguo (pbkdf2): hasheando en el hilo de la petición (sin
+límite, lo que ocurría antes) y con el pool configurado de la app, que
+responde 503 en cuanto hay PASSWORD_HASH_QUEUE_LIMIT hashes en curso.
+Muestra logins por segundo, respuestas 503, latencias y hashes regenerados.
+
+Uso: python bench_login.py [segundos] [logins por segundo]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+LOGIN_RATE = float(sys.argv[2]) if len(sys.argv) > 2 else 40.0
+SERVER_THREADS = 4
+PROBE_INTERVAL = 0.05
+USERS = 8
+LEGACY_METHOD = "pbkdf2:sha256:260000"
+PASSWORD = "benchmark123"
+
+# Base de datos temporal: no tocar instance/hbuilds.db
+BENCH_DB = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URI"] = f"sqlite:///{BENCH_DB}"
+os.environ["DB_INIT_ON_STARTUP"] = "false"
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+import app as app_module  # noqa: E402
+import migrations  # noqa: E402
+from app import app, db, ip_tracker, limiter  # noqa: E402
+from database import User  # noqa: E402
+from password_hasher import PasswordHasher  # noqa: E402
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[int(len(values) * fraction)] * 1000 if values else 0
+
+
+def handle(method, path, arrived, **kwargs):
+    """Una petición atendida por un hilo del servidor; latencia desde su llegada"""
+    response = app.test_client().open(path, method=method, **kwargs)
+    return response.status_code, time.perf_counter() - arrived
+
+
+def benchmark(label, hasher):
+    app_module.password_hasher = hasher
+    ip_tracker.clear()
+    server = ThreadPoolExecutor(
+        max_workers=SERVER_THREADS, thread_name_prefix="gunicorn-thread"
+    )
+    logins, probes = [], []
+
+    start = time.perf_counter()
+    next_login = next_probe = start
+    sent = 0
+    while True:
+        now = time.perf_counter()
+        if now >= start + DURATION:
+            break
+        if now >= next_login:
+            sent += 1
+            email = f"user{sent % USERS}@bench.local"
+            # Una IP distinta por petición para no activar el bloqueo anti-DDoS
+            ip = f"10.0.{sent // 250 % 250}.{sent % 250}"
+            logins.append(
+                server.submit(
+                    handle,
+                    "POST",
+                    "/auth/login",
+                    now,
+                    json={"email": email, "password": PASSWORD},
+                    environ_overrides={"REMOTE_ADDR": ip},
+                )
+            )
+            next_login += 1 / LOGIN_RATE
+        if now >= next_probe:
+            ip = f"10.250.0.{len(probes) % 250}"
+            probes.append(
+                server.submit(
+                    handle, "GET", "/health", now, environ_overrides={"REMOTE_ADDR": ip}
+                )
+            )
+            next_probe += PROBE_INTERVAL
+        time.sleep(max(0, min(next_login, next_probe) - time.perf_counter()))
+
+    server.shutdown(wait=True)
+    elapsed = time.perf_counter() - start
+
+    ok, busy, login_latencies = 0, 0, []
+    for future in logins:
+        status, latency = future.result()
+        if status == 200:
+            ok += 1
+            login_latencies.append(latency)
+        elif status == 503:
+            busy += 1
+        else:
+            raise RuntimeError(f"Login inesperado: {status}")
+    probe_latencies = [future.result()[1] for future in probes]
+
+    hasher_stats = hasher.stats()
+    print(f"\n📊 {label}")
+    print(f"   Logins/s:        {ok / elapsed:8.1f}  (llegan {LOGIN_RATE:.0f}/s)")
+    print(f"   Respuestas 503:  {busy:8d}")
+    print(
+        f"   Login p50: {percentile(login_latencies, 0.5):.0f} ms   "
+        f"p99: {percentile(login_latencies, 0.99):.0f} ms"
+    )
+    print(
+        f"   /health p50: {percentile(probe_latencies, 0.5):.1f} ms   "
+        f"p99: {percentile(probe_latencies, 0.99):.1f} ms"
+    )
+    print(
+        f"   Máx. en curso: {hasher_stats['peak_pending']}   "
+        f"espera media: {hasher_stats['avg_wait_ms']} ms   "
+        f"hash medio: {hasher_stats['avg_hash_ms']} ms"
+    )
+
+
+def reset_users():
+    """Usuarios con hash antiguo: el primer login de cada uno lo regenera"""
+    legacy_hash = generate_password_hash(PASSWORD, LEGACY_METHOD)
+    with app.app_context():
+        User.query.delete()
+        for i in range(USERS):
+            user = User(email=f"user{i}@bench.local", name=f"Usuario {i}")
+            user.password = legacy_hash
+            db.session.add(user)
+        db.session.commit()
+
+
+def count_rehashed():
+    with app.app_context():
+        users = User.query.all()
+        return sum(1 for user in users if not user.password.startswith(LEGACY_METHOD))
+
+
+if __name__ == "__main__":
+    configured = app_module.password_hasher
+    limiter.enabled = False
+    with app.app_context():
+        migrations.upgrade()
+
+    print("🔄 Benchmark de logins")
+    print(
+        f"   Servidor de {SERVER_THREADS} hilos, {LOGIN_RATE:.0f} logins/s durante "
+        f"{DURATION:.0f}s, {USERS} usuarios, método {configured.method}"
+    )
+
+    reset_users()
+    benchmark(
+        "Hash en el hilo de la petición (sin límite)",
+        PasswordHasher(
+            configured.method, max_workers=SERVER_THREADS, max_pending=10**6
+        ),
+    )
+    print(f"   Hashes regenerados: {count_rehashed()}/{USERS}")
+
+    reset_users()
+    benchmark(
+        f"Pool de la app ({configured.max_workers} hilos, "
+        f"máx. {configured.max_pending} en curso)",
+        configured,
+    )
+    print(f"   Hashes regenerados: {count_rehashed()}/{USERS}")
+
+    print("\n" + "=" * 60)
+    print("🎉 BENCHMARK COMPLETADO")
+    print("=" * 60 + "\n")
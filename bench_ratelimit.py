@@ -0,0 +1,135 @@
+"""
+Benchmark del almacén de rate limiting: memory:// vs. SQLite compartido
+
+Mide el coste por comprobación (hit) de cada almacén con la misma
+estrategia que la app, primero en un solo hilo y después con el despliegue
+simulado (2 procesos x 4 hilos). Al final comprueba que un límite de
+100/minuto se respeta entre procesos: con memory:// cada proceso cuenta por
+separado y dejan pasar el doble.
+
+Uso: python bench_ratelimit.py [comprobaciones por hilo]
+"""
+
+import multiprocessing
+import sys
+import tempfile
+import threading
+import time
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+
+import ratelimit_storage  # noqa: F401  (registra sqlite://)
+
+WORKERS = 2
+THREADS = 4
+CHECKS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+STRATEGY = "sliding-window-counter"
+LIMIT = parse("1000000/minute")
+
+
+def make_limiter(uri):
+    return STRATEGIES[STRATEGY](storage_from_string(uri))
+
+
+def run_checks(uri, seed, results):
+    """Un "worker de gunicorn": THREADS hilos comprobando IPs distintas"""
+    limiter = make_limiter(uri)
+    latencies = []
+    lock = threading.Lock()
+
+    def run(thread_id):
+        local = []
+        for i in range(CHECKS):
+            ip = f"10.{seed}.{thread_id}.{i % 200}"
+            start = time.perf_counter()
+            limiter.hit(LIMIT, "bench", ip)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put(latencies)
+
+
+def count_allowed(uri, results):
+    limiter = make_limiter(uri)
+    item = parse("100/minute")
+    results.put(sum(limiter.hit(item, "shared", "1.2.3.4") for _ in range(150)))
+
+
+def single_thread(label, uri):
+    limiter = make_limiter(uri)
+    start = time.perf_counter()
+    for i in range(CHECKS):
+        limiter.hit(LIMIT, "bench", f"10.0.0.{i % 200}")
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<28} {elapsed / CHECKS * 1e6:8.1f} µs/comprobación")
+
+
+def concurrent(label, uri):
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=run_checks, args=(uri, i, results))
+        for i in range(WORKERS)
+    ]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    latencies = sorted(lat for _ in processes for lat in results.get())
+    for p in processes:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    print(
+        f"   {label:<28} {len(latencies) / elapsed:8.0f} comprobaciones/s   "
+        f"p50: {p50:.0f} µs   p99: {p99:.0f} µs"
+    )
+
+
+def shared_limit(label, uri):
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=count_allowed, args=(uri, results))
+        for _ in range(WORKERS)
+    ]
+    for p in processes:
+        p.start()
+    allowed = sum(results.get() for _ in processes)
+    for p in processes:
+        p.join()
+    print(f"   {label:<28} {allowed} permitidas de {WORKERS * 150} (límite 100)")
+
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    stores = [
+        ("memory://", "memory://"),
+        ("SQLite WAL (compartido)", f"sqlite:///{directory}/ratelimit.db"),
+    ]
+
+    print("🔄 Benchmark de rate limiting")
+    print(f"   Estrategia {STRATEGY}, {CHECKS} comprobaciones por hilo")
+
+    print("\n📊 Un hilo")
+    for label, uri in stores:
+        single_thread(label, uri)
+
+    print(f"\n📊 {WORKERS} procesos x {THREADS} hilos")
+    for label, uri in stores:
+        concurrent(label, uri)
+
+    print(f"\n📊 Límite compartido entre {WORKERS} procesos")
+    for label, uri in stores:
+        shared_limit(label, uri.replace("ratelimit.db", "shared.db"))
+
+    print("\n" + "=" * 60)
+    print("🎉 BENCHMARK COMPLETADO")
+    print("=" * 60 + "\n")
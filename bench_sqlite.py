@@ -0,0 +1,151 @@
+"""
+Benchmark de concurrencia de SQLite: configuración por defecto vs. WAL
+
+Simula el despliegue (2 workers de gunicorn con 4 hilos cada uno) sobre una
+base de datos temporal con una tabla tipo chat: cada hilo mezcla lecturas
+del historial reciente con escrituras (INSERT + commit) durante unos
+segundos. Se ejecuta dos veces, con el journal por defecto y con los PRAGMA
+de la aplicación, y muestra operaciones por segundo, latencias y errores
+"database is locked".
+
+Uso: python bench_sqlite.py [segundos] [% de escrituras]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+from database import configure_sqlite_engine, database_engine_options, sqlite_pragmas
+
+WORKERS = 2
+THREADS = 4
+DURATION = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+WRITE_RATIO = (float(sys.argv[2]) if len(sys.argv) > 2 else 20.0) / 100
+
+# Mismos valores por defecto que app.py
+APP_CONFIG = {
+    "SQLITE_JOURNAL_MODE": "WAL",
+    "SQLITE_SYNCHRONOUS": "NORMAL",
+    "SQLITE_BUSY_TIMEOUT_MS": 5000,
+    "SQLITE_MMAP_SIZE": 256 * 1024 * 1024,
+    "SQLITE_CACHE_SIZE": -16000,
+    "DB_POOL_SIZE": 8,
+    "DB_MAX_OVERFLOW": 4,
+    "DB_POOL_TIMEOUT": 30,
+    "DB_POOL_PRE_PING": True,
+}
+
+
+def make_engine(path, tuned):
+    if not tuned:
+        return create_engine(f"sqlite:///{path}")
+    uri = f"sqlite:///{path}"
+    options = database_engine_options({**APP_CONFIG, "SQLALCHEMY_DATABASE_URI": uri})
+    engine = create_engine(uri, **options)
+    configure_sqlite_engine(engine, sqlite_pragmas(APP_CONFIG))
+    return engine
+
+
+def worker(path, tuned, seed, results):
+    """Un "worker de gunicorn": THREADS hilos compartiendo un motor"""
+    engine = make_engine(path, tuned)
+    stats = {"reads": 0, "writes": 0, "locked": 0, "latencies": []}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + DURATION
+
+    def run(thread_id):
+        counter = seed * 1000 + thread_id
+        while time.perf_counter() < deadline:
+            counter += 1
+            is_write = (counter * 7919) % 100 < WRITE_RATIO * 100
+            start = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    if is_write:
+                        conn.execute(
+                            text("INSERT INTO messages (user_id, body) VALUES (:u, :b)"),
+                            {"u": counter % 50, "b": "mensaje de prueba " * 5},
+                        )
+                    else:
+                        conn.execute(
+                            text("SELECT * FROM messages ORDER BY id DESC LIMIT 50")
+                        ).fetchall()
+            except Exception as e:
+                if "locked" not in str(e):
+                    raise
+                with lock:
+                    stats["locked"] += 1
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                stats["writes" if is_write else "reads"] += 1
+                stats["latencies"].append(elapsed)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    results.put(stats)
+
+
+def benchmark(tuned):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = make_engine(path, tuned)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "CREATE TABLE messages (id INTEGER PRIMARY KEY, user_id INTEGER, "
+                "body TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+            )
+        )
+        for i in range(2000):
+            conn.execute(
+                text("INSERT INTO messages (user_id, body) VALUES (:u, 'inicial')"),
+                {"u": i % 50},
+            )
+    engine.dispose()
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(path, tuned, i, results))
+        for i in range(WORKERS)
+    ]
+    for p in processes:
+        p.start()
+    totals = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+
+    reads = sum(s["reads"] for s in totals)
+    writes = sum(s["writes"] for s in totals)
+    locked = sum(s["locked"] for s in totals)
+    latencies = sorted(lat for s in totals for lat in s["latencies"])
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+
+    label = "WAL + PRAGMA de la app" if tuned else "Por defecto (journal DELETE)"
+    print(f"\n📊 {label}")
+    print(f"   Lecturas/s:  {reads / DURATION:10.0f}")
+    print(f"   Escrituras/s:{writes / DURATION:10.0f}")
+    print(f"   Latencia p50: {p50:.2f} ms   p99: {p99:.2f} ms")
+    print(f"   Errores 'database is locked': {locked}")
+
+
+if __name__ == "__main__":
+    print("🔄 Benchmark de concurrencia de SQLite")
+    print(
+        f"   {WORKERS} procesos x {THREADS} hilos, {DURATION:.0f}s, "
+        f"{WRITE_RATIO:.0%} escrituras"
+    )
+    benchmark(tuned=False)
+    benchmark(tuned=True)
+    print("\n" + "=" * 60)
+    print("🎉 BENCHMARK COMPLETADO")
+    print("=" * 60 + "\n")
@@ -0,0 +1,113 @@
+"""
+Almacenamiento direccionado por contenido (CAS)
+
+Cada archivo se guarda como "<aa>/<sha256>.<ext>" bajo una carpeta raíz, donde
+el nombre es el SHA-256 de su contenido. Dos subidas idénticas terminan en el
+mismo archivo (deduplicación) y una URL nunca cambia de contenido, así que se
+puede cachear para siempre. El hash se calcula en streaming mientras se
+escribe, sin cargar el archivo en memoria.
+
+Solo usa la librería estándar: lo importan también los procesos del pool de
+imágenes.
+"""
+
+import hashlib
+import os
+import re
+import secrets
+import shutil
+
+BLOCK_SIZE = 1024 * 1024
+
+# "<aa>/<sha256>.<ext>"; las variantes de imágenes ("-<ancho>w") no cuentan
+_BLOB_NAME_RE = re.compile(r"(?:^|/)([0-9a-f]{2})/(\1[0-9a-f]{62})(?:\.[A-Za-z0-9]+)?$")
+
+
+def blob_sha256(name):
+    """SHA-256 codificado en el nombre de un blob o None si no es un blob"""
+    match = _BLOB_NAME_RE.search(name or "")
+    return match.group(2) if match else None
+
+
+class BlobStore:
+    """Carpeta de blobs direccionados por su SHA-256"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def _tmp_path(self):
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os.path.join(tmp_dir, f"{os.getpid()}-{secrets.token_hex(8)}")
+
+    def _commit(self, tmp_path, digest, ext):
+        """Mueve un temporal ya hasheado a su nombre definitivo.
+
+        Si el blob ya existía, se descarta el temporal (deduplicación).
+        Devuelve (clave, creado).
+        """
+        ext = ext.lower().lstrip(".")
+        key = f"{digest[:2]}/{digest}.{ext}" if ext else f"{digest[:2]}/{digest}"
+        final_path = self.path(key)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+            return key, False
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
+        return key, True
+
+    def save_stream(self, stream, ext):
+        """Guarda un flujo (p. ej. un FileStorage) hasheándolo en la misma pasada.
+
+        Devuelve (clave, sha256, tamaño, creado).
+        """
+        tmp_path = self._tmp_path()
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for block in iter(lambda: stream.read(BLOCK_SIZE), b""):
+                    hasher.update(block)
+                    f.write(block)
+                    size += len(block)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        digest = hasher.hexdigest()
+        key, created = self._commit(tmp_path, digest, ext)
+        return key, digest, size, created
+
+    def ingest(self, source_path, ext=None):
+        """Incorpora un archivo que ya está en disco (se mueve, no se copia).
+
+        Hace una sola lectura en bloques para calcular el hash; el origen debe
+        estar en el mismo sistema de archivos para que el movimiento sea
+        atómico. Devuelve (clave, sha256, tamaño, creado).
+        """
+        if ext is None:
+            ext = os.path.splitext(source_path)[1]
+        hasher = hashlib.sha256()
+        with open(source_path, "rb") as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                hasher.update(block)
+        size = os.path.getsize(source_path)
+        tmp_path = self._tmp_path()
+        shutil.move(source_path, tmp_path)
+        digest = hasher.hexdigest()
+        key, created = self._commit(tmp_path, digest, ext)
+        return key, digest, size, created
+
+
+def ingest_task(task):
+    """Entrada del pool de procesos: incorpora task["path"] al almacén task["store"].
+
+    Hashea y mueve el archivo fuera del hilo de la petición. Devuelve la
+    clave, el SHA-256, el tamaño y si el blob es nuevo.
+    """
+    key, digest, size, created = BlobStore(task["store"]).ingest(
+        task["path"], task.get("ext")
+    )
+    return {"key": key, "sha256": digest, "size": size, "created": created}
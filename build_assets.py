@@ -0,0 +1,110 @@
+"""
+Script para compilar los CSS/JS de static/ antes de desplegar
+
+Minifica cada archivo de static/css y static/js, le añade al nombre un hash
+de su contenido y guarda junto a él las versiones .gz y .br (si está
+instalado brotli) en static/dist. El manifiesto static/dist/manifest.json
+permite que url_for('static', ...) devuelva el nombre con hash, que se sirve
+con caché inmutable. Se conservan los archivos de la compilación anterior
+para las páginas que aún estén en caché; los más antiguos se borran.
+Es seguro ejecutarlo varias veces.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+    import rjsmin
+except ImportError:
+    rcssmin = rjsmin = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+SOURCE_DIRS = ("css", "js")
+
+
+def minify(source, ext):
+    """Minifica CSS/JS con rcssmin/rjsmin; sin ellos se deja tal cual"""
+    if ext == ".css" and rcssmin:
+        return rcssmin.cssmin(source)
+    if ext == ".js" and rjsmin:
+        return rjsmin.jsmin(source)
+    return source
+
+
+def write_file(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+print("🔄 Compilando assets estáticos...")
+if not rcssmin:
+    print("⚠️  rcssmin/rjsmin no instalados: los archivos no se minificarán")
+if not brotli:
+    print("⚠️  brotli no instalado: solo se generará .gz")
+
+try:
+    with open(MANIFEST_PATH) as f:
+        previous_manifest = json.load(f)
+except (OSError, ValueError):
+    previous_manifest = {}
+
+manifest = {}
+original_bytes = 0
+gzip_bytes = 0
+
+for source_dir in SOURCE_DIRS:
+    for name in sorted(os.listdir(os.path.join(STATIC_DIR, source_dir))):
+        root, ext = os.path.splitext(name)
+        if ext not in (".css", ".js"):
+            continue
+        with open(os.path.join(STATIC_DIR, source_dir, name), encoding="utf-8") as f:
+            source = f.read()
+
+        data = minify(source, ext).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        hashed_name = f"{source_dir}/{root}.{digest}{ext}"
+        output_path = os.path.join(DIST_DIR, *hashed_name.split("/"))
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        # mtime=0: la misma entrada produce siempre el mismo .gz
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        write_file(output_path, data)
+        write_file(f"{output_path}.gz", compressed)
+        if brotli:
+            write_file(f"{output_path}.br", brotli.compress(data, quality=11))
+
+        manifest[f"{source_dir}/{name}"] = f"dist/{hashed_name}"
+        original_bytes += len(source.encode("utf-8"))
+        gzip_bytes += len(compressed)
+
+write_file(MANIFEST_PATH, json.dumps(manifest, indent=2, sort_keys=True).encode())
+
+# Borrar compilaciones más antiguas que la anterior
+keep = {path[len("dist/") :] for path in (*manifest.values(), *previous_manifest.values())}
+removed = 0
+for source_dir in SOURCE_DIRS:
+    output_dir = os.path.join(DIST_DIR, source_dir)
+    for name in os.listdir(output_dir):
+        base = name[:-3] if name.endswith((".gz", ".br")) else name
+        if f"{source_dir}/{base}" not in keep:
+            os.remove(os.path.join(output_dir, name))
+            removed += 1
+
+print(f"✅ Archivos compilados: {len(manifest)}")
+print(f"✅ Tamaño: {original_bytes // 1024} KB → {gzip_bytes // 1024} KB con gzip")
+print(f"🗑️  Archivos antiguos eliminados: {removed}")
+print("\n" + "=" * 60)
+print("🎉 ASSETS COMPILADOS")
+print("=" * 60 + "\n")
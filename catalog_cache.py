@@ -0,0 +1,119 @@
+"""
+Caché en memoria con invalidación por versión (catálogo de mapas, usuarios)
+
+Cada worker de gunicorn guarda sus propias entradas (dicts serializados,
+cuerpos JSON, HTML de tarjetas, copias de usuarios). La versión se comparte
+entre workers mediante un archivo: cualquier escritura llama a bump() y el
+resto de workers vacía su caché en la siguiente lectura, así nunca sirve
+datos obsoletos.
+
+Con `ttl`, además, cada entrada caduca a los `ttl` segundos aunque la
+versión no cambie (lo usa la caché de usuarios).
+"""
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+class VersionedCache:
+    """Caché LRU acotada cuyas entradas valen solo para una versión de los datos"""
+
+    def __init__(self, version_path, max_entries=512, ttl=None):
+        self.version_path = version_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        os.makedirs(os.path.dirname(version_path), exist_ok=True)
+
+    def current_version(self):
+        """Lee la marca de versión compartida ('' si aún no existe)"""
+        try:
+            with open(self.version_path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def bump(self):
+        """Marca los datos como modificados; llamar después del commit.
+
+        La marca incluye un sufijo aleatorio, así dos workers que incrementan
+        a la vez nunca escriben la misma versión.
+        """
+        with self._lock:
+            previous = self.current_version()
+            try:
+                counter = int(previous.split("-", 1)[0]) + 1
+            except ValueError:
+                counter = 1
+            stamp = f"{counter}-{secrets.token_hex(4)}"
+
+            tmp_path = f"{self.version_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(stamp)
+            os.replace(tmp_path, self.version_path)
+
+            self._entries.clear()
+            self._version = stamp
+            self.invalidations += 1
+        return stamp
+
+    def get_or_set(self, key, factory):
+        """Devuelve la entrada de `key` o la calcula con factory() y la guarda.
+
+        None no se guarda: lo que aún no existe (p. ej. un usuario que se
+        registra justo después) se vuelve a buscar en la siguiente lectura.
+        """
+        version = self.current_version()
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = factory()
+
+        with self._lock:
+            # Si otro hilo cambió la versión mientras calculábamos, no guardar
+            if value is not None and self._version == version:
+                expires_at = time.monotonic() + self.ttl if self.ttl else None
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        """Contadores de este worker para el panel de administración"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "pid": os.getpid(),
+                "version": self._version or self.current_version(),
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+                "invalidations": self.invalidations,
+            }
+
+
+# Nombre anterior, cuando solo la usaba el catálogo
+CatalogCache = VersionedCache
@@ -1,10 +1,92 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+import json
+import re
+from dataclasses import asdict, dataclass
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
 
+def sqlite_pragmas(config):
+    """PRAGMA por conexión a partir de la configuración (SQLITE_*).
+
+    WAL permite leer mientras otro proceso escribe; synchronous=NORMAL es
+    seguro en WAL y evita un fsync por commit; busy_timeout hace esperar al
+    cerrojo en lugar de fallar con "database is locked".
+    """
+    return {
+        "journal_mode": config["SQLITE_JOURNAL_MODE"],
+        "synchronous": config["SQLITE_SYNCHRONOUS"],
+        "busy_timeout": config["SQLITE_BUSY_TIMEOUT_MS"],
+        "mmap_size": config["SQLITE_MMAP_SIZE"],
+        "cache_size": config["SQLITE_CACHE_SIZE"],
+    }
+
+
+def normalize_database_uri(uri):
+    """Acepta las URLs postgres:// de Render/Heroku y usa el driver psycopg 3"""
+    for prefix in ("postgres://", "postgresql://"):
+        if uri.startswith(prefix):
+            return "postgresql+psycopg://" + uri[len(prefix) :]
+    return uri
+
+
+def masked_database_uri(uri):
+    """URI de la base de datos para los logs, con la contraseña oculta"""
+    return make_url(uri).render_as_string(hide_password=True)
+
+
+def database_engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS para el motor configurado, con un pool explícito"""
+    options = {
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+    if make_url(config["SQLALCHEMY_DATABASE_URI"]).get_backend_name() == "sqlite":
+        # El timeout de pysqlite también cubre el primer PRAGMA de la conexión
+        options["connect_args"] = {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000}
+    else:
+        # Cerrar conexiones antes de que las corte el servidor o un balanceador
+        options["pool_recycle"] = config["DB_POOL_RECYCLE"]
+    return options
+
+
+def configure_sqlite_engine(engine, pragmas):
+    """Aplica los PRAGMA a cada conexión nueva que abra el pool del motor"""
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def get_for_update(model, obj_id):
+    """Carga una fila bloqueada hasta el commit, para leer-modificar-escribir.
+
+    En PostgreSQL es un SELECT ... FOR UPDATE. SQLite ignora FOR UPDATE, así
+    que antes se hace una escritura vacía sobre la fila: abre la transacción
+    con el cerrojo de escritura y la lectura posterior ve el último commit.
+    """
+    table = model.__table__
+    if db.engine.dialect.name == "sqlite":
+        db.session.execute(
+            table.update().where(table.c.id == obj_id).values(id=table.c.id)
+        )
+    return db.session.execute(
+        db.select(model)
+        .filter_by(id=obj_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+
+
 class User(db.Model):
     __tablename__ = "users"
 
@@ -29,12 +111,18 @@ class User(db.Model):
         "ChatMessage", backref="user", lazy=True, cascade="all, delete-orphan"
     )
 
-    def set_password(self, password):
-        self.password = generate_password_hash(password)
+    def set_password(self, password, hasher=None):
+        """Guarda el hash; con `hasher` (PasswordHasher) se calcula en su pool"""
+        if hasher:
+            self.password = hasher.hash(password)
+        else:
+            self.password = generate_password_hash(password)
 
-    def check_password(self, password):
+    def check_password(self, password, hasher=None):
         if not self.password:
             return False
+        if hasher:
+            return hasher.verify(self.password, password)
         return check_password_hash(self.password, password)
 
     def to_dict(self):
@@ -48,6 +136,40 @@ class User(db.Model):
             "created_at": self.created_at.isoformat(),
         }
 
+    def snapshot(self):
+        return UserSnapshot(
+            id=self.id,
+            email=self.email,
+            name=self.name,
+            profile_picture=self.profile_picture,
+            is_admin=bool(self.is_admin),
+            auth_provider=self.auth_provider,
+            created_at=self.created_at,
+        )
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Copia inmutable de los datos de un usuario, independiente de la sesión.
+
+    Es lo que guarda la caché de usuarios entre peticiones: se puede compartir
+    entre hilos y usar en plantillas como un User, pero no tiene relaciones
+    ni se puede modificar.
+    """
+
+    id: int
+    email: str
+    name: str
+    profile_picture: str
+    is_admin: bool
+    auth_provider: str
+    created_at: datetime
+
+    def to_dict(self):
+        data = asdict(self)
+        data["created_at"] = self.created_at.isoformat()
+        return data
+
 
 class Map(db.Model):
     __tablename__ = "maps"
@@ -69,6 +191,30 @@ class Map(db.Model):
         db.Boolean, default=True
     )  # True = Premium (pago), False = Gratis
 
+    # Agregados de calificaciones (mantenidos por add_comment/delete_comment)
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_1 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_2 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_3 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_4 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_5 = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    rating_avg = db.Column(db.Float, nullable=False, default=0, server_default="0")
+
+    # Manifiesto JSON de variantes responsive: {url: {formato: [[ancho, url], ...]}}
+    image_variants = db.Column(db.Text)
+    # Resumen JSON del archivo del mapa (archivos, tamaño, mundo, level.dat)
+    archive_manifest = db.Column(db.Text)
+
+    # Índices compuestos para la paginación por cursor del catálogo (/api/maps)
+    __table_args__ = (
+        db.Index("ix_maps_created_at_id", "created_at", "id"),
+        db.Index("ix_maps_premium_created_at_id", "is_premium", "created_at", "id"),
+        db.Index("ix_maps_featured_created_at_id", "is_featured", "created_at", "id"),
+        db.Index("ix_maps_price_id", "price", "id"),
+        db.Index("ix_maps_rating_avg_id", "rating_avg", "id"),
+    )
+
     # Relaciones
     comments = db.relationship(
         "Comment", backref="map", lazy=True, cascade="all, delete-orphan"
@@ -78,13 +224,82 @@ class Map(db.Model):
     )
 
     def average_rating(self):
-        if not self.comments:
+        if not self.review_count:
             return 0
-        total = sum(comment.rating for comment in self.comments if comment.rating)
-        return round(total / len(self.comments), 1) if self.comments else 0
+        return round(self.rating_sum / self.review_count, 1)
 
     def total_reviews(self):
-        return len(self.comments)
+        return self.review_count or 0
+
+    def rating_summary(self):
+        """Resumen de reseñas a partir de los agregados (sin leer comentarios)"""
+        return {
+            "average_rating": self.average_rating(),
+            "total_reviews": self.total_reviews(),
+            "rating_histogram": self.rating_histogram(),
+        }
+
+    def rating_histogram(self):
+        """Distribución de calificaciones {1: n, ..., 5: n}"""
+        return {star: getattr(self, f"rating_{star}") or 0 for star in range(1, 6)}
+
+    def variants_manifest(self):
+        """Manifiesto de variantes como dict ({} si no hay o está dañado)"""
+        try:
+            return json.loads(self.image_variants) if self.image_variants else {}
+        except ValueError:
+            return {}
+
+    def set_image_variants(self, url, formats):
+        """Registra las variantes de una imagen (formats: {formato: [[ancho, url]]}).
+
+        Modifica el JSON completo: desde trabajos en segundo plano, cargar el
+        mapa con get_for_update() para no pisar las variantes de otro trabajo.
+        """
+        manifest = self.variants_manifest()
+        if formats:
+            manifest[url] = formats
+        else:
+            manifest.pop(url, None)
+        self.image_variants = json.dumps(manifest) if manifest else None
+
+    def image_sources(self, url):
+        """Fuentes <source> para una imagen: [{"type", "srcset"}], AVIF primero"""
+        formats = self.variants_manifest().get(url) or {}
+        return [
+            {
+                "type": f"image/{fmt}",
+                "srcset": ", ".join(f"{src} {width}w" for width, src in formats[fmt]),
+            }
+            for fmt in IMAGE_VARIANT_FORMATS
+            if formats.get(fmt)
+        ]
+
+    def archive_info(self):
+        """Manifiesto del archivo del mapa como dict (None si aún no se analizó)"""
+        try:
+            return json.loads(self.archive_manifest) if self.archive_manifest else None
+        except ValueError:
+            return None
+
+    def apply_rating(self, rating, delta=1):
+        """Suma (delta=1) o resta (delta=-1) una calificación de los agregados.
+
+        Se usan expresiones SQL para que el UPDATE sea atómico dentro de la
+        transacción del comentario, aunque otro worker escriba a la vez.
+        """
+        rating = int(rating)
+        if not 1 <= rating <= 5:
+            return
+        column = f"rating_{rating}"
+        new_count = Map.review_count + delta
+        new_sum = Map.rating_sum + delta * rating
+        self.review_count = new_count
+        self.rating_sum = new_sum
+        self.rating_avg = db.case((new_count > 0, new_sum * 1.0 / new_count), else_=0.0)
+        setattr(self, column, getattr(Map, column) + delta)
+        # Enviar el UPDATE ya: dos llamadas seguidas no se pisan entre sí
+        db.session.flush()
 
     def to_dict(self):
         return {
@@ -96,8 +311,10 @@ class Map(db.Model):
             "features": self.features,
             "average_rating": self.average_rating(),
             "total_reviews": self.total_reviews(),
+            "rating_histogram": self.rating_histogram(),
             "is_featured": self.is_featured,
             "is_premium": self.is_premium,
+            "archive": self.archive_info(),
             "created_at": self.created_at.isoformat(),
         }
 
@@ -112,6 +329,12 @@ class Comment(db.Model):
     comment = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Índices para paginar los comentarios de un mapa por fecha o por calificación
+    __table_args__ = (
+        db.Index("ix_comments_map_created_at_id", "map_id", "created_at", "id"),
+        db.Index("ix_comments_map_rating_id", "map_id", "rating", "id"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -134,6 +357,11 @@ class Purchase(db.Model):
     status = db.Column(db.String(20), default="pending")  # pending, completed, failed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # "¿Este usuario compró este mapa?" se consulta en checkout, compra, reseñas y descargas
+    __table_args__ = (
+        db.Index("ix_purchases_user_map_status", "user_id", "map_id", "status"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -152,6 +380,9 @@ class ChatMessage(db.Model):
     message = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Historial reciente y limpieza de mensajes antiguos
+    __table_args__ = (db.Index("ix_chat_messages_created_at", "created_at"),)
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -172,6 +403,8 @@ class PasswordResetToken(db.Model):
     used = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (db.Index("ix_password_reset_tokens_email", "email"),)
+
     def is_valid(self):
         return not self.used and datetime.utcnow() < self.expires_at
 
@@ -192,6 +425,13 @@ class Notification(db.Model):
     # Relación con usuario
     user = db.relationship("User", backref="notifications", lazy=True)
 
+    # Bandeja del usuario por fecha y contador de no leídas
+    __table_args__ = (
+        db.Index(
+            "ix_notifications_user_read_created_at", "user_id", "is_read", "created_at"
+        ),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -201,3 +441,340 @@ class Notification(db.Model):
             "is_read": self.is_read,
             "created_at": self.created_at.isoformat(),
         }
+
+
+class BackgroundJob(db.Model):
+    """Trabajo en segundo plano del pool de procesos (imágenes o archivos de mapas).
+
+    El estado vive en la base de datos para que cualquier worker de gunicorn
+    pueda responder a la consulta, no solo el que encoló el trabajo.
+    """
+
+    __tablename__ = "background_jobs"
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    map_id = db.Column(db.Integer, db.ForeignKey("maps.id"), nullable=True)
+    kind = db.Column(db.String(30), nullable=False)  # map, gallery, profile, archive, upload
+    status = db.Column(db.String(20), default="pending")  # pending, done, failed
+    total = db.Column(db.Integer, default=0)
+    processed = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "map_id": self.map_id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class ChunkedUpload(db.Model):
+    """Subida por partes de un archivo de mapa (reanudable).
+
+    Los fragmentos se escriben directamente en un archivo preasignado; cada
+    fragmento recibido deja un marcador en disco, así varios workers pueden
+    recibir fragmentos en paralelo y el estado sobrevive a reinicios.
+    """
+
+    __tablename__ = "chunked_uploads"
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    map_id = db.Column(db.Integer, db.ForeignKey("maps.id"), nullable=True)
+    filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default="uploading")  # uploading, finalizing, complete
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+    def total_chunks(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    def chunk_length(self, index):
+        """Tamaño esperado del fragmento `index` (el último puede ser menor)"""
+        return min(self.chunk_size, self.total_size - index * self.chunk_size)
+
+    def to_dict(self, received=()):
+        return {
+            "upload_id": self.id,
+            "map_id": self.map_id,
+            "filename": self.filename,
+            "total_size": self.total_size,
+            "chunk_size": self.chunk_size,
+            "total_chunks": self.total_chunks(),
+            "received": sorted(received),
+            "status": self.status,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+
+# ==================== AGREGADOS DE CALIFICACIONES ====================
+
+RATING_AGGREGATE_COLUMNS = {
+    "review_count": "INTEGER",
+    "rating_sum": "INTEGER",
+    "rating_1": "INTEGER",
+    "rating_2": "INTEGER",
+    "rating_3": "INTEGER",
+    "rating_4": "INTEGER",
+    "rating_5": "INTEGER",
+    "rating_avg": "FLOAT",
+}
+
+
+def recalculate_rating_aggregates():
+    """Recalcula los agregados de todos los mapas desde la tabla de comentarios.
+
+    Usa una sola consulta agrupada; devuelve el número de mapas corregidos.
+    """
+    rows = (
+        db.session.query(Comment.map_id, Comment.rating, db.func.count(Comment.id))
+        .group_by(Comment.map_id, Comment.rating)
+        .all()
+    )
+
+    totals = {}
+    for map_id, rating, count in rows:
+        if not rating or not 1 <= rating <= 5:
+            continue
+        values = totals.setdefault(map_id, dict.fromkeys(RATING_AGGREGATE_COLUMNS, 0))
+        values["review_count"] += count
+        values["rating_sum"] += rating * count
+        values[f"rating_{rating}"] += count
+
+    for values in totals.values():
+        values["rating_avg"] = values["rating_sum"] / values["review_count"]
+
+    empty = dict.fromkeys(RATING_AGGREGATE_COLUMNS, 0)
+    fixed = 0
+    for map_obj in Map.query.all():
+        expected = totals.get(map_obj.id, empty)
+        current = {col: getattr(map_obj, col) for col in RATING_AGGREGATE_COLUMNS}
+        if current != expected:
+            for col, value in expected.items():
+                setattr(map_obj, col, value)
+            fixed += 1
+
+    db.session.commit()
+    return fixed
+
+
+# Orden de preferencia de los formatos de variantes en <picture>
+IMAGE_VARIANT_FORMATS = ("avif", "webp")
+
+
+# ==================== BÚSQUEDA DE TEXTO COMPLETO (SQLite FTS5) ====================
+
+# Texto de 'features' (JSON con una lista de strings) aplanado para indexarlo
+_FTS_FEATURES_SQL = (
+    "CASE WHEN json_valid({row}.features) AND json_type({row}.features) = 'array' "
+    "THEN (SELECT group_concat(value, ' ') FROM json_each({row}.features)) "
+    "ELSE coalesce({row}.features, '') END"
+)
+
+_FTS_INSERT_SQL = (
+    "INSERT INTO maps_fts(rowid, title, description, features) "
+    "VALUES ({row}.id, {row}.title, {row}.description, "
+    + _FTS_FEATURES_SQL
+    + ");"
+)
+
+SEARCH_INDEX_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS maps_fts USING fts5("
+    "title, description, features, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "CREATE TRIGGER IF NOT EXISTS maps_fts_ai AFTER INSERT ON maps BEGIN "
+    + _FTS_INSERT_SQL.format(row="new")
+    + " END",
+    "CREATE TRIGGER IF NOT EXISTS maps_fts_ad AFTER DELETE ON maps BEGIN "
+    "DELETE FROM maps_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS maps_fts_au "
+    "AFTER UPDATE OF title, description, features ON maps BEGIN "
+    "DELETE FROM maps_fts WHERE rowid = old.id; "
+    + _FTS_INSERT_SQL.format(row="new")
+    + " END",
+]
+
+SEARCH_INDEX_DROP_DDL = [
+    "DROP TRIGGER IF EXISTS maps_fts_au",
+    "DROP TRIGGER IF EXISTS maps_fts_ad",
+    "DROP TRIGGER IF EXISTS maps_fts_ai",
+    "DROP TABLE IF EXISTS maps_fts",
+]
+
+SEARCH_INDEX_REBUILD_SQL = (
+    "INSERT INTO maps_fts(rowid, title, description, features) "
+    "SELECT maps.id, maps.title, maps.description, "
+    + _FTS_FEATURES_SQL.format(row="maps")
+    + " FROM maps"
+)
+
+SEARCH_INDEX_OPTIMIZE_SQL = "INSERT INTO maps_fts(maps_fts) VALUES('optimize')"
+
+# Pesos BM25 por columna: title, description, features
+SEARCH_BM25_WEIGHTS = (10.0, 2.0, 4.0)
+
+# Delimitadores internos de highlight()/snippet(); se convierten a <mark> tras escapar
+SEARCH_MARK_OPEN = "\x02"
+SEARCH_MARK_CLOSE = "\x03"
+
+
+def search_index_available():
+    """True si existe maps_fts (SQLite y migración del índice aplicada)"""
+    if db.engine.dialect.name != "sqlite":
+        return False
+    row = db.session.execute(
+        db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'maps_fts'")
+    ).first()
+    return row is not None
+
+
+def rebuild_search_index():
+    """Vacía y vuelve a llenar maps_fts desde la tabla maps"""
+    if not search_index_available():
+        return
+    db.session.execute(db.text("DELETE FROM maps_fts"))
+    db.session.execute(db.text(SEARCH_INDEX_REBUILD_SQL))
+    db.session.commit()
+    optimize_search_index()
+
+
+def optimize_search_index():
+    """Fusiona los segmentos de maps_fts y descarta las entradas borradas.
+
+    Tras muchas ediciones/borrados los términos acumulan segmentos y marcas
+    de borrado que hacen más lentas las búsquedas; conviene ejecutarlo tras
+    cargas masivas (rebuild_search_index lo hace siempre).
+    """
+    if not search_index_available():
+        return
+    db.session.execute(db.text(SEARCH_INDEX_OPTIMIZE_SQL))
+    db.session.commit()
+
+
+def build_search_query(text):
+    """Convierte texto libre en una consulta FTS5 segura.
+
+    Cada palabra se entrecomilla (sin operadores ni sintaxis del usuario) y
+    todas deben aparecer. Solo la última se busca por prefijo, como en un
+    buscador mientras se escribe: los prefijos cortos en todas las palabras
+    multiplican los términos a recorrer.
+    """
+    terms = re.findall(r"\w+", text or "")[:10]
+    if not terms:
+        return ""
+    phrases = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= 2:
+        phrases[-1] += "*"
+    return " ".join(phrases)
+
+
+def search_maps(text, limit=20):
+    """Busca mapas por título, descripción y características.
+
+    Devuelve una lista de dicts ordenada por relevancia BM25, con el título
+    resaltado y un fragmento de la descripción (texto con SEARCH_MARK_*).
+    """
+    match = build_search_query(text)
+    if not match:
+        return []
+
+    if not search_index_available():
+        return _search_maps_like(text, limit)
+
+    # 1) Ranking: solo rowid y puntuación, sin tocar el contenido de los documentos
+    weights = ", ".join(str(w) for w in SEARCH_BM25_WEIGHTS)
+    ranked = db.session.execute(
+        db.text(
+            f"SELECT rowid, bm25(maps_fts, {weights}) AS score FROM maps_fts "
+            "WHERE maps_fts MATCH :match ORDER BY score LIMIT :limit"
+        ),
+        {"match": match, "limit": limit},
+    ).all()
+    if not ranked:
+        return []
+    scores = {row.rowid: row.score for row in ranked}
+
+    # 2) Fragmentos resaltados y datos del mapa, solo para la página de resultados
+    rows = db.session.execute(
+        db.text(
+            "SELECT maps.id, maps.title, maps.price, maps.image, maps.is_premium, "
+            "maps.is_featured, maps.review_count, maps.rating_sum, "
+            "highlight(maps_fts, 0, :open, :close) AS title_highlight, "
+            "snippet(maps_fts, 1, :open, :close, '…', 24) AS description_snippet, "
+            "snippet(maps_fts, 2, :open, :close, '…', 12) AS features_snippet "
+            "FROM maps_fts JOIN maps ON maps.id = maps_fts.rowid "
+            "WHERE maps_fts MATCH :match AND maps_fts.rowid IN :ids"
+        ).bindparams(db.bindparam("ids", expanding=True)),
+        {
+            "open": SEARCH_MARK_OPEN,
+            "close": SEARCH_MARK_CLOSE,
+            "match": match,
+            "ids": list(scores),
+        },
+    ).mappings()
+
+    results = []
+    for row in rows:
+        review_count = row["review_count"] or 0
+        results.append(
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "price": row["price"],
+                "image": row["image"],
+                "is_premium": bool(row["is_premium"]),
+                "is_featured": bool(row["is_featured"]),
+                "average_rating": (
+                    round(row["rating_sum"] / review_count, 1) if review_count else 0
+                ),
+                "total_reviews": review_count,
+                "title_highlight": row["title_highlight"],
+                "description_snippet": row["description_snippet"],
+                "features_snippet": row["features_snippet"],
+                "score": scores[row["id"]],
+            }
+        )
+    results.sort(key=lambda result: result["score"])
+    return results
+
+
+def _search_maps_like(text, limit):
+    """Búsqueda de respaldo con LIKE para motores sin FTS5 (sin ranking)"""
+    query = Map.query
+    for term in re.findall(r"\w+", text)[:10]:
+        pattern = f"%{term}%"
+        query = query.filter(
+            db.or_(
+                Map.title.ilike(pattern),
+                Map.description.ilike(pattern),
+                Map.features.ilike(pattern),
+            )
+        )
+    return [
+        {
+            "id": m.id,
+            "title": m.title,
+            "price": m.price,
+            "image": m.image,
+            "is_premium": m.is_premium,
+            "is_featured": m.is_featured,
+            "average_rating": m.average_rating(),
+            "total_reviews": m.total_reviews(),
+            "title_highlight": m.title,
+            "description_snippet": m.description[:160],
+            "features_snippet": "",
+            "score": 0,
+        }
+        for m in query.order_by(Map.created_at.desc()).limit(limit).all()
+    ]
@@ -0,0 +1,53 @@
+"""
+Script para leer el manifiesto de los archivos de mapas ya subidos
+
+Lee el directorio central de cada .zip/.mcworld (sin extraer nada) y guarda
+en 'maps' el número de archivos, el tamaño descomprimido, el nombre del mundo
+y si incluye level.dat. Los mapas subidos después de esta versión ya lo
+obtienen en segundo plano. Es seguro ejecutarlo varias veces.
+"""
+
+import json
+import os
+import sys
+
+from app import app, db, catalog_cache, map_file_path, ARCHIVE_MANIFEST_EXTENSIONS
+from archive_manifest import archive_manifest_task
+from database import Map
+import migrations
+
+print("🔄 Leyendo archivos de mapas...")
+
+with app.app_context():
+    if 3 not in migrations.applied_versions():
+        print("❌ Falta la migración 3: ejecutar `flask --app app db upgrade`")
+        sys.exit(1)
+
+    read = 0
+    failed = 0
+    for map_obj in Map.query.filter(Map.download_link.isnot(None)).all():
+        path = map_file_path(map_obj)
+        if not path:
+            print(f"⚠️  No existe: {map_obj.download_link}")
+            continue
+        ext = os.path.splitext(path)[1].lower().lstrip(".")
+        if ext not in ARCHIVE_MANIFEST_EXTENSIONS:
+            continue
+
+        result = archive_manifest_task(path)
+        if result["error"]:
+            print(f"❌ {map_obj.title}: {result['error']}")
+            map_obj.archive_manifest = json.dumps({"error": result["error"]})
+            failed += 1
+        else:
+            map_obj.archive_manifest = json.dumps(result["manifest"])
+            read += 1
+
+    db.session.commit()
+    catalog_cache.bump()
+
+    print(f"✅ Archivos leídos: {read}")
+    print(f"❌ Archivos ilegibles: {failed}")
+    print("\n" + "=" * 60)
+    print("🎉 MANIFIESTOS DE ARCHIVOS GENERADOS")
+    print("=" * 60 + "\n")
@@ -0,0 +1,50 @@
+"""
+Script para generar las variantes responsive de las imágenes ya subidas
+
+Recorre la portada y la galería de cada mapa, genera las copias AVIF/WebP a
+los anchos de IMAGE_VARIANT_WIDTHS y guarda el manifiesto en 'maps'. Los
+mapas subidos después de esta versión ya las generan en segundo plano.
+Es seguro ejecutarlo varias veces.
+"""
+
+import json
+import os
+import sys
+
+from app import app, db, catalog_cache, variant_urls, IMAGE_VARIANT_WIDTHS
+from database import Map
+from image_worker import generate_variants, variant_formats
+import migrations
+
+print("🔄 Generando variantes de imágenes...")
+print(f"✅ Formatos disponibles: {', '.join(variant_formats()) or 'ninguno'}")
+
+with app.app_context():
+    if 3 not in migrations.applied_versions():
+        print("❌ Falta la migración 3: ejecutar `flask --app app db upgrade`")
+        sys.exit(1)
+
+    generated = 0
+    for map_obj in Map.query.all():
+        urls = [map_obj.image]
+        if map_obj.gallery_images:
+            urls += json.loads(map_obj.gallery_images)
+
+        for url in dict.fromkeys(urls):
+            if not url or not url.startswith("/static/uploads/"):
+                continue
+            path = os.path.join(app.root_path, url.lstrip("/"))
+            if not os.path.exists(path):
+                print(f"⚠️  No existe: {url}")
+                continue
+            formats = generate_variants(path, IMAGE_VARIANT_WIDTHS)
+            map_obj.set_image_variants(url, variant_urls(url, formats))
+            generated += 1
+
+    db.session.commit()
+    catalog_cache.bump()
+
+    print(f"✅ Imágenes procesadas: {generated}")
+    print("\n" + "=" * 60)
+    print("🎉 VARIANTES DE IMÁGENES GENERADAS")
+    print("=" * 60 + "\n")
@@ -0,0 +1,92 @@
+"""
+Verificación local de ID tokens de Google con certificados en caché
+
+id_token.verify_oauth2_token(token, google_requests.Request(), ...) abre una
+conexión HTTPS nueva y descarga los certificados de Google en cada login.
+GoogleTokenVerifier usa una sola requests.Session por proceso (conexiones
+reutilizadas) y guarda los certificados el tiempo que indica el max-age de
+Cache-Control de la respuesta. Con la caché vigente la firma se comprueba
+en local, sin ninguna petición de red.
+
+Si llega un token firmado con una clave que no está en caché (Google rota
+las claves), se vuelve a descargar como mucho una vez cada
+min_refresh_interval segundos.
+"""
+
+import re
+import threading
+import time
+
+import requests
+from google.auth import jwt
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleTokenVerifier:
+    """Verificador de ID tokens de Google compartido por todos los hilos"""
+
+    def __init__(
+        self,
+        certs_url=GOOGLE_CERTS_URL,
+        default_max_age=3600,
+        min_refresh_interval=60,
+        timeout=5,
+        clock_skew=10,
+    ):
+        self.certs_url = certs_url
+        self.default_max_age = default_max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.clock_skew = clock_skew
+        self.fetches = 0
+        self._certs = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        # La sesión mantiene abiertas las conexiones con googleapis.com
+        self._session = requests.Session()
+
+    def _fetch(self):
+        response = self._session.get(self.certs_url, timeout=self.timeout)
+        response.raise_for_status()
+        certs = response.json()
+        match = _MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+        max_age = int(match.group(1)) if match else self.default_max_age
+
+        now = time.monotonic()
+        self._certs = certs
+        self._expires_at = now + max_age
+        self._fetched_at = now
+        self.fetches += 1
+
+    def certs(self, key_id=None):
+        """Certificados vigentes; se descargan si caducaron o falta `key_id`"""
+        with self._lock:
+            now = time.monotonic()
+            missing_key = (
+                key_id is not None
+                and key_id not in self._certs
+                and now - self._fetched_at >= self.min_refresh_interval
+            )
+            if now >= self._expires_at or missing_key:
+                # Un solo hilo descarga; el resto espera al cerrojo y usa el resultado
+                self._fetch()
+            return self._certs
+
+    def verify(self, token, audience):
+        """Decodifica y valida `token`; lanza ValueError si no es válido"""
+        header = jwt.decode_header(token)
+        certs = self.certs(header.get("kid"))
+        idinfo = jwt.decode(
+            token,
+            certs=certs,
+            audience=audience,
+            clock_skew_in_seconds=self.clock_skew,
+        )
+        if idinfo.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Emisor del token no válido: {idinfo.get('iss')}")
+        return idinfo
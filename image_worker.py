@@ -0,0 +1,190 @@
+"""
+Procesamiento de imágenes en segundo plano
+
+Los redimensionados LANCZOS de Pillow se ejecutan en un pool de procesos
+acotado para no bloquear los hilos de gunicorn durante las subidas. Este
+módulo solo importa Pillow y la librería estándar: los procesos hijos se
+crean con "spawn" y lo importan sin arrastrar la aplicación Flask.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image, features
+
+from blob_store import BlobStore
+
+# Calidad por formato: AVIF rinde igual que WebP con un valor menor
+VARIANT_QUALITY = {"avif": 55, "webp": 75}
+
+
+def optimize_image(image_path, max_size=(800, 800)):
+    """Optimiza y redimensiona una imagen en su sitio.
+
+    Se escribe en un archivo temporal y se reemplaza de forma atómica, así
+    nunca se sirve una imagen a medio escribir.
+    """
+    root, ext = os.path.splitext(image_path)
+    tmp_path = f"{root}.{os.getpid()}.tmp{ext}"
+    try:
+        with Image.open(image_path) as img:
+            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+            img.save(tmp_path, optimize=True, quality=85)
+        os.replace(tmp_path, image_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def variant_formats():
+    """Formatos de variantes que soporta este Pillow, del más ligero al más pesado"""
+    formats = []
+    for module in ("avif", "webp"):
+        try:
+            if features.check_module(module):
+                formats.append(module)
+        except ValueError:
+            # Pillow < 11.2 no conoce el módulo "avif"
+            pass
+    return formats
+
+
+def generate_variants(image_path, widths):
+    """Genera copias de la imagen a varios anchos en AVIF/WebP.
+
+    Los archivos quedan junto al original como "<nombre>-<ancho>w.<formato>".
+    Nunca se amplía: los anchos mayores que la imagen se reemplazan por su
+    ancho real. Devuelve {formato: [[ancho, nombre_de_archivo], ...]}.
+    """
+    root, _ = os.path.splitext(image_path)
+    manifest = {}
+    with Image.open(image_path) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        targets = sorted({min(w, img.width) for w in widths} | {img.width})
+        for fmt in variant_formats():
+            entries = []
+            for width in targets:
+                height = max(1, round(img.height * width / img.width))
+                resized = (
+                    img
+                    if width == img.width
+                    else img.resize((width, height), Image.Resampling.LANCZOS)
+                )
+                variant_path = f"{root}-{width}w.{fmt}"
+                entries.append([width, os.path.basename(variant_path)])
+                if os.path.exists(variant_path):
+                    # Blob deduplicado: sus variantes ya existen
+                    continue
+                tmp_path = f"{root}-{width}w.{os.getpid()}.tmp.{fmt}"
+                resized.save(tmp_path, format=fmt.upper(), quality=VARIANT_QUALITY[fmt])
+                os.replace(tmp_path, variant_path)
+            manifest[fmt] = entries
+    return manifest
+
+
+def process_images(tasks):
+    """Procesa una lista de tareas de imagen; se ejecuta en un proceso hijo.
+
+    Cada tarea es un dict con "path", "max_size" y opcionalmente "widths"
+    (anchos de variantes), "store" (carpeta de blobs a la que se mueve la
+    imagen ya optimizada) y "url" (se devuelve tal cual para identificarla).
+    Devuelve el número de imágenes procesadas, las claves de los blobs, los
+    manifiestos de variantes y los errores por archivo, sin abortar el lote
+    si una imagen falla.
+    """
+    processed = 0
+    stored = []
+    variants = []
+    errors = []
+    for task in tasks:
+        image_path = task["path"]
+        try:
+            optimize_image(image_path, tuple(task["max_size"]))
+            if task.get("store"):
+                store = BlobStore(task["store"])
+                key = store.ingest(image_path)[0]
+                stored.append({"url": task.get("url"), "key": key})
+                image_path = store.path(key)
+            if task.get("widths"):
+                variants.append(
+                    {
+                        "url": task.get("url"),
+                        "formats": generate_variants(image_path, task["widths"]),
+                    }
+                )
+            processed += 1
+        except Exception as e:
+            errors.append(f"{os.path.basename(image_path)}: {e}")
+    return {
+        "processed": processed,
+        "stored": stored,
+        "variants": variants,
+        "errors": errors,
+    }
+
+
+class ImagePoolFull(Exception):
+    """La cola de trabajos de este worker está llena (o el pool no arranca)"""
+
+
+class ImageWorkerPool:
+    """Pool de procesos con un límite de trabajos en cola.
+
+    max_workers fija cuántos lotes se procesan a la vez y max_pending cuántos
+    pueden esperar. submit() reserva el hueco y encola bajo el mismo cerrojo,
+    así que el límite se cumple aunque lleguen varias subidas a la vez; con la
+    cola llena lanza ImagePoolFull y la ruta responde 503. saturated() sirve
+    para rechazar la petición antes de guardar nada.
+    """
+
+    def __init__(self, max_workers=2, max_pending=32):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Se crea al primer uso: cada worker de gunicorn tiene su propio pool
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def saturated(self):
+        """True si no caben más trabajos en la cola de este worker"""
+        with self._lock:
+            return self.pending >= self.max_pending
+
+    def submit(self, tasks, on_done, fn=process_images):
+        """Envía un lote al pool; on_done(result, error) se llama al terminar.
+
+        fn es la función que recibe `tasks` en el proceso hijo (por defecto el
+        procesado de imágenes); debe estar en un módulo ligero e importable.
+        """
+
+        def _done(future):
+            with self._lock:
+                self.pending -= 1
+            error = future.exception()
+            on_done(None if error else future.result(), error)
+
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise ImagePoolFull(f"{self.pending} trabajos en cola")
+            try:
+                future = self._get_executor().submit(fn, tasks)
+            except BrokenProcessPool:
+                # Un hijo murió (p. ej. por memoria): recrear el pool y reintentar
+                self._executor = None
+                future = self._get_executor().submit(fn, tasks)
+            self.pending += 1
+        future.add_done_callback(_done)
+        return future
@@ -1,21 +1,23 @@
 """
-Script para inicializar la base de datos desde cero
+Script para inicializar la base de datos
+
+Aplica las migraciones pendientes (en una base vacía crea antes las tablas)
+y crea el administrador y los mapas de ejemplo si faltan. No borra datos:
+para empezar de cero con SQLite, eliminar antes instance/hbuilds.db.
 """
 
 import json
 from app import app, db
 from database import User, Map
+import migrations
 
 print("🔄 Inicializando base de datos...")
 
 with app.app_context():
-    # Eliminar todas las tablas
-    db.drop_all()
-    print("✅ Tablas anteriores eliminadas")
-
-    # Crear todas las tablas con el esquema actualizado
-    db.create_all()
-    print("✅ Tablas creadas con esquema actualizado")
+    # Crear o actualizar el esquema con las migraciones versionadas
+    applied = migrations.upgrade()
+    print(f"✅ Migraciones aplicadas: {applied or 'ninguna pendiente'}")
+    print(f"✅ Esquema en la versión {migrations.current_version()}")
 
     # Verificar que la tabla maps tiene la columna is_premium
     from sqlalchemy import inspect
@@ -34,17 +36,20 @@ with app.app_context():
         exit(1)
 
     # Crear usuario administrador
-    admin = User(
-        name="Administrator",
-        email="admin@hbuilds.com",
-        is_admin=True,
-        auth_provider="local",
-    )
-    admin.set_password("admin123")
-    db.session.add(admin)
-    print("✅ Usuario administrador creado")
-    print("   📧 Email: admin@hbuilds.com")
-    print("   🔑 Password: admin123")
+    if User.query.filter_by(email="admin@hbuilds.com").first():
+        print("✅ Usuario administrador ya existente")
+    else:
+        admin = User(
+            name="Administrator",
+            email="admin@hbuilds.com",
+            is_admin=True,
+            auth_provider="local",
+        )
+        admin.set_password("admin123")
+        db.session.add(admin)
+        print("✅ Usuario administrador creado")
+        print("   📧 Email: admin@hbuilds.com")
+        print("   🔑 Password: admin123")
 
     # Crear mapas de ejemplo
     map1 = Map(
@@ -95,10 +100,13 @@ with app.app_context():
         is_premium=False,
     )
 
-    db.session.add(map1)
-    db.session.add(map2)
-    db.session.add(map3)
-    print("✅ Mapas de ejemplo creados (2 premium, 1 gratis)")
+    if Map.query.count() > 0:
+        print("✅ Ya hay mapas, no se crean los de ejemplo")
+    else:
+        db.session.add(map1)
+        db.session.add(map2)
+        db.session.add(map3)
+        print("✅ Mapas de ejemplo creados (2 premium, 1 gratis)")
 
     # Guardar todos los cambios
     db.session.commit()
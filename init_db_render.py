@@ -8,10 +8,11 @@ import sys
 import json
 from pathlib import Path
 
-# Verificar si la base de datos ya existe
+# Verificar si la base de datos ya existe (con PostgreSQL se comprueba más abajo)
 db_path = Path("instance/hbuilds.db")
+using_external_db = bool(os.getenv("DATABASE_URI") or os.getenv("DATABASE_URL"))
 
-if db_path.exists():
+if not using_external_db and db_path.exists():
     print("✅ Base de datos ya existe, omitiendo inicialización")
     sys.exit(0)
 
@@ -19,11 +20,16 @@ print("🔄 Base de datos no encontrada, inicializando...")
 
 from app import app, db
 from database import User, Map
+import migrations
 
 with app.app_context():
+    if db.inspect(db.engine).has_table("users") and User.query.first():
+        print("✅ Base de datos ya inicializada, omitiendo inicialización")
+        sys.exit(0)
+
     try:
-        # Crear todas las tablas
-        db.create_all()
+        # Crear las tablas con las migraciones versionadas
+        migrations.upgrade()
         print("✅ Tablas creadas")
 
         # Crear usuario administrador desde variables de entorno
@@ -0,0 +1,145 @@
+"""
+Seguimiento de IPs sospechosas con memoria acotada y caducidad O(1)
+
+Cuenta las peticiones de cada IP en una ventana de tiempo y bloquea las que
+superan el umbral. Las IPs se guardan en un OrderedDict en orden de último
+acceso (LRU): las que llevan más de una ventana sin peticiones están siempre
+al principio, así que en cada petición se retiran las que toquen (coste
+amortizado O(1)) en lugar de recorrer todo el diccionario. Si se llega a
+max_tracked, se descarta la usada hace más tiempo: una avalancha de IPs
+distintas no hace crecer la memoria ni expulsa a las IPs que siguen
+enviando peticiones.
+
+Los bloqueos automáticos duran block_duration segundos y también están
+acotados (max_blocked). Los bloqueos manuales del admin no caducan.
+Todas las operaciones son seguras entre los hilos de un worker.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class IPReputationTracker:
+    """Ventana por IP acotada en memoria, con lista de IPs bloqueadas"""
+
+    def __init__(
+        self,
+        threshold=100,
+        window=60,
+        block_duration=3600,
+        max_tracked=100_000,
+        max_blocked=50_000,
+    ):
+        self.threshold = threshold
+        self.window = window
+        self.block_duration = block_duration
+        self.max_tracked = max_tracked
+        self.max_blocked = max_blocked
+        self.evicted = 0
+        # ip -> [peticiones, inicio de la ventana, último acceso], en orden LRU
+        self._tracked = OrderedDict()
+        # ip -> fin del bloqueo, en el mismo orden en que se bloquearon
+        self._blocked = OrderedDict()
+        self._manual_blocks = set()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        """Retira del principio las ventanas y bloqueos caducados"""
+        tracked = self._tracked
+        while tracked:
+            ip, entry = next(iter(tracked.items()))
+            if now - entry[2] <= self.window:
+                break
+            del tracked[ip]
+        blocked = self._blocked
+        while blocked:
+            ip, until = next(iter(blocked.items()))
+            if until > now:
+                break
+            del blocked[ip]
+
+    def is_blocked(self, ip, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            return ip in self._manual_blocks or ip in self._blocked
+
+    def hit(self, ip, now=None):
+        """Cuenta una petición de `ip`; True si con ella queda bloqueada"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            tracked = self._tracked
+            entry = tracked.get(ip)
+            if entry is None:
+                if len(tracked) >= self.max_tracked:
+                    tracked.popitem(last=False)
+                    self.evicted += 1
+                tracked[ip] = [1, now, now]
+                return False
+
+            tracked.move_to_end(ip)
+            entry[2] = now
+            if now - entry[1] > self.window:
+                # Ventana vencida: empezar a contar de nuevo
+                entry[0], entry[1] = 1, now
+                return False
+            entry[0] += 1
+            if entry[0] <= self.threshold:
+                return False
+            del tracked[ip]
+            self._block(ip, now)
+            return True
+
+    def _block(self, ip, now):
+        self._blocked.pop(ip, None)
+        if len(self._blocked) >= self.max_blocked:
+            self._blocked.popitem(last=False)
+            self.evicted += 1
+        self._blocked[ip] = now + self.block_duration
+
+    def block(self, ip):
+        """Bloqueo manual (sin caducidad)"""
+        with self._lock:
+            self._manual_blocks.add(ip)
+            self._tracked.pop(ip, None)
+
+    def unblock(self, ip):
+        """Quita cualquier bloqueo de `ip`; False si no estaba bloqueada"""
+        with self._lock:
+            self._expire(time.time())
+            was_blocked = ip in self._manual_blocks or ip in self._blocked
+            self._manual_blocks.discard(ip)
+            self._blocked.pop(ip, None)
+            return was_blocked
+
+    def clear(self):
+        """Borra bloqueos y contadores; devuelve cuántas IPs estaban bloqueadas"""
+        with self._lock:
+            count = len(self._manual_blocks | self._blocked.keys())
+            self._tracked.clear()
+            self._blocked.clear()
+            self._manual_blocks.clear()
+            return count
+
+    def blocked_ips(self):
+        with self._lock:
+            self._expire(time.time())
+            return sorted(self._manual_blocks | self._blocked.keys())
+
+    def suspicious_ips(self):
+        """{ip: (peticiones, inicio de la ventana)} de las ventanas vigentes"""
+        with self._lock:
+            self._expire(time.time())
+            return {ip: (entry[0], entry[1]) for ip, entry in self._tracked.items()}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tracked": len(self._tracked),
+                "max_tracked": self.max_tracked,
+                "blocked": len(self._blocked) + len(self._manual_blocks),
+                "max_blocked": self.max_blocked,
+                "evicted": self.evicted,
+            }
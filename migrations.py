@@ -0,0 +1,325 @@
+"""
+Migraciones versionadas y reversibles del esquema
+
+Cada migración tiene un número de versión, una descripción y sus funciones
+upgrade/downgrade, que reciben una conexión dentro de una transacción. La
+tabla 'schema_migrations' guarda las versiones aplicadas, así una base de
+datos existente se actualiza sin perder datos en lugar de pasar por
+db.drop_all().
+
+Todas las migraciones son idempotentes (IF NOT EXISTS, columnas y tablas
+que solo se crean si faltan). En una base vacía upgrade() crea primero las
+tablas con create_all (los modelos de database.py declaran el esquema
+final) y después registra las migraciones, que solo completan lo que
+create_all no crea, como el índice FTS5. Se aplican en el despliegue con:
+
+    flask --app app db upgrade
+
+Los workers no aplican migraciones al arrancar: solo comprueban la versión,
+así un `flask db downgrade` se mantiene hasta el siguiente upgrade.
+"""
+
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from database import (
+    db,
+    BackgroundJob,
+    ChunkedUpload,
+    Comment,
+    Map,
+    RATING_AGGREGATE_COLUMNS,
+    SEARCH_INDEX_DDL,
+    SEARCH_INDEX_DROP_DDL,
+    SEARCH_INDEX_OPTIMIZE_SQL,
+    SEARCH_INDEX_REBUILD_SQL,
+)
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+class Migration:
+    def __init__(self, version, description, upgrade, downgrade):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+        self.downgrade = downgrade
+
+
+def _create_indexes(*indexes):
+    """upgrade/downgrade para una lista de (nombre, tabla, columnas)"""
+
+    def upgrade(conn):
+        for name, table, columns in indexes:
+            columns_sql = ", ".join(columns)
+            conn.execute(
+                db.text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns_sql})")
+            )
+
+    def downgrade(conn):
+        for name, _, _ in indexes:
+            conn.execute(db.text(f"DROP INDEX IF EXISTS {name}"))
+
+    return upgrade, downgrade
+
+
+def _add_columns(table, columns):
+    """upgrade/downgrade para un dict {columna: tipo SQL} de `table`"""
+
+    def existing(conn):
+        return {col["name"] for col in db.inspect(conn).get_columns(table)}
+
+    def upgrade(conn):
+        present = existing(conn)
+        for column, sql_type in columns.items():
+            if column not in present:
+                conn.execute(
+                    db.text(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type}")
+                )
+
+    def downgrade(conn):
+        present = existing(conn)
+        for column in columns:
+            if column in present:
+                conn.execute(db.text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+
+    return upgrade, downgrade
+
+
+def _create_tables(*models):
+    """upgrade/downgrade que crean/borran las tablas de `models` si hace falta"""
+
+    def upgrade(conn):
+        for model in models:
+            model.__table__.create(conn, checkfirst=True)
+
+    def downgrade(conn):
+        for model in reversed(models):
+            model.__table__.drop(conn, checkfirst=True)
+
+    return upgrade, downgrade
+
+
+def _model_indexes(*models):
+    """(nombre, tabla, columnas) de los índices declarados en `models`"""
+    return [
+        (index.name, model.__tablename__, tuple(col.name for col in index.columns))
+        for model in models
+        for index in sorted(model.__table__.indexes, key=lambda index: index.name)
+    ]
+
+
+# ---------- Agregados de calificaciones ----------
+
+_add_rating_columns, _drop_rating_columns = _add_columns(
+    "maps",
+    {
+        column: f"{sql_type} NOT NULL DEFAULT 0"
+        for column, sql_type in RATING_AGGREGATE_COLUMNS.items()
+    },
+)
+
+
+def _rating_subquery(expression, condition="c.rating BETWEEN 1 AND 5"):
+    return (
+        f"(SELECT {expression} FROM comments c "
+        f"WHERE c.map_id = maps.id AND {condition})"
+    )
+
+
+# Un solo UPDATE con subconsultas correlacionadas (SQLite y PostgreSQL)
+RATING_RECALCULATE_SQL = "UPDATE maps SET " + ", ".join(
+    [
+        f"review_count = {_rating_subquery('count(*)')}",
+        f"rating_sum = {_rating_subquery('coalesce(sum(c.rating), 0)')}",
+        f"rating_avg = coalesce({_rating_subquery('avg(c.rating)')}, 0)",
+    ]
+    + [
+        f"rating_{stars} = {_rating_subquery('count(*)', f'c.rating = {stars}')}"
+        for stars in range(1, 6)
+    ]
+)
+
+
+def _add_rating_aggregates(conn):
+    """Crea las columnas de agregados y las rellena desde 'comments'"""
+    _add_rating_columns(conn)
+    conn.execute(db.text(RATING_RECALCULATE_SQL))
+
+
+# ---------- Búsqueda de texto completo ----------
+
+
+def _create_search_index(conn):
+    """Tabla FTS5 y triggers que la sincronizan con 'maps' (solo SQLite).
+
+    Los triggers cubren upload_map, edit_map y delete_map (y cualquier otra
+    escritura), así que no hace falta tocar el índice desde las rutas. En
+    PostgreSQL la búsqueda usa ILIKE y no hay nada que crear.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    created = "maps_fts" not in db.inspect(conn).get_table_names()
+    for statement in SEARCH_INDEX_DDL:
+        conn.execute(db.text(statement))
+    if created:
+        conn.execute(db.text(SEARCH_INDEX_REBUILD_SQL))
+        conn.execute(db.text(SEARCH_INDEX_OPTIMIZE_SQL))
+
+
+def _drop_search_index(conn):
+    if conn.dialect.name != "sqlite":
+        return
+    for statement in SEARCH_INDEX_DROP_DDL:
+        conn.execute(db.text(statement))
+
+
+# Comment(map_id, created_at) ya lo cubre ix_comments_map_created_at_id
+MIGRATIONS = [
+    Migration(
+        1,
+        "Índices de compras, chat, notificaciones y tokens de recuperación",
+        *_create_indexes(
+            (
+                "ix_purchases_user_map_status",
+                "purchases",
+                ("user_id", "map_id", "status"),
+            ),
+            ("ix_chat_messages_created_at", "chat_messages", ("created_at",)),
+            (
+                "ix_notifications_user_read_created_at",
+                "notifications",
+                ("user_id", "is_read", "created_at"),
+            ),
+            ("ix_password_reset_tokens_email", "password_reset_tokens", ("email",)),
+        ),
+    ),
+    Migration(
+        2,
+        "Agregados de calificaciones en maps",
+        _add_rating_aggregates,
+        _drop_rating_columns,
+    ),
+    Migration(
+        3,
+        "Variantes de imágenes y manifiesto del archivo en maps",
+        *_add_columns("maps", {"image_variants": "TEXT", "archive_manifest": "TEXT"}),
+    ),
+    Migration(
+        4,
+        "Índices del catálogo y de los comentarios",
+        *_create_indexes(*_model_indexes(Map, Comment)),
+    ),
+    Migration(
+        5,
+        "Tablas de trabajos en segundo plano y subidas por partes",
+        *_create_tables(BackgroundJob, ChunkedUpload),
+    ),
+    Migration(
+        6,
+        "Índice de búsqueda FTS5 de mapas",
+        _create_search_index,
+        _drop_search_index,
+    ),
+]
+
+LATEST_VERSION = max(m.version for m in MIGRATIONS)
+
+
+def _ensure_migrations_table():
+    with db.engine.begin() as conn:
+        conn.execute(
+            db.text(
+                f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+                "version INTEGER PRIMARY KEY, "
+                "description VARCHAR(200) NOT NULL, "
+                "applied_at TIMESTAMP NOT NULL)"
+            )
+        )
+
+
+def applied_versions():
+    """Versiones ya aplicadas en esta base de datos"""
+    _ensure_migrations_table()
+    with db.engine.connect() as conn:
+        rows = conn.execute(db.text(f"SELECT version FROM {MIGRATIONS_TABLE}"))
+        return {row[0] for row in rows}
+
+
+def schema_exists():
+    """False si la base de datos está vacía (ni siquiera tiene 'users')"""
+    return db.inspect(db.engine).has_table("users")
+
+
+def current_version():
+    """Versión más alta aplicada (0 si ninguna)"""
+    return max(applied_versions(), default=0)
+
+
+def pending_versions():
+    """Versiones conocidas que faltan por aplicar"""
+    applied = applied_versions()
+    return [m.version for m in MIGRATIONS if m.version not in applied]
+
+
+def migration_status():
+    """Lista de (migración, aplicada) en orden de versión"""
+    applied = applied_versions()
+    return [(m, m.version in applied) for m in MIGRATIONS]
+
+
+def upgrade(target=None):
+    """Aplica en orden las migraciones pendientes hasta `target` (o todas).
+
+    Cada migración y su registro van en la misma transacción: si falla, no
+    queda a medias. Si otro proceso la aplica a la vez, se da por aplicada.
+    En una base vacía crea antes las tablas desde los modelos. Devuelve las
+    versiones aplicadas.
+    """
+    target = LATEST_VERSION if target is None else target
+    if not schema_exists():
+        db.create_all()
+    applied = applied_versions()
+    done = []
+    for migration in MIGRATIONS:
+        if migration.version > target or migration.version in applied:
+            continue
+        try:
+            with db.engine.begin() as conn:
+                migration.upgrade(conn)
+                conn.execute(
+                    db.text(
+                        f"INSERT INTO {MIGRATIONS_TABLE} (version, description, applied_at) "
+                        "VALUES (:version, :description, :applied_at)"
+                    ),
+                    {
+                        "version": migration.version,
+                        "description": migration.description,
+                        "applied_at": datetime.utcnow(),
+                    },
+                )
+        except IntegrityError:
+            continue
+        done.append(migration.version)
+    return done
+
+
+def downgrade(target):
+    """Revierte, de la más nueva a la más antigua, las posteriores a `target`.
+
+    Devuelve las versiones revertidas.
+    """
+    applied = applied_versions()
+    done = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version, reverse=True):
+        if migration.version <= target or migration.version not in applied:
+            continue
+        with db.engine.begin() as conn:
+            migration.downgrade(conn)
+            conn.execute(
+                db.text(f"DELETE FROM {MIGRATIONS_TABLE} WHERE version = :version"),
+                {"version": migration.version},
+            )
+        done.append(migration.version)
+    return done
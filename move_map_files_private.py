@@ -0,0 +1,31 @@
+"""
+Script para mover los archivos de mapas al almacenamiento privado
+
+Los mapas subidos antes de las descargas protegidas guardaban el .zip/.mcworld
+en /static/uploads/maps/, accesible sin comprar. Este script los mueve a
+MAP_FILES_FOLDER (almacén direccionado por contenido) y actualiza
+download_link; después solo se pueden descargar por /api/download/<id>/file.
+La app también los migra al vuelo la primera vez que se piden; el script
+lo hace de una vez. Es seguro ejecutarlo varias veces.
+"""
+
+from app import app, migrate_legacy_map_file
+from database import Map
+
+print("🔄 Moviendo archivos de mapas al almacenamiento privado...")
+
+with app.app_context():
+    moved = 0
+    for map_obj in Map.query.filter(Map.download_link.like("/static/%")).all():
+        legacy_link = map_obj.download_link
+        if not migrate_legacy_map_file(map_obj):
+            print(f"⚠️  No existe: {legacy_link}")
+            continue
+
+        moved += 1
+        print(f"✅ {map_obj.title}: {map_obj.download_link}")
+
+    print(f"✅ Archivos movidos: {moved}")
+    print("\n" + "=" * 60)
+    print("🎉 ARCHIVOS DE MAPAS PROTEGIDOS")
+    print("=" * 60 + "\n")
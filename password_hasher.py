@@ -0,0 +1,124 @@
+"""
+Hash de contraseñas fuera de los hilos de peticiones
+
+PBKDF2 y scrypt tardan decenas o cientos de milisegundos de CPU. Con 4 hilos
+por worker de gunicorn, una ráfaga de logins los ocupa todos y las páginas
+quedan en cola detrás. PasswordHasher limita cuántos hashes se calculan a la
+vez (hashlib libera el GIL, así que un pool de hilos basta) y cuántos pueden
+estar en curso. El hueco se reserva con el mismo cerrojo con el que se
+comprueba el límite; si no queda ninguno se lanza PasswordHasherBusy y la
+ruta responde 503 en lugar de acumular peticiones.
+
+Cada hash en curso ocupa un hilo de petición mientras espera, así que
+max_pending debe ser menor que los hilos por worker: con el valor por
+defecto (2 de 4) siempre quedan hilos libres para el resto de páginas.
+
+El método y el coste se configuran con el formato de Werkzeug (por ejemplo
+"scrypt:32768:8:1" o "pbkdf2:sha256:600000"). needs_rehash() indica si un
+hash guardado usa otros parámetros, para regenerarlo en el siguiente login.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Este worker ya tiene max_pending hashes en curso"""
+
+
+class PasswordHasher:
+    """Pool de hilos acotado para generar y comprobar hashes de contraseñas"""
+
+    def __init__(self, method="scrypt", max_workers=2, max_pending=2, timeout=10):
+        self.method = method
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self._wait_total = 0.0
+        self._hash_total = 0.0
+        self._method_prefix = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Se crea al primer uso: cada worker de gunicorn tiene su propio pool
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="password-hasher"
+            )
+        return self._executor
+
+    def _run(self, fn, *args):
+        """Ejecuta fn(*args) en el pool y espera el resultado.
+
+        Lanza PasswordHasherBusy sin encolar nada si no queda hueco.
+        """
+        queued_at = time.perf_counter()
+
+        def timed():
+            started_at = time.perf_counter()
+            result = fn(*args)
+            return result, started_at - queued_at, time.perf_counter() - started_at
+
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise PasswordHasherBusy(f"{self.pending} hashes en curso")
+            future = self._get_executor().submit(timed)
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            result, waited, elapsed = future.result(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self.pending -= 1
+        with self._lock:
+            self.completed += 1
+            self._wait_total += waited
+            self._hash_total += elapsed
+        return result
+
+    def hash(self, password):
+        """Hash de `password` con el método y coste configurados"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """True si `password` corresponde a `pwhash` (de cualquier método)"""
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True si `pwhash` no usa el método y coste actuales"""
+        if self._method_prefix is None:
+            # Werkzeug completa los parámetros ("scrypt" -> "scrypt:32768:8:1");
+            # se calcula una vez por worker, sin ocupar un hueco del pool
+            self._method_prefix = generate_password_hash("", self.method).split("$")[0]
+        return pwhash.split("$", 1)[0] != self._method_prefix
+
+    def stats(self):
+        """Contadores de este worker para el panel de administración"""
+        with self._lock:
+            return {
+                "method": self.method,
+                "max_workers": self.max_workers,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "peak_pending": self.peak_pending,
+                "completed": self.completed,
+                "avg_wait_ms": (
+                    round(self._wait_total / self.completed * 1000, 2)
+                    if self.completed
+                    else 0
+                ),
+                "avg_hash_ms": (
+                    round(self._hash_total / self.completed * 1000, 2)
+                    if self.completed
+                    else 0
+                ),
+            }
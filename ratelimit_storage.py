@@ -0,0 +1,210 @@
+"""
+Almacén de rate limiting compartido entre workers sobre SQLite (WAL)
+
+Con storage_uri="memory://" cada worker de gunicorn cuenta por su cuenta:
+los límites reales se multiplican por el número de workers y se pierden al
+reiniciar. SQLiteStorage guarda los contadores en un archivo SQLite local
+en modo WAL, así todos los workers de la máquina comparten los mismos
+contadores sin depender de Redis ni de otro servicio.
+
+Implementa la estrategia "sliding-window-counter" de limits: por cada clave
+se guardan el contador de la ventana actual y el de la anterior, y la
+anterior pesa en proporción al tiempo que aún solapa. Cada comprobación es
+una sola transacción BEGIN IMMEDIATE sobre una fila. Las filas caducadas se
+borran de vez en cuando, no en cada petición.
+
+Se registra con el esquema sqlite:// (como en SQLAlchemy, sqlite:///relativa
+o sqlite:////absoluta):
+
+    Limiter(..., storage_uri="sqlite:////ruta/ratelimit.db",
+            strategy="sliding-window-counter")
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from math import floor
+
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport
+
+# Una de cada N escrituras borra también las filas caducadas
+CLEANUP_EVERY = 1000
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport):
+    """Contadores de limits en un archivo SQLite compartido por los procesos"""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri, wrap_exceptions=False, busy_timeout_ms=5000, **options):
+        self.path = uri.split("://", 1)[1][1:]
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self._local = threading.local()
+        self._writes = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "key TEXT PRIMARY KEY, "
+            "window INTEGER NOT NULL DEFAULT 0, "
+            "current INTEGER NOT NULL DEFAULT 0, "
+            "previous INTEGER NOT NULL DEFAULT 0, "
+            "expires_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self._connection().execute(
+            "CREATE INDEX IF NOT EXISTS ix_rate_limits_expires_at "
+            "ON rate_limits (expires_at)"
+        )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        """Conexión de este hilo (y de este proceso: gunicorn hace fork)"""
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            # isolation_level=None: las transacciones se abren a mano
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout_ms / 1000,
+                isolation_level=None,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Los contadores son desechables: basta con sobrevivir a un
+            # reinicio del proceso, no a un corte de luz
+            conn.execute("PRAGMA synchronous=OFF")
+            local.conn = conn
+            local.pid = os.getpid()
+        return local.conn
+
+    def _write(self, fn):
+        """Ejecuta fn(conn, now) en una transacción de escritura"""
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, now)
+            self._writes += 1
+            if self._writes % CLEANUP_EVERY == 0:
+                conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def _row(self, conn, key):
+        return conn.execute(
+            "SELECT window, current, previous, expires_at FROM rate_limits "
+            "WHERE key = ?",
+            (key,),
+        ).fetchone()
+
+    # ---------- Ventana fija ----------
+
+    def incr(self, key, expiry, amount=1):
+        def increment(conn, now):
+            row = self._row(conn, key)
+            if row and row[3] > now:
+                count = row[1] + amount
+                conn.execute(
+                    "UPDATE rate_limits SET current = ? WHERE key = ?", (count, key)
+                )
+            else:
+                count = amount
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_limits (key, current, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, count, now + expiry),
+                )
+            return count
+
+        return self._write(increment)
+
+    def get(self, key):
+        row = self._row(self._connection(), key)
+        return row[1] if row and row[3] > time.time() else 0
+
+    def get_expiry(self, key):
+        row = self._row(self._connection(), key)
+        now = time.time()
+        return row[3] if row and row[3] > now else now
+
+    # ---------- Ventana deslizante ----------
+
+    @staticmethod
+    def _window_counts(row, expiry, now):
+        """(ventana actual, contador anterior, contador actual) de la fila"""
+        window = int(now // expiry)
+        if not row:
+            return window, 0, 0
+        if row[0] == window:
+            return window, row[2], row[1]
+        if row[0] == window - 1:
+            return window, row[1], 0
+        return window, 0, 0
+
+    @staticmethod
+    def _ttls(expiry, now, previous):
+        elapsed = now % expiry
+        previous_ttl = expiry - elapsed if previous else 0.0
+        return previous_ttl, 2 * expiry - elapsed
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        if amount > limit:
+            return False
+
+        def acquire(conn, now):
+            window, previous, current = self._window_counts(
+                self._row(conn, key), expiry, now
+            )
+            previous_ttl, _ = self._ttls(expiry, now, previous)
+            weighted = previous * previous_ttl / expiry + current
+            if floor(weighted) + amount > limit:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits "
+                "(key, window, current, previous, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, window, current + amount, previous, (window + 2) * expiry),
+            )
+            return True
+
+        return self._write(acquire)
+
+    def get_sliding_window(self, key, expiry):
+        now = time.time()
+        _, previous, current = self._window_counts(
+            self._row(self._connection(), key), expiry, now
+        )
+        previous_ttl, current_ttl = self._ttls(expiry, now, previous)
+        return previous, previous_ttl, current, current_ttl
+
+    def clear_sliding_window(self, key, expiry):
+        self.clear(key)
+
+    # ---------- Mantenimiento ----------
+
+    def check(self):
+        try:
+            self._connection().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._write(
+            lambda conn, now: conn.execute("DELETE FROM rate_limits").rowcount
+        )
+
+    def clear(self, key):
+        self._write(
+            lambda conn, now: conn.execute(
+                "DELETE FROM rate_limits WHERE key = ?", (key,)
+            )
+        )
@@ -0,0 +1,27 @@
+"""
+Script para reparar los agregados de calificaciones de los mapas
+
+Recalcula review_count, rating_sum y el histograma 1-5 desde 'comments'.
+Las columnas las crea la migración 3 (`flask --app app db upgrade`).
+Es seguro ejecutarlo varias veces.
+"""
+
+import sys
+
+from app import app
+from database import Map, recalculate_rating_aggregates
+import migrations
+
+print("🔄 Reparando agregados de calificaciones...")
+
+with app.app_context():
+    if 2 not in migrations.applied_versions():
+        print("❌ Falta la migración 2: ejecutar `flask --app app db upgrade`")
+        sys.exit(1)
+
+    fixed = recalculate_rating_aggregates()
+    print(f"✅ Mapas corregidos: {fixed} de {Map.query.count()}")
+
+    print("\n" + "=" * 60)
+    print("🎉 AGREGADOS DE CALIFICACIONES ACTUALIZADOS")
+    print("=" * 60 + "\n")
@@ -0,0 +1,116 @@
+"""
+Compresión gzip/brotli de respuestas dinámicas (HTML y JSON)
+
+Se aplica en un after_request de Flask, así que no toca lo que atiende el
+middleware de Socket.IO (long-polling incluido). Solo se comprimen tipos de
+texto de una lista blanca y a partir de un tamaño mínimo; lo que ya va
+comprimido (imágenes, zips, assets .br/.gz) o tiene Content-Encoding se
+deja como está. Las respuestas en streaming se comprimen fragmento a
+fragmento sin acumularlas en memoria.
+"""
+
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/xml",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+}
+
+# Códigos sin cuerpo o con cuerpo parcial: comprimirlos rompería la respuesta
+_SKIP_STATUS = {204, 206, 304}
+
+
+def available_encodings():
+    """Codificaciones soportadas, en orden de preferencia del servidor"""
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+
+class _Compressor:
+    """Interfaz común para zlib (gzip) y brotli"""
+
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=brotli_quality)
+            self.compress = self._obj.process
+            self.sync_flush = self._obj.flush
+            self.finish = self._obj.finish
+        else:
+            # wbits=31: formato gzip (cabecera y CRC) en lugar de zlib
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self.compress = self._obj.compress
+            self.sync_flush = lambda: self._obj.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = self._obj.flush
+
+
+def should_compress(response, method, min_size):
+    """True si la respuesta es candidata a comprimirse (sin mirar Accept-Encoding)"""
+    if method == "HEAD" or response.status_code in _SKIP_STATUS:
+        return False
+    if response.status_code < 200 or "Content-Encoding" in response.headers:
+        return False
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return False
+    if "no-transform" in response.headers.get("Cache-Control", ""):
+        return False
+    if response.direct_passthrough:
+        # Archivos servidos con send_file: los estáticos ya van precomprimidos
+        return False
+    if not response.is_streamed and response.content_length is not None:
+        return response.content_length >= min_size
+    return True
+
+
+def compress_response(
+    response, accept_encodings, method, min_size=500, gzip_level=6, brotli_quality=4
+):
+    """Comprime la respuesta en su sitio si el cliente lo acepta y merece la pena.
+
+    accept_encodings es request.accept_encodings. Devuelve la misma respuesta.
+    """
+    if not should_compress(response, method, min_size):
+        return response
+    # La respuesta depende de Accept-Encoding aunque este cliente no comprima
+    response.vary.add("Accept-Encoding")
+
+    encoding = accept_encodings.best_match(available_encodings())
+    if not encoding:
+        return response
+    compressor = _Compressor(encoding, gzip_level, brotli_quality)
+
+    if response.is_streamed:
+        chunks = response.iter_encoded()
+
+        def generate():
+            for chunk in chunks:
+                # Vaciar tras cada fragmento: el cliente recibe el progreso a tiempo
+                data = compressor.compress(chunk) + compressor.sync_flush()
+                if data:
+                    yield data
+            yield compressor.finish()
+
+        body = response.response
+        if hasattr(body, "close"):
+            response.call_on_close(body.close)
+        response.response = generate()
+        response.headers.pop("Content-Length", None)
+    else:
+        response.set_data(compressor.compress(response.get_data()) + compressor.finish())
+
+    response.headers["Content-Encoding"] = encoding
+    # Los bytes cambian con la codificación: la ETag pasa a ser débil (como nginx)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
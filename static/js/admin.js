@@ -58,11 +58,111 @@ function updateFileCount(input, labelId) {
     }
 }
 
+// ==================== SUBIDA POR PARTES DE ARCHIVOS DE MAPAS ====================
+const CHUNK_UPLOAD_PARALLEL = 3;
+
+async function sha256Hex(blob) {
+    // crypto.subtle solo existe en contextos seguros (HTTPS o localhost)
+    if (!window.crypto || !window.crypto.subtle) return null;
+    const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function uploadJson(url, method, body) {
+    const response = await fetch(url, {
+        method,
+        headers: { 'Content-Type': 'application/json' },
+        body: body ? JSON.stringify(body) : undefined
+    });
+    const data = await response.json();
+    if (!response.ok) throw new Error(data.message || 'Error en la subida');
+    return data;
+}
+
+// Espera a que termine un trabajo en segundo plano (consulta /api/jobs/<id>)
+async function waitForJob(job) {
+    while (job.status === 'pending') {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        job = (await uploadJson(`/api/jobs/${job.id}`, 'GET')).job;
+    }
+    if (job.status === 'failed') throw new Error(job.error || 'Error al procesar el archivo');
+    return job;
+}
+
+// Sube el archivo del mapa en fragmentos paralelos; se reanuda si se repite con el mismo archivo
+async function uploadMapFileChunked(file, mapId, onProgress) {
+    const resumeKey = `chunkedUpload:${mapId}:${file.name}:${file.size}:${file.lastModified}`;
+    let upload = null;
+
+    const savedId = localStorage.getItem(resumeKey);
+    if (savedId) {
+        try {
+            upload = (await uploadJson(`/admin/uploads/${savedId}`, 'GET')).upload;
+        } catch (error) {
+            localStorage.removeItem(resumeKey);
+        }
+    }
+    if (!upload) {
+        upload = (await uploadJson('/admin/uploads', 'POST', {
+            filename: file.name,
+            size: file.size,
+            map_id: mapId
+        })).upload;
+        localStorage.setItem(resumeKey, upload.upload_id);
+    }
+
+    const received = new Set(upload.received);
+    const pending = [];
+    for (let index = 0; index < upload.total_chunks; index++) {
+        if (!received.has(index)) pending.push(index);
+    }
+
+    let done = received.size;
+    const sendChunk = async (index) => {
+        const offset = index * upload.chunk_size;
+        const chunk = file.slice(offset, offset + upload.chunk_size);
+        const headers = {};
+        const checksum = await sha256Hex(chunk);
+        if (checksum) headers['X-Chunk-SHA256'] = checksum;
+
+        for (let attempt = 1; ; attempt++) {
+            const response = await fetch(`/admin/uploads/${upload.upload_id}/chunks?offset=${offset}`, {
+                method: 'PUT',
+                headers,
+                body: chunk
+            });
+            if (response.ok) break;
+            if (attempt >= 3) {
+                const data = await response.json().catch(() => ({}));
+                throw new Error(data.message || 'Error al subir un fragmento');
+            }
+        }
+        done++;
+        if (onProgress) onProgress(done / upload.total_chunks);
+    };
+
+    const workers = Array.from({ length: CHUNK_UPLOAD_PARALLEL }, async () => {
+        while (pending.length) {
+            await sendChunk(pending.shift());
+        }
+    });
+    await Promise.all(workers);
+
+    // El servidor verifica el archivo en segundo plano y responde 202 con el trabajo
+    const result = await uploadJson(`/admin/uploads/${upload.upload_id}/finalize`, 'POST', { map_id: mapId });
+    localStorage.removeItem(resumeKey);
+    return waitForJob(result.job);
+}
+
 // Subir nuevo mapa
 document.getElementById('uploadMapForm').addEventListener('submit', async (e) => {
     e.preventDefault();
     
     const formData = new FormData(e.target);
+
+    // El archivo del mapa se sube aparte, por partes, cuando el mapa ya existe
+    const mapFile = formData.get('map_file');
+    formData.delete('map_file');
     
     // Convertir características a JSON array
     const features = formData.get('features');
@@ -85,6 +185,11 @@ document.getElementById('uploadMapForm').addEventListener('submit', async (e) =>
         const data = await response.json();
         
         if (response.ok) {
+            if (mapFile && mapFile.size > 0) {
+                await uploadMapFileChunked(mapFile, data.map.id, (progress) => {
+                    submitBtn.textContent = `⏳ Subiendo archivo... ${Math.round(progress * 100)}%`;
+                });
+            }
             alert('✅ Mapa subido exitosamente!');
             location.reload();
         } else {
@@ -92,7 +197,7 @@ document.getElementById('uploadMapForm').addEventListener('submit', async (e) =>
         }
     } catch (error) {
         console.error('Error:', error);
-        alert('❌ Error al conectar con el servidor');
+        alert('❌ ' + (error.message || 'Error al conectar con el servidor'));
     } finally {
         submitBtn.textContent = originalText;
         submitBtn.disabled = false;
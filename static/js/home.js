@@ -353,6 +353,40 @@ async function downloadMap(mapId, mapTitle) {
     return buyMap(mapId, mapTitle, 0);
 }
 
+// Cargar la siguiente página del catálogo (paginación por cursor)
+async function loadMoreMaps() {
+    const button = document.getElementById('loadMoreMaps');
+    const grid = document.querySelector('.maps-grid');
+    if (!button || !grid || !button.dataset.cursor) return;
+
+    button.disabled = true;
+    try {
+        const params = new URLSearchParams({
+            cursor: button.dataset.cursor,
+            view: button.dataset.view
+        });
+        const response = await fetch(`/maps/cards?${params}`);
+        const data = await response.json();
+
+        if (!response.ok) {
+            throw new Error(data.error || 'Error al cargar mapas');
+        }
+
+        grid.insertAdjacentHTML('beforeend', data.html);
+        observeMapCardsForPrefetch();
+
+        if (data.next_cursor) {
+            button.dataset.cursor = data.next_cursor;
+            button.disabled = false;
+        } else {
+            button.parentElement.remove();
+        }
+    } catch (error) {
+        console.error('Error cargando más mapas:', error);
+        button.disabled = false;
+    }
+}
+
 // ==================== COMENTARIOS ====================
 
 // Mostrar comentarios
@@ -362,7 +396,7 @@ async function showComments(mapId) {
         const data = await response.json();
         
         if (data.success) {
-            showCommentsModal(mapId, data.comments);
+            showCommentsModal(mapId, data.comments, data.next_cursor);
         } else {
             alert('Error al cargar comentarios');
         }
@@ -373,38 +407,69 @@ async function showComments(mapId) {
 }
 
 // Mostrar modal de comentarios
-function showCommentsModal(mapId, comments) {
+function renderCommentItem(comment) {
+    const avatar = comment.user_photo || '/static/image/default-avatar.png';
+    let starsHtml = '';
+    for (let i = 0; i < 5; i++) {
+        if (i < comment.rating) {
+            starsHtml += '<span class="star filled">★</span>';
+        } else {
+            starsHtml += '<span class="star">☆</span>';
+        }
+    }
+
+    return `
+        <div class="comment-item">
+            <img src="${avatar}" alt="${comment.username}" class="comment-avatar">
+            <div class="comment-content">
+                <div class="comment-header">
+                    <strong>${comment.username}</strong>
+                    <div class="comment-rating">${starsHtml}</div>
+                </div>
+                <p>${escapeHtml(comment.text)}</p>
+                <div class="comment-date">${formatDate(comment.created_at)}</div>
+            </div>
+        </div>
+    `;
+}
+
+// Cargar la siguiente página de comentarios (paginación por cursor)
+async function loadMoreComments(mapId, cursor) {
+    const button = document.getElementById('loadMoreComments');
+    if (button) button.disabled = true;
+
+    try {
+        const response = await fetch(`/map/${mapId}/comments?cursor=${encodeURIComponent(cursor)}`);
+        const data = await response.json();
+        if (!data.success) throw new Error(data.message);
+
+        if (button) button.remove();
+        const list = document.getElementById('commentsList');
+        list.insertAdjacentHTML('beforeend', data.comments.map(renderCommentItem).join(''));
+        if (data.next_cursor) {
+            list.insertAdjacentHTML('beforeend', loadMoreCommentsButton(mapId, data.next_cursor));
+        }
+    } catch (error) {
+        console.error('Error cargando comentarios:', error);
+        if (button) button.disabled = false;
+    }
+}
+
+function loadMoreCommentsButton(mapId, cursor) {
+    return `<button id="loadMoreComments" class="btn-primary" onclick="loadMoreComments(${mapId}, '${cursor}')">Ver más comentarios</button>`;
+}
+
+function showCommentsModal(mapId, comments, nextCursor) {
     const modal = document.getElementById('commentsModal');
     currentMapId = mapId;
     
     let commentsHtml = '';
     
     if (comments && comments.length > 0) {
-        comments.forEach(comment => {
-            const avatar = comment.user_photo || '/static/image/default-avatar.png';
-            let starsHtml = '';
-            for (let i = 0; i < 5; i++) {
-                if (i < comment.rating) {
-                    starsHtml += '<span class="star filled">★</span>';
-                } else {
-                    starsHtml += '<span class="star">☆</span>';
-                }
-            }
-            
-            commentsHtml += `
-                <div class="comment-item">
-                    <img src="${avatar}" alt="${comment.username}" class="comment-avatar">
-                    <div class="comment-content">
-                        <div class="comment-header">
-                            <strong>${comment.username}</strong>
-                            <div class="comment-rating">${starsHtml}</div>
-                        </div>
-                        <p>${escapeHtml(comment.text)}</p>
-                        <div class="comment-date">${formatDate(comment.created_at)}</div>
-                    </div>
-                </div>
-            `;
-        });
+        commentsHtml = comments.map(renderCommentItem).join('');
+        if (nextCursor) {
+            commentsHtml += loadMoreCommentsButton(mapId, nextCursor);
+        }
     } else {
         commentsHtml = '<p style="text-align: center; color: #aaa;">No hay comentarios todavía. ¡Sé el primero en comentar!</p>';
     }
@@ -611,6 +676,91 @@ function logout() {
 
 // ==================== MODAL DE MAPAS ====================
 
+// Detalles de mapas ya descargados: se revalidan con ETag y un 304 reutiliza los datos.
+// Durante MAP_DETAILS_MAX_AGE_MS se usan directamente (p. ej. los precargados).
+const MAP_DETAILS_MAX_AGE_MS = 60000;
+const mapDetailsCache = new Map();
+
+async function fetchMapDetails(mapId) {
+    const cached = mapDetailsCache.get(mapId);
+    if (cached && Date.now() - cached.fetchedAt < MAP_DETAILS_MAX_AGE_MS) {
+        return cached.data;
+    }
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+
+    // no-store: la revalidación la hacemos nosotros para recibir el 304 tal cual
+    const response = await fetch(`/api/map/${mapId}`, { headers, cache: 'no-store' });
+    if (response.status === 304 && cached) {
+        cached.fetchedAt = Date.now();
+        return cached.data;
+    }
+    if (!response.ok) {
+        throw new Error(`Error ${response.status} cargando el mapa ${mapId}`);
+    }
+
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        mapDetailsCache.set(mapId, { etag, data, fetchedAt: Date.now() });
+    }
+    return data;
+}
+
+// Precarga: los detalles de las tarjetas visibles se piden juntos en /api/maps/batch
+const pendingPrefetchIds = new Set();
+let prefetchTimer = null;
+
+function queueMapPrefetch(mapId) {
+    if (!mapId || mapDetailsCache.has(mapId)) return;
+    pendingPrefetchIds.add(mapId);
+    clearTimeout(prefetchTimer);
+    prefetchTimer = setTimeout(prefetchMapDetails, 150);
+}
+
+async function prefetchMapDetails() {
+    const ids = [...pendingPrefetchIds].slice(0, 100);
+    ids.forEach(id => pendingPrefetchIds.delete(id));
+    if (ids.length === 0) return;
+
+    try {
+        const response = await fetch(`/api/maps/batch?ids=${ids.join(',')}`);
+        if (response.ok) {
+            const data = await response.json();
+            const now = Date.now();
+            data.maps.forEach(({ etag, ...details }) => {
+                mapDetailsCache.set(details.id, { etag, data: details, fetchedAt: now });
+            });
+        }
+    } catch (error) {
+        console.error('Error precargando mapas:', error);
+    }
+
+    if (pendingPrefetchIds.size > 0) {
+        prefetchMapDetails();
+    }
+}
+
+const mapPrefetchObserver = 'IntersectionObserver' in window
+    ? new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                queueMapPrefetch(Number(entry.target.dataset.mapId));
+                mapPrefetchObserver.unobserve(entry.target);
+            }
+        });
+    }, { rootMargin: '200px' })
+    : null;
+
+function observeMapCardsForPrefetch() {
+    if (!mapPrefetchObserver) return;
+    document.querySelectorAll('.map-card[data-map-id]:not([data-prefetch-observed])').forEach(card => {
+        card.dataset.prefetchObserved = '1';
+        mapPrefetchObserver.observe(card);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', observeMapCardsForPrefetch);
+
 function openMapModal(mapId) {
     console.log('openMapModal called with ID:', mapId);
     const modal = document.getElementById('mapModal');
@@ -621,12 +771,8 @@ function openMapModal(mapId) {
         return;
     }
     
-    // Cargar detalles del mapa desde la API
-    fetch(`/api/map/${mapId}`)
-        .then(res => {
-            console.log('API response status:', res.status);
-            return res.json();
-        })
+    // Cargar detalles del mapa desde la API (reutilizando la copia si no cambió)
+    fetchMapDetails(mapId)
         .then(map => {
             console.log('Map data received:', map);
             let featuresHTML = '';
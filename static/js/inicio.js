@@ -241,13 +241,97 @@ function handleDownload(mapId) {
         });
 }
 
+// Detalles de mapas ya descargados: se revalidan con ETag y un 304 reutiliza los datos.
+// Durante MAP_DETAILS_MAX_AGE_MS se usan directamente (p. ej. los precargados).
+const MAP_DETAILS_MAX_AGE_MS = 60000;
+const mapDetailsCache = new Map();
+
+async function fetchMapDetails(mapId) {
+    const cached = mapDetailsCache.get(mapId);
+    if (cached && Date.now() - cached.fetchedAt < MAP_DETAILS_MAX_AGE_MS) {
+        return cached.data;
+    }
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+
+    // no-store: la revalidación la hacemos nosotros para recibir el 304 tal cual
+    const response = await fetch(`/api/map/${mapId}`, { headers, cache: 'no-store' });
+    if (response.status === 304 && cached) {
+        cached.fetchedAt = Date.now();
+        return cached.data;
+    }
+    if (!response.ok) {
+        throw new Error(`Error ${response.status} cargando el mapa ${mapId}`);
+    }
+
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        mapDetailsCache.set(mapId, { etag, data, fetchedAt: Date.now() });
+    }
+    return data;
+}
+
+// Precarga: los detalles de las tarjetas visibles se piden juntos en /api/maps/batch
+const pendingPrefetchIds = new Set();
+let prefetchTimer = null;
+
+function queueMapPrefetch(mapId) {
+    if (!mapId || mapDetailsCache.has(mapId)) return;
+    pendingPrefetchIds.add(mapId);
+    clearTimeout(prefetchTimer);
+    prefetchTimer = setTimeout(prefetchMapDetails, 150);
+}
+
+async function prefetchMapDetails() {
+    const ids = [...pendingPrefetchIds].slice(0, 100);
+    ids.forEach(id => pendingPrefetchIds.delete(id));
+    if (ids.length === 0) return;
+
+    try {
+        const response = await fetch(`/api/maps/batch?ids=${ids.join(',')}`);
+        if (response.ok) {
+            const data = await response.json();
+            const now = Date.now();
+            data.maps.forEach(({ etag, ...details }) => {
+                mapDetailsCache.set(details.id, { etag, data: details, fetchedAt: now });
+            });
+        }
+    } catch (error) {
+        console.error('Error precargando mapas:', error);
+    }
+
+    if (pendingPrefetchIds.size > 0) {
+        prefetchMapDetails();
+    }
+}
+
+const mapPrefetchObserver = 'IntersectionObserver' in window
+    ? new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (entry.isIntersecting) {
+                queueMapPrefetch(Number(entry.target.dataset.mapId));
+                mapPrefetchObserver.unobserve(entry.target);
+            }
+        });
+    }, { rootMargin: '200px' })
+    : null;
+
+function observeMapCardsForPrefetch() {
+    if (!mapPrefetchObserver) return;
+    document.querySelectorAll('.map-card[data-map-id]:not([data-prefetch-observed])').forEach(card => {
+        card.dataset.prefetchObserved = '1';
+        mapPrefetchObserver.observe(card);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', observeMapCardsForPrefetch);
+
 function openMapModal(mapId) {
     const modal = document.getElementById('mapModal');
     const content = document.getElementById('mapModalContent');
     
-    // Cargar detalles del mapa desde la API
-    fetch(`/api/map/${mapId}`)
-        .then(res => res.json())
+    // Cargar detalles del mapa desde la API (reutilizando la copia si no cambió)
+    fetchMapDetails(mapId)
         .then(map => {
             let featuresHTML = '';
             if (map.features) {
@@ -353,6 +437,40 @@ function closeMapModal() {
     modal.style.display = 'none';
 }
 
+// Cargar la siguiente página del catálogo (paginación por cursor)
+async function loadMoreMaps() {
+    const button = document.getElementById('loadMoreMaps');
+    const grid = document.querySelector('.maps-grid');
+    if (!button || !grid || !button.dataset.cursor) return;
+
+    button.disabled = true;
+    try {
+        const params = new URLSearchParams({
+            cursor: button.dataset.cursor,
+            view: button.dataset.view
+        });
+        const response = await fetch(`/maps/cards?${params}`);
+        const data = await response.json();
+
+        if (!response.ok) {
+            throw new Error(data.error || 'Error al cargar mapas');
+        }
+
+        grid.insertAdjacentHTML('beforeend', data.html);
+        observeMapCardsForPrefetch();
+
+        if (data.next_cursor) {
+            button.dataset.cursor = data.next_cursor;
+            button.disabled = false;
+        } else {
+            button.parentElement.remove();
+        }
+    } catch (error) {
+        console.error('Error cargando más mapas:', error);
+        button.disabled = false;
+    }
+}
+
 // Efecto de scroll en el header
 let lastScroll = 0;
 const header = document.querySelector('header');
@@ -0,0 +1,102 @@
+"""
+Subidas por partes: la finalización hashea el archivo fuera de la petición
+"""
+
+import hashlib
+import os
+
+import pytest
+
+from app import app, image_pool
+from database import BackgroundJob, ChunkedUpload, db
+
+CHUNK_SIZE = 1024
+CONTENT = os.urandom(CHUNK_SIZE * 2 + 100)
+
+
+@pytest.fixture
+def deferred_pool(monkeypatch):
+    """Pool que guarda los trabajos y los ejecuta cuando la prueba lo pide"""
+    queued = []
+
+    def submit(tasks, on_done, fn):
+        queued.append(lambda: on_done(fn(tasks), None))
+
+    monkeypatch.setattr(image_pool, "submit", submit)
+    return queued
+
+
+@pytest.fixture
+def upload(client, login, make_user, sample_maps, monkeypatch):
+    """Subida con todos los fragmentos enviados (en desorden)"""
+    monkeypatch.setitem(app.config, "UPLOAD_CHUNK_SIZE", CHUNK_SIZE)
+    login(make_user("admin", is_admin=True))
+    response = client.post(
+        "/admin/uploads",
+        json={
+            "filename": "mundo.zip",
+            "size": len(CONTENT),
+            "map_id": sample_maps[0].id,
+        },
+    )
+    assert response.status_code == 201
+    upload = response.get_json()["upload"]
+    for index in reversed(range(upload["total_chunks"])):
+        offset = index * CHUNK_SIZE
+        chunk = CONTENT[offset : offset + CHUNK_SIZE]
+        response = client.put(
+            f"/admin/uploads/{upload['upload_id']}/chunks?offset={offset}",
+            data=chunk,
+            headers={"X-Chunk-SHA256": hashlib.sha256(chunk).hexdigest()},
+        )
+        assert response.status_code == 200
+    yield upload
+    ChunkedUpload.query.delete()
+    db.session.commit()
+
+
+def test_finalize_hashes_in_background(client, upload, deferred_pool, sample_maps):
+    response = client.post(f"/admin/uploads/{upload['upload_id']}/finalize")
+    assert response.status_code == 202
+    job = response.get_json()["job"]
+    assert job["status"] == "pending"
+
+    # Una segunda finalización mientras la primera está en curso
+    response = client.post(f"/admin/uploads/{upload['upload_id']}/finalize")
+    assert response.status_code == 409
+
+    (run,) = deferred_pool
+    run()
+
+    response = client.get(f"/api/jobs/{job['id']}")
+    assert response.get_json()["job"]["status"] == "done"
+    db.session.expire_all()
+    digest = hashlib.sha256(CONTENT).hexdigest()
+    assert sample_maps[0].download_link == f"blobs/{digest[:2]}/{digest}.zip"
+    assert db.session.get(ChunkedUpload, upload["upload_id"]).status == "complete"
+
+
+def test_finalize_checksum_mismatch_discards_upload(
+    client, upload, deferred_pool, sample_maps
+):
+    link = sample_maps[0].download_link
+    response = client.post(
+        f"/admin/uploads/{upload['upload_id']}/finalize", json={"sha256": "0" * 64}
+    )
+    assert response.status_code == 202
+
+    deferred_pool[0]()
+    db.session.expire_all()
+    job = db.session.get(BackgroundJob, response.get_json()["job"]["id"])
+    assert job.status == "failed"
+    assert sample_maps[0].download_link == link
+    assert db.session.get(ChunkedUpload, upload["upload_id"]) is None
+
+
+def test_finalize_with_full_pool_can_be_retried(client, upload, monkeypatch):
+    monkeypatch.setattr(image_pool, "pending", image_pool.max_pending)
+    response = client.post(f"/admin/uploads/{upload['upload_id']}/finalize")
+    assert response.status_code == 503
+    db.session.expire_all()
+    assert db.session.get(ChunkedUpload, upload["upload_id"]).status == "uploading"
+    assert BackgroundJob.query.count() == 0
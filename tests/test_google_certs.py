@@ -0,0 +1,187 @@
+"""
+Verificación de ID tokens de Google con certificados en caché
+
+Un servidor HTTP local hace de endpoint de certificados de Google y los
+tokens se firman aquí con claves RSA generadas para la prueba.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+import google_certs
+from google_certs import GoogleTokenVerifier
+
+CLIENT_ID = "client-123.apps.googleusercontent.com"
+MAX_AGE = 300
+
+
+def make_key(key_id):
+    """(firmante, certificado PEM) de una clave RSA nueva"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    pem_key = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    signer = crypt.RSASigner.from_string(pem_key, key_id=key_id)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+SIGNER_1, CERT_1 = make_key("clave-1")
+SIGNER_2, CERT_2 = make_key("clave-2")
+
+
+def make_token(signer=SIGNER_1, **claims):
+    now = int(time.time())
+    payload = {
+        "iss": "https://accounts.google.com",
+        "aud": CLIENT_ID,
+        "sub": "google-1",
+        "email": "ana@example.com",
+        "iat": now,
+        "exp": now + 600,
+    }
+    payload.update(claims)
+    return jwt.encode(signer, payload).decode()
+
+
+# ==================== SERVIDOR DE CERTIFICADOS ====================
+
+
+@pytest.fixture(scope="module")
+def cert_server():
+    """Sustituto local de googleapis.com/oauth2/v1/certs"""
+    state = SimpleNamespace(certs={}, requests=0)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state.requests += 1
+            body = json.dumps(state.certs).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header(
+                "Cache-Control", f"public, max-age={MAX_AGE}, must-revalidate"
+            )
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{server.server_port}/certs"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj monotónico controlado por la prueba (solo para google_certs)"""
+    fake = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        google_certs, "time", SimpleNamespace(monotonic=lambda: fake.now)
+    )
+    return fake
+
+
+@pytest.fixture
+def verifier(cert_server, clock):
+    cert_server.certs = {"clave-1": CERT_1}
+    cert_server.requests = 0
+    return GoogleTokenVerifier(certs_url=cert_server.url)
+
+
+# ==================== CACHÉ ====================
+
+
+def test_cached_certs_are_reused_without_fetching(verifier, cert_server):
+    token = make_token()
+    for _ in range(5):
+        assert verifier.verify(token, CLIENT_ID)["email"] == "ana@example.com"
+    assert verifier.fetches == 1
+    assert cert_server.requests == 1
+
+
+def test_certs_are_refreshed_after_max_age(verifier, cert_server, clock):
+    token = make_token()
+    verifier.verify(token, CLIENT_ID)
+
+    clock.now += MAX_AGE - 1
+    verifier.verify(token, CLIENT_ID)
+    assert cert_server.requests == 1
+
+    clock.now += 1
+    verifier.verify(token, CLIENT_ID)
+    assert cert_server.requests == 2
+
+
+def test_unknown_key_id_triggers_refetch(verifier, cert_server, clock):
+    verifier.verify(make_token(), CLIENT_ID)
+
+    # Google rota las claves: la nueva aún no está en caché
+    cert_server.certs["clave-2"] = CERT_2
+    token = make_token(SIGNER_2)
+
+    # Dentro de min_refresh_interval no se vuelve a descargar
+    with pytest.raises(ValueError):
+        verifier.verify(token, CLIENT_ID)
+    assert cert_server.requests == 1
+
+    clock.now += verifier.min_refresh_interval
+    assert verifier.verify(token, CLIENT_ID)["sub"] == "google-1"
+    assert cert_server.requests == 2
+
+    # Con la clave ya en caché no hay más descargas
+    verifier.verify(token, CLIENT_ID)
+    assert cert_server.requests == 2
+
+
+# ==================== TOKENS NO VÁLIDOS ====================
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"aud": "otro-cliente.apps.googleusercontent.com"},
+        {"iss": "https://evil.example.com"},
+        {"iat": int(time.time()) - 7200, "exp": int(time.time()) - 3600},
+    ],
+    ids=["audiencia", "emisor", "caducado"],
+)
+def test_invalid_tokens_raise_value_error(verifier, claims):
+    with pytest.raises(ValueError):
+        verifier.verify(make_token(**claims), CLIENT_ID)
+
+
+def test_forged_signature_is_rejected(verifier):
+    # Otra clave privada que se presenta con el kid de una clave en caché
+    forged, _ = make_key("clave-1")
+    with pytest.raises(ValueError):
+        verifier.verify(make_token(forged), CLIENT_ID)
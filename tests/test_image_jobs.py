@@ -0,0 +1,69 @@
+"""
+Pool de imágenes: las subidas reciben 503 con la cola llena
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from app import image_pool
+from database import BackgroundJob, db
+
+
+def png_file(name="portada.png"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer, name
+
+
+@pytest.fixture
+def full_pool(monkeypatch):
+    monkeypatch.setattr(image_pool, "pending", image_pool.max_pending)
+    return image_pool
+
+
+@pytest.fixture
+def admin_client(client, login, make_user):
+    login(make_user("admin", is_admin=True))
+    return client
+
+
+def test_edit_map_without_image_ignores_full_pool(admin_client, full_pool, sample_maps):
+    map_obj = sample_maps[0]
+    response = admin_client.post(
+        f"/admin/edit-map/{map_obj.id}",
+        data={"title": "Nuevo título", "image": (io.BytesIO(b""), "")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    db.session.refresh(map_obj)
+    assert map_obj.title == "Nuevo título"
+
+
+def test_edit_map_with_image_and_full_pool_is_rejected(
+    admin_client, full_pool, sample_maps
+):
+    response = admin_client.post(
+        f"/admin/edit-map/{sample_maps[0].id}",
+        data={"image": png_file()},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+
+
+def test_pool_filled_after_check_returns_503(
+    admin_client, full_pool, monkeypatch, sample_maps
+):
+    # Otra subida llenó la cola entre saturated() y submit()
+    monkeypatch.setattr(image_pool, "saturated", lambda: False)
+    response = admin_client.post(
+        f"/admin/edit-map/{sample_maps[0].id}",
+        data={"image": png_file()},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 503
+    (job,) = BackgroundJob.query.all()
+    assert job.status == "failed"
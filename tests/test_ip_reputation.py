@@ -0,0 +1,34 @@
+"""
+Reputación de IP: qué peticiones cuentan para el bloqueo automático
+"""
+
+from app import SUSPICIOUS_THRESHOLD, ip_tracker
+
+IP = {"REMOTE_ADDR": "203.0.113.7"}
+
+
+def test_static_assets_do_not_count(client):
+    for _ in range(SUSPICIOUS_THRESHOLD + 20):
+        assert (
+            client.get("/static/css/chat.css", environ_overrides=IP).status_code == 200
+        )
+    assert ip_tracker.suspicious_ips() == {}
+    assert client.get("/health", environ_overrides=IP).status_code == 200
+
+
+def test_signed_download_does_not_count(client):
+    for _ in range(SUSPICIOUS_THRESHOLD + 20):
+        assert (
+            client.get("/download/no-firmado", environ_overrides=IP).status_code != 429
+        )
+    assert ip_tracker.suspicious_ips() == {}
+
+
+def test_pages_count_and_blocked_ip_is_refused_everywhere(client):
+    for _ in range(SUSPICIOUS_THRESHOLD):
+        client.get("/health", environ_overrides=IP)
+    assert client.get("/health", environ_overrides=IP).status_code == 429
+
+    # El bloqueo también se aplica a los endpoints exentos del recuento
+    assert client.get("/static/css/chat.css", environ_overrides=IP).status_code == 403
+    assert client.get("/download/no-firmado", environ_overrides=IP).status_code == 403
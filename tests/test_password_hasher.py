@@ -0,0 +1,99 @@
+"""
+Pool de hashes de contraseñas: límite de hashes en curso y respuestas 503
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import password_hasher
+from database import PasswordResetToken, db
+from password_hasher import PasswordHasher, PasswordHasherBusy
+
+
+def test_pending_limit_holds_under_concurrency():
+    hasher = PasswordHasher("pbkdf2:sha256:1000", max_workers=4, max_pending=2)
+    release = threading.Event()
+    started = threading.Barrier(8)
+    outcomes = []
+
+    def login():
+        started.wait()
+        try:
+            outcomes.append(hasher._run(release.wait, 5))
+        except PasswordHasherBusy:
+            outcomes.append("503")
+
+    threads = [threading.Thread(target=login) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # Los rechazados responden sin esperar a que termine ningún hash
+    deadline = time.monotonic() + 2
+    while outcomes.count("503") < 6 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert outcomes.count("503") == 6
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count(True) == 2
+    assert hasher.stats()["peak_pending"] == 2
+    assert hasher.stats()["pending"] == 0
+
+
+@pytest.fixture
+def full_hasher(monkeypatch):
+    monkeypatch.setattr(password_hasher, "pending", password_hasher.max_pending)
+    return password_hasher
+
+
+def assert_busy(response):
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+
+
+def test_login_and_register_with_full_pool(client, make_user, full_hasher):
+    user = make_user("ana")
+    user.set_password("secreto123")
+    db.session.commit()
+
+    assert_busy(
+        client.post("/auth/login", json={"email": user.email, "password": "secreto123"})
+    )
+    assert_busy(
+        client.post(
+            "/register",
+            json={"email": "eva@example.com", "password": "secreto123", "name": "Eva"},
+        )
+    )
+
+
+def test_reset_password_with_full_pool(client, make_user, full_hasher):
+    user = make_user("ana")
+    db.session.add(
+        PasswordResetToken(
+            token="token-de-prueba",
+            email=user.email,
+            expires_at=datetime.utcnow() + timedelta(hours=1),
+        )
+    )
+    db.session.commit()
+
+    assert_busy(
+        client.post(
+            "/reset-password",
+            json={"token": "token-de-prueba", "new_password": "nueva123"},
+        )
+    )
+    # El token sigue sin usar: se puede reintentar
+    assert PasswordResetToken.query.filter_by(token="token-de-prueba").one().is_valid()
+
+
+def test_admin_change_password_with_full_pool(client, login, make_user, full_hasher):
+    login(make_user("admin", is_admin=True))
+    user = make_user("ana")
+    assert_busy(
+        client.post(f"/admin/change-password/{user.id}", json={"new_password": "x" * 8})
+    )
@@ -0,0 +1,254 @@
+"""
+Consultas del catálogo, la búsqueda, las calificaciones y los comentarios
+
+Cada prueba se ejecuta en SQLite y en PostgreSQL (ver conftest.py).
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from app import query_catalog_page, query_comments_page
+from database import (
+    db,
+    Comment,
+    Map,
+    Purchase,
+    recalculate_rating_aggregates,
+    search_maps,
+)
+
+
+def all_pages(args, limit=2):
+    """Recorre el catálogo siguiendo next_cursor; devuelve los títulos en orden"""
+    titles = []
+    args = dict(args)
+    while True:
+        maps, next_cursor = query_catalog_page(args, limit)
+        titles += [m.title for m in maps]
+        if not next_cursor:
+            return titles
+        args["cursor"] = next_cursor
+
+
+# ==================== CATÁLOGO ====================
+
+
+@pytest.mark.parametrize(
+    "sort, key, reverse",
+    [
+        ("newest", lambda m: (m.created_at, m.id), True),
+        ("price_asc", lambda m: (m.price, m.id), False),
+        ("price_desc", lambda m: (m.price, m.id), True),
+    ],
+)
+def test_catalog_cursor_pages_cover_every_map_once(sample_maps, sort, key, reverse):
+    expected = [m.title for m in sorted(sample_maps, key=key, reverse=reverse)]
+    assert all_pages({"sort": sort}) == expected
+
+
+def test_catalog_filters(sample_maps):
+    assert all_pages({"is_premium": "false"}) == ["Mapa de Práctica"]
+    assert all_pages({"is_featured": "true", "sort": "price_asc"}) == [
+        "Reino Místico",
+        "Ciudad Cyberpunk",
+    ]
+    assert all_pages({"min_price": "12", "max_price": "13", "sort": "price_asc"}) == [
+        "Isla Tropical",
+        "Arena Medieval",
+    ]
+
+
+def test_catalog_rejects_invalid_arguments(sample_maps):
+    for args in ({"sort": "random"}, {"cursor": "no-es-un-cursor"}, {"min_price": "x"}):
+        with pytest.raises(BadRequest):
+            query_catalog_page(args)
+
+
+def test_catalog_api_revalidates_with_etag(client, sample_maps):
+    response = client.get("/api/maps?limit=2")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [m["title"] for m in body["maps"]] == ["Arena Medieval", "Mapa de Práctica"]
+    assert body["next_cursor"]
+
+    etag = response.headers["ETag"]
+    assert (
+        client.get("/api/maps?limit=2", headers={"If-None-Match": etag}).status_code
+        == 304
+    )
+
+
+# ==================== BÚSQUEDA ====================
+
+
+def test_search_matches_title_description_and_features(sample_maps):
+    assert {r["title"] for r in search_maps("castillo")} >= {"Arena Medieval"}
+    assert [r["title"] for r in search_maps("cyberpunk")] == ["Ciudad Cyberpunk"]
+    assert [r["title"] for r in search_maps("dungeons")] == ["Reino Místico"]
+    assert search_maps("inexistente") == []
+
+
+def test_search_requires_every_term(sample_maps):
+    assert [r["title"] for r in search_maps("isla tropical")] == ["Isla Tropical"]
+    assert search_maps("isla cyberpunk") == []
+
+
+def test_search_index_follows_edits_and_deletes(sample_maps):
+    map_obj = sample_maps[0]
+    map_obj.title = "Fortaleza Olvidada"
+    db.session.commit()
+    assert [r["title"] for r in search_maps("fortaleza")] == ["Fortaleza Olvidada"]
+
+    db.session.delete(map_obj)
+    db.session.commit()
+    assert search_maps("fortaleza") == []
+
+
+def test_search_api_escapes_results(client, sample_maps):
+    sample_maps[1].title = "Ciudad <b>Cyberpunk</b>"
+    db.session.commit()
+    response = client.get("/api/maps/search?q=cyberpunk")
+    assert response.status_code == 200
+    (result,) = response.get_json()["results"]
+    assert "<b>" not in result["title_highlight"]
+    assert client.get("/api/maps/search?q=").status_code == 400
+
+
+# ==================== CALIFICACIONES ====================
+
+
+def buy(user, map_obj):
+    db.session.add(
+        Purchase(
+            user_id=user.id, map_id=map_obj.id, price=map_obj.price, status="completed"
+        )
+    )
+    db.session.commit()
+
+
+def test_comments_update_rating_aggregates(client, login, make_user, sample_maps):
+    map_obj = sample_maps[0]
+    for name, rating in (("ana", 5), ("luis", 4), ("eva", 4)):
+        user = make_user(name)
+        buy(user, map_obj)
+        login(user)
+        response = client.post(
+            f"/api/maps/{map_obj.id}/comment",
+            json={"rating": rating, "comment": "Bien"},
+        )
+        assert response.status_code == 201
+
+    db.session.refresh(map_obj)
+    assert map_obj.rating_summary() == {
+        "average_rating": 4.3,
+        "total_reviews": 3,
+        "rating_histogram": {1: 0, 2: 0, 3: 0, 4: 2, 5: 1},
+    }
+
+    # Un segundo comentario del mismo usuario no cuenta
+    response = client.post(
+        f"/api/maps/{map_obj.id}/comment", json={"rating": 1, "comment": "Otra vez"}
+    )
+    assert response.status_code == 400
+
+    login(make_user("admin", is_admin=True))
+    comment = Comment.query.filter_by(map_id=map_obj.id, rating=5).one()
+    assert client.delete(f"/admin/delete-comment/{comment.id}").status_code == 200
+
+    db.session.refresh(map_obj)
+    assert (map_obj.review_count, map_obj.rating_sum, map_obj.rating_5) == (2, 8, 0)
+    assert recalculate_rating_aggregates() == 0
+
+
+def test_comment_requires_purchase(client, login, make_user, sample_maps):
+    login(make_user("ana"))
+    response = client.post(
+        f"/api/maps/{sample_maps[0].id}/comment", json={"rating": 5, "comment": "Hola"}
+    )
+    assert response.status_code == 403
+
+
+def test_catalog_sorts_by_rating(make_user, sample_maps):
+    for map_obj, rating in zip(sample_maps, (3, 5, 1, 4, 2)):
+        db.session.add(
+            Comment(
+                user_id=make_user(f"u{rating}").id,
+                map_id=map_obj.id,
+                rating=rating,
+                comment="x",
+            )
+        )
+        map_obj.apply_rating(rating)
+    db.session.commit()
+    assert all_pages({"sort": "rating"}) == [
+        "Ciudad Cyberpunk",
+        "Mapa de Práctica",
+        "Reino Místico",
+        "Arena Medieval",
+        "Isla Tropical",
+    ]
+
+
+# ==================== COMENTARIOS ====================
+
+
+@pytest.fixture
+def map_comments(make_user, sample_maps):
+    """Doce comentarios del primer mapa, con calificaciones repetidas"""
+    map_obj = sample_maps[0]
+    start = datetime(2024, 2, 1)
+    for i in range(12):
+        db.session.add(
+            Comment(
+                user_id=make_user(f"autor{i}").id,
+                map_id=map_obj.id,
+                rating=i % 5 + 1,
+                comment=f"Comentario {i}",
+                created_at=start + timedelta(hours=i),
+            )
+        )
+    db.session.commit()
+    return map_obj
+
+
+def comment_pages(map_id, sort, limit=5):
+    texts = []
+    args = {"sort": sort}
+    while True:
+        comments, next_cursor = query_comments_page(map_id, args, limit)
+        texts += [c.comment for c in comments]
+        if not next_cursor:
+            return texts
+        args["cursor"] = next_cursor
+
+
+def test_comment_pages_by_date(map_comments):
+    assert comment_pages(map_comments.id, "newest") == [
+        f"Comentario {i}" for i in range(11, -1, -1)
+    ]
+
+
+def test_comment_pages_by_rating_break_ties_by_id(map_comments):
+    comments = Comment.query.filter_by(map_id=map_comments.id).all()
+    expected = sorted(comments, key=lambda c: (c.rating, c.id), reverse=True)
+    assert comment_pages(map_comments.id, "rating") == [c.comment for c in expected]
+
+
+def test_comments_api_returns_summary_and_authors(client, map_comments):
+    response = client.get(f"/map/{map_comments.id}/comments?limit=3")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [c["username"] for c in body["comments"]] == ["autor11", "autor10", "autor9"]
+    assert body["next_cursor"]
+    assert client.get(f"/map/{map_comments.id}/comments?sort=x").status_code == 400
+
+
+def test_map_details_include_first_comment_page(client, map_comments):
+    response = client.get(f"/api/maps/{map_comments.id}")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["map"]["title"] == "Reino Místico"
+    assert len(body["comments"]) == 12
+    assert Map.query.count() == 5
@@ -0,0 +1,30 @@
+"""
+Caché de usuarios: copias inmutables invalidadas por versión
+"""
+
+from app import load_user_snapshot, user_cache
+from database import db, User
+
+
+def test_missing_user_is_not_cached(app_context):
+    user_id = 4242
+    assert load_user_snapshot(user_id) is None
+
+    # Registro (o primer login con Google) sin user_cache.bump()
+    db.session.add(User(id=user_id, email="nueva@example.com", name="Nueva"))
+    db.session.commit()
+
+    snapshot = load_user_snapshot(user_id)
+    assert snapshot is not None and snapshot.name == "Nueva"
+
+
+def test_snapshot_is_cached_until_bump(make_user):
+    user = make_user("ana")
+    assert load_user_snapshot(user.id).name == "ana"
+
+    user.name = "Ana María"
+    db.session.commit()
+    assert load_user_snapshot(user.id).name == "ana"
+
+    user_cache.bump()
+    assert load_user_snapshot(user.id).name == "Ana María"